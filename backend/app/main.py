@@ -1,43 +1,87 @@
-from fastapi import FastAPI
-from .routes import hello_router,generate_router
-from utils.db_watcher import setup_db_watcher
-from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from .routes import hello_router,generate_router,metrics_router,sessions_router
+from .services import AdmissionController, AdmissionRejected, GenerationCache, JobQueue, SignatureVerifier, Tracer, TracingMiddleware, build_pipeline_in_background, run_generation
+from utils.change_feed import ChangeFeed
+from utils.env import load_environment
 
 import os
 
-load_dotenv()  # Load environment variables from .env file
+load_environment()  # Load environment variables from .env file
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print("Starting up...")
+    # Verifies request signatures with cached public keys and rejects replayed requests
+    app.state.signature_verifier = SignatureVerifier()
+
+    # Database change notifications. With several workers, one of them watches
+    # the database file and passes the changes on to the others
+    def on_db_change():
+        # Handle database changes here
+        # This will be called when the database file changes
+        # A user may have a new public key, stop using the cached one
+        app.state.signature_verifier.refresh()
+    
+    app.state.change_feed = ChangeFeed(on_db_change)
+    app.state.change_feed.start()
+
+    # The generation pipeline is built once and shared by the routes and the job workers.
+    # It loads in the background, requests that need it wait until it is ready
+    pipeline_future = build_pipeline_in_background()
+    app.state.pipeline_future = pipeline_future
+    app.state.generation_cache = GenerationCache()
+    # Limits the generations running at once, see ADMISSION_* in services/admission.py
+    app.state.admission = AdmissionController()
+
+    def run_job(request):
+        return run_generation(request, pipeline_future.result(), app.state.generation_cache)
+
+    # Worker pool for asynchronous generation jobs, picking up jobs left over from the last run
+    app.state.job_queue = JobQueue(run_job, max_workers=int(os.getenv("GENERATION_WORKERS", "4")))
+    resumed = app.state.job_queue.resume()
+    if resumed:
+        print(f"Resumed {resumed} generation jobs")
+
+    yield
+
+    # Stop the file observer when the application shuts down, another worker takes over as leader
+    app.state.change_feed.stop()
+    app.state.job_queue.shutdown()
 
 # Create the FastAPI application
 app = FastAPI(
     title="Neurosketch API",
     description="REST API for managing LLM interactions",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Per-phase timing of every request, reported in the Server-Timing header and /metrics
+app.state.tracer = Tracer()
+if app.state.tracer.enabled:
+    app.add_middleware(TracingMiddleware, tracer=app.state.tracer)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected) -> JSONResponse:
+    """Answer requests over the concurrency limits right away, telling the client when to retry."""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": f"Too many requests ({exc.reason}), retry after {exc.retry_after} seconds"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 # Include our hello world router
 # This is where you would add additional routers as your API grows
 app.include_router(hello_router)
 app.include_router(generate_router)
-
-# Set up database file watcher
-@app.on_event("startup")
-async def startup_event():
-    print("Starting up...")
-    def on_db_change():
-        # Handle database changes here
-        # This will be called when the database file changes
-        pass
-    
-    app.state.db_observer = setup_db_watcher(on_db_change)
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    # Stop the file observer when the application shuts down
-    if hasattr(app.state, 'db_observer'):
-        app.state.db_observer.stop()
-        app.state.db_observer.join()
+app.include_router(metrics_router)
+app.include_router(sessions_router)
 
 # If running this file directly with 'python main.py', start the server
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = int(os.getenv("API_WORKERS", "1"))
+    # Several workers need the app as an import string, each worker process imports it
+    uvicorn.run("app.main:app" if workers > 1 else app, host="0.0.0.0", port=8000, workers=workers)
@@ -1,4 +1,6 @@
 from .hello import router as hello_router
 from .generate import router as generate_router
+from .metrics import router as metrics_router
+from .sessions import router as sessions_router
 
-__all__ = ['hello_router','generate_router']
+__all__ = ['hello_router','generate_router','metrics_router','sessions_router']
@@ -1,125 +1,163 @@
-from fastapi import APIRouter,Header
-from ..schemas import CanvasObject, GenerateRequest, GenerateResponse,setup_langchain_parser,create_prompt_template
-from langchain_anthropic import ChatAnthropic
-from dotenv import load_dotenv
-import rsa
-import base64
-import uuid
+import asyncio
+from dataclasses import asdict
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from fastapi.concurrency import run_in_threadpool
+from ..schemas import GenerateRequest, GenerateBatchRequest, GenerateResponse, GenerateJobResponse
+from ..services import AdmissionController, AuthenticationError, GenerationCache, GenerationPipeline, SignatureVerifier, run_generation, run_batch_generation, stream_generation
+from .operator import operator_token
 import json
-from utils.db_manager import DatabaseManager
 
+router = APIRouter()
 
-import os
+# Reloading swaps the model of every request, only the operator may do it
+require_reload_token = operator_token("PIPELINE_RELOAD_TOKEN", "Pipeline reload")
 
-# Load environment variables at module level
-load_dotenv()  # Load environment variables from .env file
-anthropic_key = os.getenv("ANTHROPIC_API_KEY")
+async def get_pipeline(http_request: Request) -> GenerationPipeline:
+    """The generation pipeline built in the app lifespan, waiting for it if it is still loading."""
+    return await asyncio.wrap_future(http_request.app.state.pipeline_future)
 
-router = APIRouter()
+def get_generation_cache(http_request: Request) -> GenerationCache:
+    """The generation cache created in the app lifespan."""
+    return http_request.app.state.generation_cache
+
+def get_admission_controller(http_request: Request) -> AdmissionController:
+    """The admission controller created in the app lifespan, limiting concurrent generations."""
+    return http_request.app.state.admission
+
+def get_signature_verifier(http_request: Request) -> SignatureVerifier:
+    """The request signature verifier created in the app lifespan, shared so replays are detected across requests."""
+    return http_request.app.state.signature_verifier
 
 @router.post("/generate", response_model=GenerateResponse)
-async def generate(request: GenerateRequest,authorization:str = Header(None)) -> GenerateResponse:
-    print(request)
-    print("Authorization Header:", authorization)
-    #Split Bearer out of signature
-    auth_signature = authorization.split(" ")[1]
-
-    # Use the singleton instance of DatabaseManager
-    db = DatabaseManager()
-    user = db.get_user(request.user_id)
-    session = db.get_session(request.session_id)
-    session_objects =[json.loads(d.object_data) for d in db.get_session_canvas_objects(request.session_id)]
-    session_objects = [CanvasObject.from_dict(obj) for obj in session_objects]
-    existing_objects = "\n".join([obj.model_dump_json() for obj in session_objects])
-    if not user:
+async def generate(request: GenerateRequest,authorization:str = Header(None), pipeline: GenerationPipeline = Depends(get_pipeline),
+                   cache: GenerationCache = Depends(get_generation_cache),
+                   verifier: SignatureVerifier = Depends(get_signature_verifier),
+                   admission: AdmissionController = Depends(get_admission_controller)) -> GenerateResponse:
+    """
+    Endpoint to handle generation requests.
+    Keeps the request open for the whole LLM call, see /generate/jobs for the asynchronous variant.
+
+    Args:
+        request (GenerateRequest): The request object containing input parameters.
+
+    Returns:
+        GenerateResponse: The response object containing the status and generated data.
+    """
+    try:
+        await run_in_threadpool(verifier.verify, request, authorization)
+    except AuthenticationError as e:
         return GenerateResponse(
             status="error",
-            message="User not found",
+            message=e.message,
             data={},
-            error="User not found"
+            error=e.detail
         )
-    # Verify the signature using the public key
-    public_key = user.public_key
+
+    # The LLM call blocks, keep it off the event loop. Requests over the limits are answered with 429
+    async with admission.admit(request.user_id):
+        result = await run_in_threadpool(run_generation, request, pipeline, cache)
+    return GenerateResponse(
+        status="success",
+        message="Generation successful",
+        data=result,
+    )
+
+@router.post("/generate/batch", response_model=GenerateResponse)
+async def generate_batch(request: GenerateBatchRequest, authorization:str = Header(None), pipeline: GenerationPipeline = Depends(get_pipeline),
+                         cache: GenerationCache = Depends(get_generation_cache),
+                         verifier: SignatureVerifier = Depends(get_signature_verifier),
+                   admission: AdmissionController = Depends(get_admission_controller)) -> GenerateResponse:
+    """
+    Generate one object per prompt for a session, with a single signature for the whole batch.
+    The model calls run in parallel and all objects are stored together.
+    """
     try:
-        # Decode the public key from base64
-        public_key = rsa.PublicKey.load_pkcs1(public_key.encode())
-        # Decode the base64 signature
-        signature_bytes = base64.b64decode(auth_signature)
-        # Convert request to the same format as was signed
-        request_data = json.dumps(request.dict(), sort_keys=True)
-        print("Request data being verified:", request_data)
-        # Verify the signature
-        rsa.verify(request_data.encode("utf-8"), signature_bytes, public_key)
-        print("Signature verification successful!")
-    except (rsa.VerificationError, ValueError, base64.binascii.Error) as e:
-        print("Signature verification failed:", str(e))
+        await run_in_threadpool(verifier.verify, request, authorization)
+    except AuthenticationError as e:
         return GenerateResponse(
             status="error",
-            message="Invalid signature",
+            message=e.message,
             data={},
-            error=str(e)
+            error=e.detail
         )
-    llm = ChatAnthropic(model="claude-3-5-sonnet-20240620")
 
-    system_prompt = """
-    You are an assistant that has the goal of drawing Fabric.js components in a canvas.
-
-    You will be given the following information:
-
-    - The canvas width and height
-    - The object definition (type, position, size, color, etc.)
-    - The prompt that describes the object to be drawn
-    - Any existing objects in the canvas (if any)
+    async with admission.admit(request.user_id):
+        result = await run_in_threadpool(run_batch_generation, request, pipeline, cache)
+    failed = sum(1 for item in result["results"] if "error" in item)
+    return GenerateResponse(
+        status="success" if not failed else "partial" if failed < len(request.prompts) else "error",
+        message=f"Generated {len(request.prompts) - failed} of {len(request.prompts)} objects",
+        data=result,
+    )
 
-    Be sure that you are fitting as many required properties as possible in the object definition. There are typings for each of the properties that you *must use*.
+@router.post("/generate/stream")
+async def generate_stream(request: GenerateRequest, authorization:str = Header(None),
+                          pipeline: GenerationPipeline = Depends(get_pipeline),
+                          verifier: SignatureVerifier = Depends(get_signature_verifier),
+                          admission: AdmissionController = Depends(get_admission_controller)) -> StreamingResponse:
+    """
+    Generate objects for a prompt and stream them back as newline delimited JSON.
+    Each object is stored as soon as the model finished it, see services.stream_generation for the events.
+    """
+    try:
+        await run_in_threadpool(verifier.verify, request, authorization)
+    except AuthenticationError as e:
+        raise HTTPException(status_code=401, detail=f"{e.message}: {e.detail}")
+
+    # The slot is held until the stream is finished
+    ticket = await admission.acquire(request.user_id)
+
+    def events():
+        try:
+            for event in stream_generation(request, pipeline):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            # The response has started, report the failure in the stream
+            print(f"Streaming generation failed: {e}")
+            yield json.dumps({"event": "error", "error": str(e)}) + "\n"
+        finally:
+            ticket.release()
+
+    # Starlette iterates synchronous generators on a worker thread.
+    # Releasing again after the response is a no-op, unless the stream never started
+    return StreamingResponse(events(), media_type="application/x-ndjson", background=BackgroundTask(ticket.release))
+
+@router.post("/generate/jobs", response_model=GenerateJobResponse, status_code=202)
+async def submit_generation_job(request: GenerateRequest, http_request: Request, authorization:str = Header(None),
+                                verifier: SignatureVerifier = Depends(get_signature_verifier)) -> GenerateJobResponse:
+    """
+    Queue a generation request and return its job id immediately.
+    Poll /generate/jobs/{job_id} for the result.
+    """
+    try:
+        await run_in_threadpool(verifier.verify, request, authorization)
+    except AuthenticationError as e:
+        raise HTTPException(status_code=401, detail=f"{e.message}: {e.detail}")
 
-    **Use only M, L, Q, and Z command for the path.**
-    **Always include width and height in the object definition.**
-    Prompt: {prompt}
-    Canvas Width: {width}
-    Canvas Height: {height}
-    Existing objects: {existing_objects}
+    job = await run_in_threadpool(http_request.app.state.job_queue.submit, request)
+    return GenerateJobResponse(job_id=job.id, status=job.status)
 
+@router.get("/generate/jobs/{job_id}", response_model=GenerateJobResponse)
+async def get_generation_job(job_id: str, http_request: Request) -> GenerateJobResponse:
+    """
+    Get the status of a generation job, and its result once it succeeded.
     """
-    # Create the request with the system prompt and user prompt
-    system_prompt = system_prompt.format(
-        prompt=request.prompt,
-        width=session.width,
-        height=session.height,
-        existing_objects=existing_objects
+    job = await run_in_threadpool(http_request.app.state.job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return GenerateJobResponse(
+        job_id=job.id,
+        status=job.status,
+        result=json.loads(job.result) if job.result else None,
+        error=job.error,
     )
 
-    parser,format_instructioins = setup_langchain_parser()
-    prompt_template = create_prompt_template(format_instructioins)
-
-    prompt_and_model = prompt_template | llm | parser
-    response = prompt_and_model.invoke({"description": request.prompt, "width": session.width, "height": session.height})
-    object_data = response.to_dict()
-    canvas_register = {
-        "id": str(uuid.uuid4()),
-        "session_id": request.session_id,
-        "object_data": json.dumps(object_data),
-        "created_by": request.user_id,
-    }
-    for key,value in canvas_register.items():
-        print(type(value))
-    db.add_canvas_object(canvas_register)
-
-    
+@router.post("/generate/reload", dependencies=[Depends(require_reload_token)])
+async def reload_pipeline(pipeline: GenerationPipeline = Depends(get_pipeline)) -> dict:
     """
-    Endpoint to handle generation requests.
-    
-    Args:
-        request (GenerateRequest): The request object containing input parameters.
-        
-    Returns:
-        GenerateResponse: The response object containing the status and generated data.
+    Rebuild the generation pipeline from the current .env file and environment, without restarting the API.
     """
-    # Here you would typically call your generation logic
-    # For now, we will return a mock response
-    return GenerateResponse(
-        status="success",
-        message="Generation successful",
-        data={},
-    )
-
+    config = await run_in_threadpool(pipeline.reload)
+    return {"status": "success", "config": asdict(config)}
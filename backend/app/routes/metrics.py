@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Request
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def metrics(http_request: Request) -> dict:
+    """
+    Runtime metrics of the API's caches and worker pools.
+    """
+    return {
+        "generation_cache": http_request.app.state.generation_cache.metrics(),
+        "admission": http_request.app.state.admission.metrics(),
+        "tracing": http_request.app.state.tracer.metrics(),
+        "change_feed": http_request.app.state.change_feed.metrics(),
+    }
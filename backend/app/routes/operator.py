@@ -0,0 +1,24 @@
+import hmac
+import os
+from typing import Callable
+
+from fastapi import Header, HTTPException
+
+
+def operator_token(env_name: str, feature: str) -> Callable[..., None]:
+    """
+    Dependency requiring the operator token set in the environment variable ``env_name``.
+    Routes using it are disabled while the variable is not set.
+
+    Args:
+        env_name: Environment variable holding the token
+        feature: Name of the feature in error messages, e.g. "Session transfer"
+    """
+    def require_token(authorization: str = Header(None)) -> None:
+        token = os.getenv(env_name)
+        if not token:
+            raise HTTPException(status_code=403, detail=f"{feature} is disabled, set {env_name} to enable it")
+        # Constant time comparison so the token cannot be guessed byte by byte
+        if not authorization or not hmac.compare_digest(authorization.encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+            raise HTTPException(status_code=401, detail=f"Invalid {feature.lower()} token")
+    return require_token
@@ -0,0 +1,60 @@
+import sqlite3
+import tempfile
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from utils.db_manager import DatabaseManager
+from utils.session_transfer import export_ndjson, export_parquet, import_ndjson, import_parquet, stream_in_thread
+
+from .operator import operator_token
+
+router = APIRouter()
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+# Uploads larger than this are spooled to a temporary file instead of memory
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+# Session transfers expose every participant and object of a session
+require_transfer_token = operator_token("SESSION_TRANSFER_TOKEN", "Session transfer")
+
+@router.get("/sessions/{session_id}/export", dependencies=[Depends(require_transfer_token)])
+async def export_session(session_id: str, format: Literal["ndjson", "parquet"] = "ndjson") -> StreamingResponse:
+    """
+    Stream a session with its participants and canvas objects, as NDJSON or Parquet.
+    See utils/session_transfer.py for the formats.
+    """
+    if not await run_in_threadpool(DatabaseManager().get_session, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    try:
+        chunks = export_parquet(session_id) if format == "parquet" else export_ndjson(session_id)
+    except ImportError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    # Starlette resumes synchronous iterators on any threadpool thread, the export keeps to one thread
+    return StreamingResponse(stream_in_thread(chunks), media_type=MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="{session_id}.{format}"'})
+
+@router.post("/sessions/import", dependencies=[Depends(require_transfer_token)])
+async def import_session(http_request: Request, format: Literal["ndjson", "parquet"] = "ndjson",
+                         replace: bool = False) -> dict:
+    """
+    Import a session exported by /sessions/{session_id}/export, sent as the request body.
+    All or nothing: on an error nothing is written.
+    """
+    # Parquet is read from the end, the body is spooled before the import starts
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as body:
+        async for chunk in http_request.stream():
+            body.write(chunk)
+        body.seek(0)
+        try:
+            counts = await run_in_threadpool(import_parquet if format == "parquet" else import_ndjson, body, replace)
+        except ImportError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except sqlite3.IntegrityError as e:
+            raise HTTPException(status_code=409, detail=f"The session conflicts with stored data: {e}")
+    return {"status": "success", **counts}
@@ -1,5 +1,5 @@
 from .hello import HelloWorldRequest, HelloWorldResponse
-from .canvas import CanvasObject,setup_langchain_parser,create_prompt_template
-from .generate import GenerateRequest, GenerateResponse
+from .canvas import CanvasObject,PathCommand,setup_langchain_parser,create_prompt_template,create_stream_prompt_template
+from .generate import GenerateRequest, GenerateBatchRequest, GenerateResponse, GenerateJobResponse
 
-__all__ = ['HelloWorldRequest', 'HelloWorldResponse', 'CanvasObject', 'GenerateRequest', 'GenerateResponse','setup_langchain_parser','create_prompt_template']
+__all__ = ['HelloWorldRequest', 'HelloWorldResponse', 'CanvasObject', 'GenerateRequest', 'GenerateBatchRequest', 'GenerateResponse', 'GenerateJobResponse','PathCommand','setup_langchain_parser','create_prompt_template','create_stream_prompt_template']
@@ -1,8 +1,6 @@
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain_core.prompts import PromptTemplate, ChatPromptTemplate
-from langchain_anthropic import ChatAnthropic
 from typing import List, Optional, Union, Literal,Dict,Any
-from pydantic import BaseModel, Field, model_validator, field_validator
+from pydantic import BaseModel, Field, GetCoreSchemaHandler, create_model, model_validator, field_validator
+from pydantic_core import core_schema
 import json
 
 # Define the command models
@@ -57,34 +55,211 @@ class ClosePathCommand(BasePathCommand):
 # Define PathCommand as a Union for validation
 PathCommand = Union[MoveCommand, LineCommand, QuadraticCurveCommand, ClosePathCommand]
 
-class Path(BaseModel):
-    """Class representing a complete path with multiple commands."""
-    commands: List[PathCommand] = Field(
-        ..., 
+# Command letters by code, with the number of coordinates each command takes
+# and the names of those coordinates in the schema form
+COMMAND_TYPES = ("M", "L", "Q", "Z")
+COMMAND_CODES = {letter: code for code, letter in enumerate(COMMAND_TYPES)}
+COMMAND_ARITY = (2, 2, 4, 0)
+COMMAND_FIELDS = (("x", "y"), ("x", "y"), ("control_x", "control_y", "end_x", "end_y"), ())
+COMMAND_MODELS = (MoveCommand, LineCommand, QuadraticCurveCommand, ClosePathCommand)
+
+# JSON fragment of every command type, filled in with the coordinates by Path.to_json
+_JSON_FRAGMENTS = tuple(
+    "[" + ",".join([json.dumps(letter)] + ["%r"] * arity) + "]"
+    for letter, arity in zip(COMMAND_TYPES, COMMAND_ARITY)
+)
+
+# The JSON schema of Path, shown to the LLM by the output parser: a list of command models
+_PathSchema = create_model(
+    "Path",
+    __doc__="Class representing a complete path with multiple commands.",
+    commands=(List[PathCommand], Field(
+        ...,
         description="List of path commands (Move, Line, Quadratic, Close)",
-        min_items=1  # Require at least one command
-    )
+        min_length=1  # Require at least one command
+    )),
+)
+
+
+class Path:
+    """
+    Class representing a complete path with multiple commands.
+
+    The commands are stored as two arrays, one code per command (an index
+    into COMMAND_TYPES) and the coordinates of all commands one after the
+    other, instead of a model per command: a freehand stroke has thousands
+    of them. Validation checks the arrays as a whole and serialization fills
+    in the coordinates without building the commands one by one.
+
+    To pydantic, and to the LLM output parser, a Path still looks like a
+    model with a list of command models, {"commands": [{"command_type": "M",
+    "x": ..., "y": ...}, ...]}, which it accepts along with the list of lists
+    form [["M", x, y], ...].
+    """
+    __slots__ = ("codes", "coords")
+
+    def __init__(self, codes, coords):
+        """
+        Args:
+            codes: Command codes, one per command
+            coords: Coordinates of all commands, in order
+
+        Raises:
+            ValueError: If the arrays do not describe a valid path
+        """
+        import numpy as np
+
+        codes = np.asarray(codes, dtype=np.uint8)
+        coords = np.asarray(coords, dtype=np.float64)
+        if codes.ndim != 1 or coords.ndim != 1:
+            raise ValueError("Path codes and coordinates must be one dimensional")
+        if codes.size == 0:
+            raise ValueError("A path needs at least one command")
+        if codes.max() >= len(COMMAND_TYPES):
+            raise ValueError(f"Unknown command code: {int(codes.max())}")
+        expected = int(np.take(COMMAND_ARITY, codes).sum())
+        if coords.size != expected:
+            raise ValueError(f"Path commands take {expected} coordinates, got {coords.size}")
+        if not np.isfinite(coords).all():
+            raise ValueError("Path coordinates must be finite numbers")
+
+        codes.flags.writeable = False
+        coords.flags.writeable = False
+        self.codes = codes
+        self.coords = coords
 
     @classmethod
     def from_list(cls, commands: List[List]) -> 'Path':
         """Create a Path instance from a list of lists."""
-        path_commands = []
-        for cmd in commands:
-            if cmd[0] == "M":
-                path_commands.append(MoveCommand(x=cmd[1], y=cmd[2]))
-            elif cmd[0] == "L":
-                path_commands.append(LineCommand(x=cmd[1], y=cmd[2]))
-            elif cmd[0] == "Q":
-                path_commands.append(QuadraticCurveCommand(control_x=cmd[1], control_y=cmd[2], end_x=cmd[3], end_y=cmd[4]))
-            elif cmd[0] == "Z":
-                path_commands.append(ClosePathCommand())
-            else:
-                raise ValueError(f"Unknown command type: {cmd[0]}")
-        return cls(commands=path_commands)
-    
+        import numpy as np
+        from itertools import chain
+
+        count = len(commands)
+        try:
+            codes = np.fromiter((COMMAND_CODES[cmd[0]] for cmd in commands), dtype=np.uint8, count=count)
+            lengths = np.fromiter(map(len, commands), dtype=np.intp, count=count)
+        except KeyError as e:
+            raise ValueError(f"Unknown command type: {e.args[0]}") from None
+        except (TypeError, IndexError):
+            raise ValueError("Path commands must be non-empty lists") from None
+
+        wrong_length = np.flatnonzero(lengths != np.take(COMMAND_ARITY, codes) + 1)
+        if wrong_length.size:
+            index = int(wrong_length[0])
+            raise ValueError(f"Wrong number of values in path command {index}: {commands[index]}")
+
+        # Drop the command letters from the flattened commands, what remains are the coordinates
+        values = np.fromiter(chain.from_iterable(commands), dtype=object, count=int(lengths.sum()))
+        try:
+            coords = np.delete(values, np.cumsum(lengths) - lengths).astype(np.float64)
+        except (TypeError, ValueError):
+            raise ValueError("Path coordinates must be numbers") from None
+        return cls(codes, coords)
+
+    @classmethod
+    def from_commands(cls, commands: List[Union[dict, BasePathCommand]]) -> 'Path':
+        """Create a Path instance from commands in the schema form, as dicts or command models."""
+        import numpy as np
+
+        codes = []
+        coords = []
+        for index, command in enumerate(commands):
+            if isinstance(command, BasePathCommand):
+                command = command.__dict__
+            try:
+                code = COMMAND_CODES[command["command_type"]]
+                coords.extend(command[name] for name in COMMAND_FIELDS[code])
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"Invalid path command {index}: {command!r} ({e!r})") from None
+            codes.append(code)
+        try:
+            coords = np.array(coords, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError("Path coordinates must be numbers") from None
+        return cls(codes, coords)
+
+    @property
+    def commands(self) -> List[PathCommand]:
+        """The commands as models, built on every access."""
+        return [
+            COMMAND_MODELS[code](**dict(zip(COMMAND_FIELDS[code], command[1:])))
+            for code, command in zip(self.codes.tolist(), self.to_list())
+        ]
+
     def to_list(self) -> List[List]:
         """Convert the path to a list of lists format for canvas rendering."""
-        return [cmd.to_list() for cmd in self.commands]
+        values = self.coords.tolist()
+        result = []
+        position = 0
+        for code in self.codes.tolist():
+            arity = COMMAND_ARITY[code]
+            result.append([COMMAND_TYPES[code], *values[position:position + arity]])
+            position += arity
+        return result
+
+    def to_json(self) -> str:
+        """The list of lists form as JSON, formatted in one pass over the coordinates."""
+        template = "[" + ",".join([_JSON_FRAGMENTS[code] for code in self.codes.tolist()]) + "]"
+        return template % tuple(self.coords.tolist())
+
+    def to_schema_dict(self) -> Dict[str, Any]:
+        """The schema form, {"commands": [{"command_type": ..., ...}, ...]}."""
+        values = self.coords.tolist()
+        commands = []
+        position = 0
+        for code in self.codes.tolist():
+            arity = COMMAND_ARITY[code]
+            command = {"command_type": COMMAND_TYPES[code]}
+            command.update(zip(COMMAND_FIELDS[code], values[position:position + arity]))
+            commands.append(command)
+            position += arity
+        return {"commands": commands}
+
+    @classmethod
+    def validate(cls, value: Any) -> 'Path':
+        """Accept a Path, the schema form or the list of lists form."""
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, dict):
+            if "commands" not in value:
+                raise ValueError("Path data must have a 'commands' list")
+            return cls.from_commands(value["commands"])
+        if isinstance(value, (list, tuple)):
+            return cls.from_list(value)
+        raise ValueError(f"Invalid path data: {type(value).__name__}")
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler: GetCoreSchemaHandler):
+        # The model schema only provides the JSON schema, the input is never validated against it
+        return core_schema.no_info_wrap_validator_function(
+            lambda value, _: cls.validate(value),
+            handler.generate_schema(_PathSchema),
+            serialization=core_schema.plain_serializer_function_ser_schema(cls.to_schema_dict),
+        )
+
+    def bounds(self) -> tuple:
+        """Bounds of the path's points and curves: left, top, right, bottom."""
+        from utils.geometry import path_bounds
+
+        return tuple(path_bounds([self.to_list()])[0].tolist())
+
+    def length(self) -> float:
+        """Length of the path, curves included."""
+        from utils.geometry import path_lengths
+
+        return float(path_lengths([self.to_list()])[0])
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Path):
+            return NotImplemented
+        return bool((self.codes.shape == other.codes.shape and (self.codes == other.codes).all()
+                     and self.coords.shape == other.coords.shape and (self.coords == other.coords).all()))
+
+    def __repr__(self) -> str:
+        return f"Path({len(self)} commands)"
 
 class CanvasObject(BaseModel):
     """
@@ -159,13 +334,21 @@ class CanvasObject(BaseModel):
         
         return cls(**data)
     
+    def bounds(self) -> tuple:
+        """
+        Axis aligned bounding box on the canvas: left, top, right, bottom.
+        """
+        from utils.geometry import object_bounds
+
+        return tuple(object_bounds([self.model_dump(exclude={"path"})])[0].tolist())
+
     def to_dict(self) -> Dict[str, Any]:
         """
         Convert to a dictionary suitable for JSON serialization.
         Special handling for path data to convert to list of lists format.
         """
-        # Start with the model's dict
-        result = self.model_dump(exclude_none=True)
+        # Start with the model's dict, the path is converted on its own
+        result = self.model_dump(exclude={"path"}, exclude_none=True)
         
         # Convert Path object to list of lists if present
         if self.path is not None:
@@ -186,8 +369,12 @@ class CanvasObject(BaseModel):
     def model_dump_json(self, **kwargs) -> str:
         """
         Override the default model_dump_json to use our custom to_dict method.
+        Without formatting options the path's JSON is written straight from its arrays.
         """
-        return json.dumps(self.to_dict(), **kwargs)
+        if kwargs or self.path is None:
+            return json.dumps(self.to_dict(), **kwargs)
+        result = json.dumps(self.model_dump(exclude={"path"}, exclude_none=True))
+        return result[:-1] + ', "path": ' + self.path.to_json() + "}"
 
 def setup_langchain_parser():
     """
@@ -196,6 +383,9 @@ def setup_langchain_parser():
     Returns:
         tuple: (parser, format_instructions)
     """
+    # langchain takes seconds to import, only load it once a pipeline is built
+    from langchain_core.output_parsers import PydanticOutputParser
+
     # Create the parser
     parser = PydanticOutputParser(pydantic_object=CanvasObject)
     
@@ -221,6 +411,9 @@ def create_prompt_template(format_instructions):
 
     Width of entire canvas: {width}
     Height of entire canvas: {height}
+
+    Objects already on the canvas:
+    {existing_objects}
     
     IMPORTANT REQUIREMENTS:
     1. The width MUST be a positive number (greater than 0)
@@ -229,10 +422,50 @@ def create_prompt_template(format_instructions):
     
     {format_instructions}
     """
+    from langchain_core.prompts import PromptTemplate
+    
+    prompt = PromptTemplate(
+        template=template,
+        input_variables=["description", "width", "height", "existing_objects"],
+        partial_variables={"format_instructions": format_instructions}
+    )
+    
+    return prompt
+
+def create_stream_prompt_template(format_instructions):
+    """
+    Create the prompt template of streaming generation, which may answer with several objects.
+    
+    Args:
+        format_instructions: The format instructions from the parser
+        
+    Returns:
+        PromptTemplate: The prompt template
+    """
+    template = """
+    Draw what is described below using one or more canvas objects.
+    
+    {description}
+
+    Width of entire canvas: {width}
+    Height of entire canvas: {height}
+
+    Objects already on the canvas:
+    {existing_objects}
+    
+    IMPORTANT REQUIREMENTS:
+    1. Answer with a JSON array of canvas objects and nothing else
+    2. Every object in the array MUST follow the schema below
+    3. The width and height of every object MUST be positive numbers (greater than 0)
+    4. For path objects, you must include valid path commands
+    
+    {format_instructions}
+    """
+    from langchain_core.prompts import PromptTemplate
     
     prompt = PromptTemplate(
         template=template,
-        input_variables=["description", "width", "height"],
+        input_variables=["description", "width", "height", "existing_objects"],
         partial_variables={"format_instructions": format_instructions}
     )
     
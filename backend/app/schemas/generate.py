@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 class GenerateRequest(BaseModel):
     """
@@ -8,8 +9,22 @@ class GenerateRequest(BaseModel):
     user_id:str
     session_id:str
     timestamp:str
-#    nonce:str
+    nonce:Optional[str] = None  # Unique per request, a request is only accepted once
     prompt:str
+    bypass_cache: bool = False  # Always call the model, ignoring cached generations
+
+
+class GenerateBatchRequest(BaseModel):
+    """
+    Schema for a batch of generation requests.
+    Several prompts for the same session, signed together.
+    """
+    user_id:str
+    session_id:str
+    timestamp:str
+    nonce:Optional[str] = None
+    prompts:List[str] = Field(..., min_length=1, max_length=20)
+    bypass_cache: bool = False
 
 
 class GenerateResponse(BaseModel):
@@ -20,4 +35,14 @@ class GenerateResponse(BaseModel):
     status: str
     message: str
     data: dict = {}
-    error: str = None
\ No newline at end of file
+    error: str = None
+
+
+class GenerateJobResponse(BaseModel):
+    """
+    Schema for the status of an asynchronous generation job.
+    """
+    job_id: str
+    status: str  # queued, running, succeeded or failed
+    result: Optional[dict] = None
+    error: Optional[str] = None
@@ -0,0 +1,10 @@
+from .admission import AdmissionController, AdmissionRejected
+from .auth import AuthenticationError, SignatureVerifier
+from .generation import run_generation, run_batch_generation, stream_generation
+from .cache import GenerationCache, generation_cache_key
+from .jobs import JobQueue
+from .pipeline import GenerationPipeline, PipelineConfig, build_pipeline_in_background
+from .scene import summarize_scene
+from .tracing import Tracer, TracingMiddleware, span
+
+__all__ = ['AdmissionController', 'AdmissionRejected', 'AuthenticationError', 'SignatureVerifier', 'run_generation', 'run_batch_generation', 'stream_generation', 'GenerationCache', 'generation_cache_key', 'JobQueue', 'GenerationPipeline', 'PipelineConfig', 'build_pipeline_in_background', 'summarize_scene', 'Tracer', 'TracingMiddleware', 'span']
@@ -0,0 +1,176 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted, the API answers it with 429 Too Many Requests."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason  # user_limit, queue_full or queue_timeout
+        self.retry_after = retry_after  # seconds
+
+
+class AdmissionTicket:
+    """A running slot held by an admitted request. Release it exactly once, from any thread."""
+
+    def __init__(self, controller: 'AdmissionController', user_id: str):
+        self.controller = controller
+        self.user_id = user_id
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        duration = time.monotonic() - self.started
+        loop = self.controller.loop
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            self.controller._release(self.user_id, duration)
+        else:
+            # Streaming responses finish on a worker thread, the controller's state belongs to the event loop
+            loop.call_soon_threadsafe(self.controller._release, self.user_id, duration)
+
+
+class AdmissionController:
+    """
+    Limits how many expensive requests run at the same time.
+
+    At most ``max_concurrent`` requests run at once. Requests beyond that wait
+    in a FIFO queue of at most ``max_queue`` entries for up to
+    ``queue_timeout`` seconds. A user can have at most ``max_per_user``
+    requests running or waiting, so a single user cannot fill the queue.
+    Requests that are not admitted fail fast with AdmissionRejected, carrying
+    an estimate of when to retry based on recent request durations.
+
+    All state is changed on the event loop, no locks are needed.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None, max_per_user: Optional[int] = None,
+                 max_queue: Optional[int] = None, queue_timeout: Optional[float] = None):
+        """
+        Args:
+            max_concurrent: Requests running at the same time, defaults to ADMISSION_MAX_CONCURRENT
+            max_per_user: Requests of one user running or waiting, defaults to ADMISSION_MAX_PER_USER
+            max_queue: Requests waiting for a slot, defaults to ADMISSION_MAX_QUEUE
+            queue_timeout: Seconds a request waits before it is rejected, defaults to ADMISSION_QUEUE_TIMEOUT
+        """
+        self.max_concurrent = max_concurrent if max_concurrent is not None else int(os.getenv("ADMISSION_MAX_CONCURRENT", "8"))
+        self.max_per_user = max_per_user if max_per_user is not None else int(os.getenv("ADMISSION_MAX_PER_USER", "2"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+        self.queue_timeout = queue_timeout if queue_timeout is not None else float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.running = 0
+        self.per_user: Dict[str, int] = {}  # user_id -> requests running or waiting
+        self.waiters = deque()  # futures of waiting requests, resolved when they get a slot
+        self.average_duration = 1.0  # seconds, moving average of admitted requests
+
+        # Metrics
+        self.admitted = 0
+        self.queued = 0
+        self.max_queue_depth = 0
+        self.rejected = {"user_limit": 0, "queue_full": 0, "queue_timeout": 0}
+
+    def _retry_after(self, ahead: int) -> int:
+        """Seconds until ``ahead`` more requests are likely to have finished."""
+        return max(1, math.ceil(self.average_duration * (ahead / max(self.max_concurrent, 1) + 1)))
+
+    def _reject(self, reason: str, ahead: int):
+        self.rejected[reason] += 1
+        raise AdmissionRejected(reason, self._retry_after(ahead))
+
+    def _leave(self, user_id: str):
+        count = self.per_user.get(user_id, 0) - 1
+        if count > 0:
+            self.per_user[user_id] = count
+        else:
+            self.per_user.pop(user_id, None)
+
+    async def acquire(self, user_id: str) -> AdmissionTicket:
+        """
+        Wait for a running slot.
+
+        Raises:
+            AdmissionRejected: If the user is at their limit, the queue is full or the wait timed out
+        """
+        self.loop = asyncio.get_running_loop()
+        if self.per_user.get(user_id, 0) >= self.max_per_user:
+            self._reject("user_limit", 0)
+
+        if self.running < self.max_concurrent and not self.waiters:
+            self.running += 1
+        else:
+            if len(self.waiters) >= self.max_queue:
+                self._reject("queue_full", len(self.waiters))
+            self.per_user[user_id] = self.per_user.get(user_id, 0) + 1
+            waiter = self.loop.create_future()
+            self.waiters.append(waiter)
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, len(self.waiters))
+            try:
+                # The slot is handed over by _release, already counted as running
+                await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+            except BaseException as e:
+                if waiter.done() and not waiter.cancelled():
+                    # Got a slot at the same time as giving up, pass it on
+                    self._release(user_id, None)
+                else:
+                    waiter.cancel()
+                    self.waiters.remove(waiter)
+                    self._leave(user_id)
+                if isinstance(e, asyncio.TimeoutError):
+                    self._reject("queue_timeout", len(self.waiters))
+                raise
+            self.admitted += 1
+            return AdmissionTicket(self, user_id)
+
+        self.per_user[user_id] = self.per_user.get(user_id, 0) + 1
+        self.admitted += 1
+        return AdmissionTicket(self, user_id)
+
+    def _release(self, user_id: str, duration: Optional[float]):
+        """Free a running slot, handing it to the oldest waiting request. Runs on the event loop."""
+        self._leave(user_id)
+        if duration is not None:
+            self.average_duration = 0.8 * self.average_duration + 0.2 * duration
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+    @asynccontextmanager
+    async def admit(self, user_id: str):
+        """Hold a running slot for the duration of the block."""
+        ticket = await self.acquire(user_id)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def metrics(self) -> dict:
+        """Running requests, queue depth, admissions and rejections by reason."""
+        return {
+            "running": self.running,
+            "queue_depth": len(self.waiters),
+            "max_queue_depth": self.max_queue_depth,
+            "max_concurrent": self.max_concurrent,
+            "max_per_user": self.max_per_user,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": dict(self.rejected),
+            "average_duration": self.average_duration,
+        }
@@ -0,0 +1,183 @@
+import base64
+import binascii
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from threading import Lock
+from typing import Optional, Tuple
+
+import rsa
+from pydantic import BaseModel
+
+from utils.db_manager import DatabaseManager
+
+from .tracing import span
+
+
+class AuthenticationError(Exception):
+    """Raised when a request cannot be attributed to a known user."""
+
+    def __init__(self, message: str, detail: str):
+        super().__init__(message)
+        self.message = message
+        self.detail = detail
+
+
+class SignatureVerifier:
+    """
+    Verifies that requests were signed by their user, and were not sent before.
+
+    Parsed public keys are kept in an LRU cache, so a request only costs the
+    signature check itself instead of a user lookup and a PKCS#1 parse. A
+    cached key is dropped after ``key_ttl`` seconds, by ``invalidate`` and
+    by ``refresh`` once the user's stored key changed.
+
+    Requests carry a timestamp, which must be within ``replay_window``
+    seconds of the server's clock, and a nonce. A verified request is
+    remembered by (user, nonce), or (user, signature) for clients that send
+    no nonce, until its timestamp is too old to be accepted anyway; the same
+    request arriving again is rejected as a replay.
+    """
+
+    def __init__(self, key_cache_size: Optional[int] = None, key_ttl: Optional[float] = None,
+                 replay_window: Optional[float] = None):
+        """
+        Args:
+            key_cache_size: Parsed public keys kept in memory, defaults to AUTH_KEY_CACHE_SIZE
+            key_ttl: Seconds a cached key is used before it is read again, defaults to AUTH_KEY_CACHE_TTL
+            replay_window: Accepted clock difference of request timestamps in seconds, defaults to AUTH_REPLAY_WINDOW
+        """
+        self.key_cache_size = key_cache_size if key_cache_size is not None else int(os.getenv("AUTH_KEY_CACHE_SIZE", "1024"))
+        self.key_ttl = key_ttl if key_ttl is not None else float(os.getenv("AUTH_KEY_CACHE_TTL", "300"))
+        self.replay_window = replay_window if replay_window is not None else float(os.getenv("AUTH_REPLAY_WINDOW", "300"))
+
+        self.keys = OrderedDict()  # user_id -> (parsed key, stored key text, expiry)
+        self.key_lock = Lock()
+        self.seen = {}  # (user_id, nonce) -> expiry
+        self.seen_order = deque()  # (expiry, (user_id, nonce)), in order of expiry
+        self.seen_lock = Lock()
+
+    def _load_key(self, user_id: str) -> Tuple[rsa.PublicKey, str]:
+        """Read and parse a user's public key, caching it."""
+        with span("user_lookup"):
+            user = DatabaseManager().get_user(user_id)
+        if not user:
+            raise AuthenticationError("User not found", "User not found")
+        try:
+            public_key = rsa.PublicKey.load_pkcs1(user.public_key.encode())
+        except (ValueError, IndexError, TypeError) as e:
+            raise AuthenticationError("Invalid signature", f"Invalid public key: {e}")
+        with self.key_lock:
+            self.keys[user_id] = (public_key, user.public_key, time.monotonic() + self.key_ttl)
+            self.keys.move_to_end(user_id)
+            while len(self.keys) > self.key_cache_size:
+                self.keys.popitem(last=False)
+        return public_key, user.public_key
+
+    def public_key(self, user_id: str) -> Tuple[rsa.PublicKey, bool]:
+        """
+        The parsed public key of a user.
+
+        Returns:
+            Tuple[rsa.PublicKey, bool]: The key and whether it came from the cache
+
+        Raises:
+            AuthenticationError: If the user is unknown
+        """
+        with self.key_lock:
+            entry = self.keys.get(user_id)
+            if entry is not None and entry[2] > time.monotonic():
+                self.keys.move_to_end(user_id)
+                return entry[0], True
+        return self._load_key(user_id)[0], False
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop the cached key of a user, or of all users."""
+        with self.key_lock:
+            if user_id is None:
+                self.keys.clear()
+            else:
+                self.keys.pop(user_id, None)
+
+    def refresh(self):
+        """Drop the cached keys of users whose stored key changed or who were deleted."""
+        with self.key_lock:
+            cached = {user_id: entry[1] for user_id, entry in self.keys.items()}
+        if not cached:
+            return
+        stored = DatabaseManager().get_public_keys(list(cached))
+        with self.key_lock:
+            for user_id, key_text in cached.items():
+                if stored.get(user_id) != key_text:
+                    self.keys.pop(user_id, None)
+
+    def _check_timestamp(self, timestamp: str) -> float:
+        try:
+            sent_at = float(timestamp)
+        except (TypeError, ValueError):
+            raise AuthenticationError("Invalid timestamp", f"Not a Unix timestamp: {timestamp!r}")
+        if abs(time.time() - sent_at) > self.replay_window:
+            raise AuthenticationError("Request expired", f"Timestamp is more than {self.replay_window:g} seconds off")
+        return sent_at
+
+    def _remember(self, key: Tuple[str, str]) -> bool:
+        """
+        Remember a verified request, in O(1) amortized.
+
+        Returns:
+            bool: False if the request was seen before, within the replay window
+        """
+        now = time.time()
+        # Every timestamp accepted now is too old after now + 2 windows, which keeps the expiries in order
+        expiry = now + 2 * self.replay_window
+        with self.seen_lock:
+            while self.seen_order and self.seen_order[0][0] <= now:
+                del self.seen[self.seen_order.popleft()[1]]
+            if key in self.seen:
+                return False
+            self.seen[key] = expiry
+            self.seen_order.append((expiry, key))
+            return True
+
+    def verify(self, request: BaseModel, authorization: str) -> None:
+        """
+        Verify that the request was signed with the private key of its user, and is not a replay.
+
+        Args:
+            request: The signed request, with user_id, timestamp and optionally nonce
+                (GenerateRequest or GenerateBatchRequest)
+            authorization: The Authorization header ("Bearer <base64 signature>")
+
+        Raises:
+            AuthenticationError: If the user is unknown, the signature is invalid,
+                the timestamp is out of range or the request was seen before
+        """
+        try:
+            # Split Bearer out of signature
+            signature = authorization.split(" ")[1]
+            signature_bytes = base64.b64decode(signature)
+        except (ValueError, IndexError, AttributeError, binascii.Error) as e:
+            raise AuthenticationError("Invalid signature", f"Malformed Authorization header: {e}")
+        self._check_timestamp(request.timestamp)
+
+        # Convert request to the same format as was signed, optional fields the client left out were not signed
+        request_data = json.dumps(request.model_dump(exclude_unset=True), sort_keys=True).encode("utf-8")
+        public_key, cached = self.public_key(request.user_id)
+        try:
+            with span("verify_signature"):
+                try:
+                    rsa.verify(request_data, signature_bytes, public_key)
+                except rsa.VerificationError:
+                    # The user may have a new key since it was cached, check once against the stored one
+                    stored_key = self._load_key(request.user_id)[0] if cached else public_key
+                    if stored_key == public_key:
+                        raise
+                    rsa.verify(request_data, signature_bytes, stored_key)
+        except rsa.VerificationError as e:
+            print("Signature verification failed:", str(e))
+            raise AuthenticationError("Invalid signature", str(e))
+
+        nonce = getattr(request, "nonce", None) or signature
+        if not self._remember((request.user_id, nonce)):
+            raise AuthenticationError("Replayed request", "This request was already received")
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+
+def generation_cache_key(prompt: str, width: float, height: float, context: str, model: str, template_version: str) -> str:
+    """Content address of a generation: everything the model's answer depends on."""
+    content = json.dumps([prompt, width, height, context, model, template_version], separators=(",", ":"))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """
+    Two-tier cache of generated canvas objects, keyed by generation_cache_key.
+
+    Recent entries are kept in an in-memory LRU. Every entry is also written to
+    a disk tier (one JSON file per key), which survives restarts and is shared
+    by the workers of one machine; once it grows past ``disk_max_bytes`` the
+    least recently used files are deleted.
+    """
+
+    def __init__(self, directory: Optional[str] = None, memory_entries: Optional[int] = None,
+                 disk_max_bytes: Optional[int] = None):
+        """
+        Args:
+            directory: Folder of the disk tier, defaults to GENERATION_CACHE_DIR
+            memory_entries: Entries kept in memory, defaults to GENERATION_CACHE_MEMORY_ENTRIES
+            disk_max_bytes: Size limit of the disk tier, defaults to GENERATION_CACHE_MAX_BYTES
+        """
+        self.directory = Path(directory or os.getenv("GENERATION_CACHE_DIR", "generation_cache"))
+        self.memory_entries = memory_entries if memory_entries is not None else int(os.getenv("GENERATION_CACHE_MEMORY_ENTRIES", "256"))
+        self.disk_max_bytes = disk_max_bytes if disk_max_bytes is not None else int(os.getenv("GENERATION_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self.memory = OrderedDict()  # key -> (value, size in bytes)
+        self.memory_bytes = 0
+        self.disk_bytes = sum(path.stat().st_size for path in self.directory.glob("*.json"))
+        self.cache_lock = Lock()
+
+        # Metrics
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _remember(self, key: str, value: dict, size: int):
+        """Put an entry in the memory tier, evicting the least recently used ones. Call with cache_lock held."""
+        if key in self.memory:
+            self.memory_bytes -= self.memory.pop(key)[1]
+        self.memory[key] = (value, size)
+        self.memory_bytes += size
+        while len(self.memory) > self.memory_entries:
+            self.memory_bytes -= self.memory.popitem(last=False)[1][1]
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Look up a cached generation.
+
+        Returns:
+            Optional[dict]: The cached canvas object, None on a miss
+        """
+        with self.cache_lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            value = json.loads(data)
+            # Reads refresh the modification time, which orders the disk tier's eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            with self.cache_lock:
+                self.misses += 1
+            return None
+
+        with self.cache_lock:
+            self.disk_hits += 1
+            self._remember(key, value, len(data))
+        return value
+
+    def put(self, key: str, value: dict):
+        """Store a generation in both tiers."""
+        data = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        path = self._path(key)
+        temporary_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            previous_size = path.stat().st_size if path.exists() else 0
+            temporary_path.write_bytes(data)
+            # Atomic, readers never see a partially written entry
+            os.replace(temporary_path, path)
+        except OSError as e:
+            print(f"Error writing generation cache entry: {e}")
+            previous_size = len(data)
+
+        with self.cache_lock:
+            self._remember(key, value, len(data))
+            self.disk_bytes += len(data) - previous_size
+            over_limit = self.disk_bytes > self.disk_max_bytes
+        if over_limit:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Delete the least recently used files until the disk tier is at 90% of its size limit."""
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = self.disk_max_bytes * 0.9
+        evicted = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        with self.cache_lock:
+            self.disk_bytes = total
+            self.evictions += evicted
+
+    def record_bypass(self):
+        """Count a request that skipped the cache on purpose."""
+        with self.cache_lock:
+            self.bypasses += 1
+
+    def metrics(self) -> dict:
+        """Hit rate, hits per tier and the size of both tiers."""
+        with self.cache_lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "hit_rate": hits / lookups if lookups else None,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory_bytes,
+                "disk_bytes": self.disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,267 @@
+import os
+from typing import Iterator, List, Optional
+from pydantic import TypeAdapter, ValidationError
+from ..schemas import CanvasObject, GenerateBatchRequest, GenerateRequest, PathCommand
+from ..schemas.canvas import Path
+from .cache import GenerationCache, generation_cache_key
+from .pipeline import GenerationPipeline
+from .scene import summarize_scene
+from .streaming import IncrementalJSONParser
+from .tracing import span
+import uuid
+import json
+from utils.db_manager import DatabaseManager
+
+
+def _load_session(db: DatabaseManager, session_id: str):
+    """The session and its objects in Fabric.js JSON form."""
+    with span("canvas_load"):
+        session = db.get_session(session_id)
+        if not session:
+            raise ValueError(f"Session not found: {session_id}")
+        rows = db.get_session_canvas_objects(session_id)
+    with span("canvas_parse"):
+        session_objects = [json.loads(d.object_data) for d in rows]
+    return session, session_objects
+
+
+def _prepare_prompt(prompt: str, session, session_objects: List[dict], pipeline: GenerationPipeline,
+                    cache: Optional[GenerationCache], bypass_cache: bool):
+    """
+    Build the chain input for a prompt and look it up in the cache.
+
+    Returns:
+        tuple: (chain input, cache key or None, cached canvas object or None)
+    """
+    # A summary of the board instead of every object's JSON keeps the prompt bounded
+    with span("scene_summary"):
+        existing_objects = summarize_scene(session_objects, session.width, session.height, prompt)
+    variables = {
+        "description": prompt,
+        "width": session.width,
+        "height": session.height,
+        "existing_objects": existing_objects,
+    }
+
+    # The same prompt on the same board, model and template gives the same answer
+    if not cache:
+        return variables, None, None
+    cache_key = generation_cache_key(
+        prompt, session.width, session.height, existing_objects, pipeline.config.model, pipeline.template_version
+    )
+    if bypass_cache:
+        cache.record_bypass()
+        return variables, cache_key, None
+    with span("cache_lookup"):
+        cached = cache.get(cache_key)
+        # from_dict replaces the path in the dict it is given, keep the cached entry intact
+        cached = CanvasObject.from_dict(dict(cached)) if cached is not None else None
+    return variables, cache_key, cached
+
+
+def _canvas_register(response: CanvasObject, session_id: str, user_id: str):
+    """
+    Simplify a generated object and turn it into a canvas_objects row.
+
+    Returns:
+        tuple: (row for DatabaseManager, number of points removed)
+    """
+    # Loads numpy, only needed once a generation actually runs
+    from utils.path_simplify import simplify_object
+
+    with span("simplify"):
+        object_data, points_removed = simplify_object(response.to_dict())
+    print(f"Path simplification removed {points_removed} points")
+    canvas_register = {
+        "id": str(uuid.uuid4()),
+        "session_id": session_id,
+        "object_data": json.dumps(object_data),
+        "created_by": user_id,
+    }
+    return canvas_register, points_removed
+
+
+def run_generation(request: GenerateRequest, pipeline: GenerationPipeline, cache: Optional[GenerationCache] = None) -> dict:
+    """
+    Generate a canvas object for a prompt and store it in the session.
+    Blocks for the whole LLM call, run it on a worker thread.
+
+    Args:
+        request: The (already verified) generation request
+        pipeline: The shared generation pipeline
+        cache: Cache of earlier generations, looked up unless the request bypasses it
+
+    Returns:
+        dict: The id of the stored object, the number of points removed by path simplification
+              and whether the object came from the cache
+    """
+    # Use the singleton instance of DatabaseManager
+    db = DatabaseManager()
+    session, session_objects = _load_session(db, request.session_id)
+    variables, cache_key, cached = _prepare_prompt(
+        request.prompt, session, session_objects, pipeline, cache, request.bypass_cache
+    )
+
+    if cached is not None:
+        response = cached
+    else:
+        # Includes parsing the answer, which is also timed on its own as "parse"
+        with span("llm"):
+            response = pipeline.chain.invoke(variables)
+        if cache:
+            cache.put(cache_key, response.to_dict())
+
+    canvas_register, points_removed = _canvas_register(response, request.session_id, request.user_id)
+    with span("db_insert"):
+        db.add_canvas_object(canvas_register)
+
+    return {"object_id": canvas_register["id"], "points_removed": points_removed, "cached": cached is not None}
+
+
+def default_batch_concurrency() -> int:
+    """Model calls a batch runs at the same time, from the GENERATION_BATCH_CONCURRENCY environment variable."""
+    return int(os.getenv("GENERATION_BATCH_CONCURRENCY", "5"))
+
+
+def run_batch_generation(request: GenerateBatchRequest, pipeline: GenerationPipeline,
+                         cache: Optional[GenerationCache] = None) -> dict:
+    """
+    Generate a canvas object for each prompt of a batch and store them in the session.
+
+    The session is loaded once, prompts missing from the cache are sent to
+    the model in parallel (at most GENERATION_BATCH_CONCURRENCY at a time)
+    and all generated objects are written in a single transaction. Every
+    prompt is generated against the board as it was before the batch.
+
+    Args:
+        request: The (already verified) batch request
+        pipeline: The shared generation pipeline
+        cache: Cache of earlier generations, looked up unless the request bypasses it
+
+    Returns:
+        dict: One result per prompt, in order, each with the stored object id or the error
+    """
+    db = DatabaseManager()
+    session, session_objects = _load_session(db, request.session_id)
+    prepared = [
+        _prepare_prompt(prompt, session, session_objects, pipeline, cache, request.bypass_cache)
+        for prompt in request.prompts
+    ]
+
+    # One parallel round of model calls for everything the cache could not answer
+    missing = [index for index, (_, _, cached) in enumerate(prepared) if cached is None]
+    responses = {index: cached for index, (_, _, cached) in enumerate(prepared) if cached is not None}
+    if missing:
+        with span("llm"):
+            generated = pipeline.chain.batch(
+                [prepared[index][0] for index in missing],
+                config={"max_concurrency": default_batch_concurrency()},
+                return_exceptions=True,
+            )
+        for index, response in zip(missing, generated):
+            responses[index] = response
+            if cache and not isinstance(response, Exception):
+                cache.put(prepared[index][1], response.to_dict())
+
+    results = []
+    canvas_registers = []
+    for index, prompt in enumerate(request.prompts):
+        response = responses[index]
+        if isinstance(response, Exception):
+            print(f"Generation failed for prompt {prompt!r}: {response}")
+            results.append({"prompt": prompt, "error": str(response)})
+            continue
+        canvas_register, points_removed = _canvas_register(response, request.session_id, request.user_id)
+        canvas_registers.append(canvas_register)
+        results.append({
+            "prompt": prompt,
+            "object_id": canvas_register["id"],
+            "points_removed": points_removed,
+            "cached": prepared[index][2] is not None,
+        })
+
+    with span("db_insert"):
+        written = db.add_canvas_objects(canvas_registers) if canvas_registers else 0
+    return {"results": results, "written": written}
+
+
+def _chunk_text(chunk) -> str:
+    """The text of a streamed message chunk, whose content is a string or a list of content blocks."""
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+def _validate_segment(segment) -> list:
+    """Validate a path command in the schema form ({"command_type": ...}) or as a list, returning the list form."""
+    if isinstance(segment, list):
+        return Path.from_list([segment]).to_list()[0]
+    return TypeAdapter(PathCommand).validate_python(segment).to_list()
+
+
+def _validate_object(data: dict) -> CanvasObject:
+    """Validate a streamed canvas object, with its path in the schema form or as a list of lists."""
+    if isinstance(data.get("path"), list):
+        return CanvasObject.from_dict(data)
+    return CanvasObject.model_validate(data)
+
+
+def stream_generation(request: GenerateRequest, pipeline: GenerationPipeline) -> Iterator[dict]:
+    """
+    Generate canvas objects for a prompt, storing and reporting each one as soon as the model finished it.
+
+    The model may answer with several objects. Its token stream is parsed
+    incrementally: every completed path command is validated and reported
+    as a "segment" event, every completed object is validated, stored
+    through DatabaseManager and reported as an "object" event. Streaming
+    does not use the generation cache, the answer is never complete before
+    the first objects are stored.
+
+    Args:
+        request: The (already verified) generation request
+        pipeline: The shared generation pipeline
+
+    Yields:
+        dict: Events with an "event" of "segment", "object", "invalid" or "done"
+    """
+    db = DatabaseManager()
+    session, session_objects = _load_session(db, request.session_id)
+    variables, _, _ = _prepare_prompt(request.prompt, session, session_objects, pipeline, cache=None, bypass_cache=False)
+
+    parser = IncrementalJSONParser()
+    stored = 0
+    object_index = 0
+    for chunk in pipeline.stream_chain.stream(variables):
+        for kind, value in parser.feed(_chunk_text(chunk)):
+            if kind == "segment":
+                try:
+                    yield {"event": "segment", "object_index": object_index, "command": _validate_segment(value)}
+                except (ValidationError, ValueError, IndexError, TypeError) as e:
+                    yield {"event": "invalid", "object_index": object_index, "error": f"Invalid path command: {e}"}
+                continue
+            if kind == "error":
+                yield {"event": "invalid", "object_index": object_index, "error": value}
+                object_index += 1
+                continue
+
+            try:
+                canvas_object = _validate_object(value)
+            except (ValidationError, ValueError, IndexError, TypeError) as e:
+                yield {"event": "invalid", "object_index": object_index, "error": str(e)}
+                object_index += 1
+                continue
+            canvas_register, points_removed = _canvas_register(canvas_object, request.session_id, request.user_id)
+            with span("db_insert"):
+                db.add_canvas_object(canvas_register)
+            stored += 1
+            yield {
+                "event": "object",
+                "object_index": object_index,
+                "object_id": canvas_register["id"],
+                "points_removed": points_removed,
+                "object": json.loads(canvas_register["object_data"]),
+            }
+            object_index += 1
+
+    yield {"event": "done", "objects": stored, "invalid": object_index - stored}
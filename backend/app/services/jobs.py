@@ -0,0 +1,205 @@
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from ..schemas import GenerateRequest
+from utils.classes import GenerationJob
+from utils.db_manager import DatabaseManager
+
+
+class JobQueue:
+    """
+    Runs generation requests on a bounded pool of worker threads.
+
+    Jobs are stored in the database before they are queued, so their status
+    can be polled and jobs that were queued or running when the API stopped
+    are picked up again by ``resume``.
+
+    With several API workers, every worker resumes the unfinished jobs, and a
+    job is claimed in the database before it runs so that only one of them
+    runs it. Each worker holds an exclusive lock on a lease file for as long
+    as it lives; the operating system releases it when the worker dies, and a
+    job left running by a worker whose lease is free is queued again, at
+    start and every ``stale_check_interval`` seconds. A worker that shuts
+    down cleanly removes its lease file once its running jobs finished.
+    """
+
+    def __init__(self, runner: Callable[[GenerateRequest], dict], max_workers: int = 2,
+                 lease_dir: Optional[str] = None, stale_check_interval: Optional[float] = None):
+        """
+        Args:
+            runner: Function running a single generation request and returning its result
+            max_workers: Number of generations running at the same time
+            lease_dir: Folder of the workers' lease files, defaults to JOB_LEASE_DIR
+            stale_check_interval: Seconds between checks for jobs of stopped workers,
+                                  defaults to JOB_STALE_CHECK_SECONDS, 0 disables them
+        """
+        self.runner = runner
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation")
+        self.db = DatabaseManager()
+        self.worker_id = str(uuid.uuid4())
+        self.lease_dir = lease_dir or os.getenv("JOB_LEASE_DIR") or os.path.join(tempfile.gettempdir(), "neurosketch-job-workers")
+        self.lease = self._take_lease()
+        self.stale_check_interval = (stale_check_interval if stale_check_interval is not None
+                                     else float(os.getenv("JOB_STALE_CHECK_SECONDS", "60")))
+        self._lock = threading.Lock()
+        self._running = 0  # Jobs this worker started and did not finish
+        self._stopped = threading.Event()
+        if self.stale_check_interval > 0 and fcntl is not None:
+            threading.Thread(target=self._check_stale_jobs, name="generation-stale-jobs", daemon=True).start()
+
+    def _lease_path(self, worker: str) -> str:
+        return os.path.join(self.lease_dir, f"{worker}.lock")
+
+    def _take_lease(self):
+        """Lock this worker's lease file, held until the worker shuts down or the process exits."""
+        if fcntl is None:
+            return None
+        os.makedirs(self.lease_dir, exist_ok=True)
+        path = self._lease_path(self.worker_id)
+        while True:
+            lease = open(path, "a+")
+            fcntl.flock(lease.fileno(), fcntl.LOCK_EX)
+            # Another worker may have found the file unlocked and removed it before it was locked
+            with contextlib.suppress(FileNotFoundError):
+                if os.path.samestat(os.fstat(lease.fileno()), os.stat(path)):
+                    return lease
+            lease.close()
+
+    def _release_lease(self):
+        """Remove this worker's lease file, its jobs are queued again by other workers from then on."""
+        lease, self.lease = self.lease, None
+        if lease is None:
+            return
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self._lease_path(self.worker_id))
+        lease.close()
+
+    def _is_alive(self, worker: Optional[str]) -> bool:
+        """Whether the worker that claimed a job still runs."""
+        if worker == self.worker_id:
+            return True
+        if worker is None or fcntl is None:
+            # Claimed before workers were tracked, or a single worker without file locks
+            return False
+        try:
+            lease = open(self._lease_path(worker), "r")
+        except FileNotFoundError:
+            return False
+        with lease:
+            try:
+                fcntl.flock(lease.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return True
+            # The worker is gone, so is the need for its lease file
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self._lease_path(worker))
+        return False
+
+    def submit(self, request: GenerateRequest) -> GenerationJob:
+        """Store a job for the request and queue it."""
+        job = GenerationJob(
+            id=str(uuid.uuid4()),
+            user_id=request.user_id,
+            session_id=request.session_id,
+            request=request.model_dump_json(),
+        )
+        self.db.create_generation_job(job)
+        self.executor.submit(self._run, job.id, request)
+        return job
+
+    def resume(self) -> int:
+        """
+        Queue the jobs that did not finish before the last shutdown: queued jobs,
+        and running jobs whose worker stopped. Jobs running on live workers are left alone.
+
+        Returns:
+            int: Number of jobs queued, other workers may claim some of them first
+        """
+        return self._queue_unfinished(include_queued=True)
+
+    def requeue_stale(self) -> int:
+        """
+        Queue the running jobs of workers that stopped since, and remove the lease files they left.
+
+        Returns:
+            int: Number of jobs queued, other workers may claim some of them first
+        """
+        queued = self._queue_unfinished(include_queued=False)
+        if fcntl is not None:
+            # Leases of stopped workers that had no running job
+            with contextlib.suppress(FileNotFoundError):
+                for name in os.listdir(self.lease_dir):
+                    if name.endswith(".lock"):
+                        self._is_alive(name[:-len(".lock")])
+        return queued
+
+    def _queue_unfinished(self, include_queued: bool) -> int:
+        queued = 0
+        for job in self.db.get_unfinished_generation_jobs():
+            if job.status == "running":
+                if self._is_alive(job.worker) or not self.db.requeue_generation_job(job.id, job.worker):
+                    continue
+            elif not include_queued:
+                # Queued on a live worker, which runs it
+                continue
+            self.executor.submit(self._run, job.id, GenerateRequest.model_validate_json(job.request))
+            queued += 1
+        return queued
+
+    def _check_stale_jobs(self):
+        while not self._stopped.wait(self.stale_check_interval):
+            try:
+                requeued = self.requeue_stale()
+            except Exception as e:
+                print(f"Failed to check for generation jobs of stopped workers: {e}")
+                continue
+            if requeued:
+                print(f"Queued {requeued} generation jobs of stopped workers again")
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        return self.db.get_generation_job(job_id)
+
+    def _run(self, job_id: str, request: GenerateRequest):
+        with self._lock:
+            if self._stopped.is_set():
+                return  # Stays queued for another worker or the next start
+            self._running += 1
+        try:
+            if not self.db.claim_generation_job(job_id, self.worker_id):
+                return  # Another worker runs it
+            try:
+                result = self.runner(request)
+            except Exception as e:
+                print(f"Generation job {job_id} failed: {e}")
+                self.db.update_generation_job(job_id, "failed", error=str(e))
+                return
+            self.db.update_generation_job(job_id, "succeeded", result=json.dumps(result))
+        finally:
+            with self._lock:
+                self._running -= 1
+                release = self._stopped.is_set() and not self._running
+            if release:
+                self._release_lease()
+
+    def shutdown(self):
+        """
+        Stop accepting jobs. Queued jobs stay in the database and are resumed on the next start.
+        The lease is released once the jobs still running finished, they are not queued again before.
+        """
+        with self._lock:
+            self._stopped.set()
+            release = not self._running
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if release:
+            self._release_lease()
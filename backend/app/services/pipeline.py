@@ -0,0 +1,121 @@
+import hashlib
+import os
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass
+from threading import Lock, Thread
+from typing import Optional
+
+from utils.env import load_environment
+
+from ..schemas import setup_langchain_parser, create_prompt_template, create_stream_prompt_template
+from .tracing import span
+
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    """Settings of the generation pipeline, read from the environment."""
+    model: str = "claude-3-5-sonnet-20240620"
+    timeout: float = 120.0  # seconds per LLM request
+    max_retries: int = 2
+
+    @classmethod
+    def from_env(cls) -> 'PipelineConfig':
+        return cls(
+            model=os.getenv("GENERATION_MODEL", cls.model),
+            timeout=float(os.getenv("GENERATION_TIMEOUT", cls.timeout)),
+            max_retries=int(os.getenv("GENERATION_MAX_RETRIES", cls.max_retries)),
+        )
+
+
+class GenerationPipeline:
+    """
+    The prompt template, model and output parser chained together, built once and shared by all requests.
+
+    Building the parser generates the JSON schema of CanvasObject, and every
+    ChatAnthropic instance opens its own connections, so doing either per
+    request is wasted work. The parser and template do not depend on the
+    configuration and are built only once; ``reload`` rebuilds the model from
+    the current environment without restarting the API.
+    """
+
+    def __init__(self, config: Optional[PipelineConfig] = None):
+        self.parser, self.format_instructions = setup_langchain_parser()
+        self.prompt_template = create_prompt_template(self.format_instructions)
+        self.stream_prompt_template = create_stream_prompt_template(self.format_instructions)
+        # Changes whenever the prompt or the output schema change, part of the generation cache key
+        self.template_version = hashlib.sha256(
+            (self.prompt_template.template + self.format_instructions).encode("utf-8")
+        ).hexdigest()[:16]
+        # The output parser as the last step of the chain, timed as its own phase of a request
+        from langchain_core.runnables import RunnableLambda
+        self._parse_step = RunnableLambda(self._parse, name="parse")
+        self.reload_lock = Lock()
+        self._build(config or PipelineConfig.from_env())
+
+    @property
+    def chain(self):
+        """The current prompt | model | parser chain. Fetch it once per request, a reload swaps it."""
+        return self._chain
+
+    @property
+    def stream_chain(self):
+        """The current prompt | model chain of streaming generation, its output is parsed as it arrives."""
+        return self._stream_chain
+
+    @property
+    def config(self) -> PipelineConfig:
+        return self._config
+
+    def _build(self, config: PipelineConfig):
+        # The SDKs take most of the API's import time, they are only loaded once a pipeline is built
+        from langchain_anthropic import ChatAnthropic
+
+        # Every ChatAnthropic with the same API URL and timeout shares one connection pool,
+        # so a reload keeps warm connections. Concurrent calls are bounded by the admission controller
+        llm = ChatAnthropic(model=config.model, default_request_timeout=config.timeout, max_retries=config.max_retries)
+
+        self.llm = llm
+        self._chain = self.prompt_template | llm | self._parse_step
+        self._stream_chain = self.stream_prompt_template | llm
+        self._config = config
+
+    def _parse(self, message):
+        with span("parse"):
+            return self.parser.invoke(message)
+
+    def reload(self) -> PipelineConfig:
+        """
+        Re-read the .env file and environment and rebuild the model with the new settings.
+        Requests already running finish with the chain they started with.
+
+        Returns:
+            PipelineConfig: The configuration now in use
+        """
+        with self.reload_lock:
+            load_environment(override=True)
+            self._build(PipelineConfig.from_env())
+            print("Generation pipeline reloaded:", asdict(self._config))
+            return self._config
+
+def build_pipeline_in_background() -> 'Future[GenerationPipeline]':
+    """
+    Build the generation pipeline on a background thread.
+
+    Loading langchain and the Anthropic SDK takes longer than the rest of the
+    API startup, so the API starts serving right away and only generation
+    requests wait for the pipeline.
+
+    Returns:
+        Future[GenerationPipeline]: Resolves to the pipeline once it is built
+    """
+    future = Future()
+
+    def build():
+        try:
+            future.set_result(GenerationPipeline())
+        except Exception as e:
+            print(f"Error building the generation pipeline: {e}")
+            future.set_exception(e)
+
+    Thread(target=build, name="pipeline-build", daemon=True).start()
+    return future
@@ -0,0 +1,269 @@
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Rough size of a token for English text and numbers, avoids loading a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Region words in a prompt, mapped to the third of the canvas they point at
+HORIZONTAL_WORDS = {"left": 1 / 6, "right": 5 / 6}
+VERTICAL_WORDS = {"top": 1 / 6, "upper": 1 / 6, "above": 1 / 6, "bottom": 5 / 6, "lower": 5 / 6, "below": 5 / 6}
+CENTER_WORDS = ("center", "centre", "middle")
+
+REGION_NAMES = [
+    ["top-left", "top", "top-right"],
+    ["left", "center", "right"],
+    ["bottom-left", "bottom", "bottom-right"],
+]
+
+
+def default_token_budget() -> int:
+    """Token budget of a scene summary, from the SCENE_TOKEN_BUDGET environment variable."""
+    return int(os.getenv("SCENE_TOKEN_BUDGET", "600"))
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+@dataclass
+class SceneItem:
+    """A single object, or a cluster of nearby strokes, as it appears in the summary."""
+    type: str
+    left: float
+    top: float
+    right: float
+    bottom: float
+    colors: List[str] = field(default_factory=list)
+    stroke_width: Optional[float] = None
+    count: int = 1
+
+    @property
+    def center(self) -> Tuple[float, float]:
+        return (self.left + self.right) / 2, (self.top + self.bottom) / 2
+
+    @property
+    def area(self) -> float:
+        return (self.right - self.left) * (self.bottom - self.top)
+
+    def bbox(self) -> str:
+        return f"({self.left:.0f},{self.top:.0f},{self.right - self.left:.0f},{self.bottom - self.top:.0f})"
+
+    def detailed(self) -> str:
+        label = f"{self.type} x{self.count}" if self.count > 1 else self.type
+        line = f"- {label} bbox={self.bbox()}"
+        if self.colors:
+            line += " colors=" + ",".join(self.colors)
+        if self.stroke_width:
+            line += f" strokeWidth={self.stroke_width:g}"
+        return line
+
+    def brief(self) -> str:
+        label = f"{self.type} x{self.count}" if self.count > 1 else self.type
+        return f"- {label} {self.bbox()}" + (f" {self.colors[0]}" if self.colors else "")
+
+
+def _colors(obj: dict) -> List[str]:
+    colors = []
+    for key in ("stroke", "fill"):
+        value = obj.get(key)
+        if isinstance(value, str) and value and value != "transparent" and value not in colors:
+            colors.append(value)
+    return colors
+
+
+def object_bbox(obj: dict) -> Tuple[float, float, float, float]:
+    """
+    Axis aligned bounding box of a Fabric.js object, honoring origin, scale, flips, rotation and skew.
+
+    Returns:
+        Tuple[float, float, float, float]: left, top, right, bottom
+    """
+    from utils.geometry import object_bounds
+
+    left, top, right, bottom = object_bounds([obj])[0].tolist()
+    return left, top, right, bottom
+
+
+def _to_items(objects: List[dict]) -> List[SceneItem]:
+    # The bounds of the whole board at once, numpy is imported on the first summary only
+    from utils.geometry import object_bounds
+
+    return [
+        SceneItem(
+            type=obj.get("type", "object"),
+            left=left, top=top, right=right, bottom=bottom,
+            colors=_colors(obj),
+            stroke_width=obj.get("strokeWidth"),
+        )
+        for obj, (left, top, right, bottom) in zip(objects, object_bounds(objects).tolist())
+    ]
+
+
+def _label_cells(grid) -> Dict[Tuple[int, int], int]:
+    """Label the connected components of the occupied cells of a grid, neighbours included diagonally."""
+    labels: Dict[Tuple[int, int], int] = {}
+    occupied = set(zip(*(axis.tolist() for axis in grid.nonzero())))
+    for start in occupied:
+        if start in labels:
+            continue
+        label = len(labels)
+        labels[start] = label
+        pending = [start]
+        while pending:
+            row, column = pending.pop()
+            for neighbour in ((row + dy, column + dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)):
+                if neighbour in occupied and neighbour not in labels:
+                    labels[neighbour] = label
+                    pending.append(neighbour)
+    return labels
+
+
+def cluster_strokes(items: List[SceneItem], gap: float, max_cells: int = 128) -> List[SceneItem]:
+    """
+    Merge path strokes of the same color that lie within roughly ``gap`` of each other.
+    Freehand drawings consist of many small strokes, a cluster describes them as one shape.
+
+    Every stroke marks the cells of a grid (cell size ``gap``, at most
+    ``max_cells`` cells per side) its bounding box covers. Strokes whose cells
+    touch end up in the same connected component, which keeps clustering
+    linear in the number of strokes instead of comparing every pair.
+    """
+    import numpy as np
+
+    strokes = [item for item in items if item.type == "path"]
+    others = [item for item in items if item.type != "path"]
+    if not strokes:
+        return others
+
+    min_x = min(stroke.left for stroke in strokes)
+    min_y = min(stroke.top for stroke in strokes)
+    extent = max(max(stroke.right for stroke in strokes) - min_x, max(stroke.bottom for stroke in strokes) - min_y)
+    cell_size = max(gap, extent / (max_cells - 1), 1e-9)
+    size = int(extent / cell_size) + 1
+
+    def cells(stroke):
+        return (int((stroke.top - min_y) / cell_size), int((stroke.bottom - min_y) / cell_size),
+                int((stroke.left - min_x) / cell_size), int((stroke.right - min_x) / cell_size))
+
+    by_color: Dict[str, List[SceneItem]] = {}
+    for stroke in strokes:
+        by_color.setdefault(stroke.colors[0] if stroke.colors else "", []).append(stroke)
+
+    clusters: List[SceneItem] = []
+    for group in by_color.values():
+        grid = np.zeros((size, size), dtype=bool)
+        for stroke in group:
+            top, bottom, left, right = cells(stroke)
+            grid[top:bottom + 1, left:right + 1] = True
+        labels = _label_cells(grid)
+
+        group_clusters: Dict[int, SceneItem] = {}
+        for stroke in group:
+            top, _, left, _ = cells(stroke)
+            label = labels[(top, left)]
+            cluster = group_clusters.get(label)
+            if cluster is None:
+                group_clusters[label] = SceneItem(
+                    type="path", left=stroke.left, top=stroke.top, right=stroke.right, bottom=stroke.bottom,
+                    colors=list(stroke.colors), stroke_width=stroke.stroke_width,
+                )
+                continue
+            cluster.left, cluster.top = min(cluster.left, stroke.left), min(cluster.top, stroke.top)
+            cluster.right, cluster.bottom = max(cluster.right, stroke.right), max(cluster.bottom, stroke.bottom)
+            cluster.count += 1
+            for color in stroke.colors:
+                if color not in cluster.colors:
+                    cluster.colors.append(color)
+        clusters.extend(group_clusters.values())
+
+    return others + clusters
+
+
+def focus_point(prompt: str, canvas_width: float, canvas_height: float) -> Optional[Tuple[float, float]]:
+    """
+    The point of the canvas a prompt refers to ("in the top left corner", "at the bottom"), None if it names none.
+    """
+    words = set(re.findall(r"[a-z]+", prompt.lower()))
+    x = next((fraction for word, fraction in HORIZONTAL_WORDS.items() if word in words), None)
+    y = next((fraction for word, fraction in VERTICAL_WORDS.items() if word in words), None)
+    if x is None and y is None and not words.intersection(CENTER_WORDS):
+        return None
+    return (x if x is not None else 0.5) * canvas_width, (y if y is not None else 0.5) * canvas_height
+
+
+def _region(item: SceneItem, canvas_width: float, canvas_height: float) -> str:
+    x, y = item.center
+    column = min(max(int(3 * x / max(canvas_width, 1)), 0), 2)
+    row = min(max(int(3 * y / max(canvas_height, 1)), 0), 2)
+    return REGION_NAMES[row][column]
+
+
+def summarize_scene(objects: List[dict], canvas_width: float, canvas_height: float,
+                    prompt: str = "", token_budget: Optional[int] = None) -> str:
+    """
+    Describe the objects on a canvas in a compact text that fits a token budget.
+
+    Each object, or cluster of nearby strokes, is listed with its type,
+    bounding box and colors. Objects closest to the region the prompt refers
+    to (or the largest objects, if it refers to none) are described in full
+    detail first, then briefly, and the remaining ones only as counts per
+    region of the canvas, so the summary stays bounded however large the
+    board grows.
+
+    Args:
+        objects: Canvas objects in Fabric.js JSON form
+        canvas_width: Width of the canvas
+        canvas_height: Height of the canvas
+        prompt: The generation prompt, used to find the region to describe in detail
+        token_budget: Maximum size of the summary in tokens, defaults to SCENE_TOKEN_BUDGET
+
+    Returns:
+        str: The summary
+    """
+    budget = token_budget if token_budget is not None else default_token_budget()
+    if not objects:
+        return "The canvas is empty."
+
+    gap = 0.02 * math.hypot(canvas_width, canvas_height)
+    items = cluster_strokes(_to_items(objects), gap)
+
+    focus = focus_point(prompt, canvas_width, canvas_height)
+    if focus:
+        items.sort(key=lambda item: math.dist(item.center, focus))
+    else:
+        items.sort(key=lambda item: item.area, reverse=True)
+
+    lines = [f"{len(objects)} objects (bbox = left,top,width,height):"]
+    used = estimate_tokens(lines[0])
+    # Keep room for the per region counts of the objects that are left out
+    reserve = min(budget // 4, 15 * len(REGION_NAMES) * 3)
+
+    listed = 0
+    for render in (SceneItem.detailed, SceneItem.brief):
+        while listed < len(items):
+            line = render(items[listed])
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget - reserve:
+                break
+            lines.append(line)
+            used += cost
+            listed += 1
+
+    remaining: Dict[str, Dict[str, int]] = {}
+    for item in items[listed:]:
+        counts = remaining.setdefault(_region(item, canvas_width, canvas_height), {})
+        counts[item.type] = counts.get(item.type, 0) + item.count
+    for region, counts in sorted(remaining.items(), key=lambda entry: -sum(entry[1].values())):
+        line = f"- {region}: " + ", ".join(f"{count} {kind}" for kind, count in sorted(counts.items(), key=lambda entry: -entry[1])) + " more"
+        cost = estimate_tokens(line) + 1
+        # Two tokens stay free for the "..." marker
+        if used + cost + 2 > budget:
+            lines.append("- ...")
+            break
+        lines.append(line)
+        used += cost
+
+    return "\n".join(lines)
@@ -0,0 +1,95 @@
+import json
+from typing import Iterator, List, Optional, Tuple
+
+
+class _Container:
+    """An object or array that is open at the current position of the stream."""
+    __slots__ = ("kind", "start", "key", "last_string", "current_key")
+
+    def __init__(self, kind: str, start: int, key: Optional[str]):
+        self.kind = kind  # "{" or "["
+        self.start = start  # Index of the opening bracket in the buffered text
+        self.key = key  # Key this container is the value of, in its parent object
+        self.last_string = None
+        self.current_key = None
+
+
+class IncrementalJSONParser:
+    """
+    Finds complete JSON objects in text that arrives in chunks, such as an LLM token stream.
+
+    Top-level objects, or the objects of a top-level array, are reported as
+    soon as their closing brace arrives. Inside them, every element of an
+    array stored under one of ``segment_keys`` (the commands of a path, as
+    {"commands": [...]} in the schema form or as a list of lists) is
+    reported as soon as it is complete, before the object itself is finished.
+    Text outside of JSON values, like prose or Markdown code fences, is ignored.
+    """
+
+    def __init__(self, segment_keys: Tuple[str, ...] = ("commands", "path")):
+        self.segment_keys = segment_keys
+        self.text = ""
+        self.position = 0
+        self.stack: List[_Container] = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+
+    def feed(self, chunk: str) -> Iterator[Tuple[str, object]]:
+        """
+        Add a chunk of text and report what it completed.
+
+        Yields:
+            Tuple[str, object]: ("segment", value) for a complete path command,
+            ("object", dict) for a complete object and ("error", str) for a
+            complete value that is not valid JSON
+        """
+        self.text += chunk
+        text = self.text
+        stack = self.stack
+        for index in range(self.position, len(text)):
+            char = text[index]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    stack[-1].last_string = text[self.string_start + 1:index]
+                continue
+
+            if not stack:
+                if char in "{[":
+                    stack.append(_Container(char, index, None))
+                continue
+
+            top = stack[-1]
+            if char == '"':
+                self.in_string = True
+                self.string_start = index
+            elif char in "{[":
+                stack.append(_Container(char, index, top.current_key if top.kind == "{" else None))
+            elif char == ":" and top.kind == "{":
+                top.current_key = top.last_string
+            elif char == "," and top.kind == "{":
+                top.current_key = None
+            elif char in "}]":
+                closed = stack.pop()
+                parent = stack[-1] if stack else None
+                is_segment = parent is not None and parent.kind == "[" and parent.key in self.segment_keys
+                is_object = closed.kind == "{" and (parent is None or (parent.kind == "[" and len(stack) == 1))
+                if is_segment or is_object:
+                    try:
+                        value = json.loads(text[closed.start:index + 1])
+                    except ValueError as e:
+                        yield "error", f"Invalid JSON: {e}"
+                    else:
+                        yield ("segment" if is_segment else "object"), value
+
+        # Nothing is open anymore, the text read so far is not needed
+        if not stack and not self.in_string:
+            self.text = ""
+            self.position = 0
+        else:
+            self.position = len(text)
@@ -0,0 +1,162 @@
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds of the histogram buckets in milliseconds, the last bucket is unbounded
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Trace:
+    """The phases timed while handling one request."""
+    __slots__ = ("started", "spans")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []  # (phase, seconds), appended from any thread
+
+    def phases(self) -> Dict[str, Tuple[float, int]]:
+        """Total seconds and number of spans per phase, phases timed several times (batches) are added up."""
+        phases: Dict[str, Tuple[float, int]] = {}
+        for name, seconds in list(self.spans):
+            total, count = phases.get(name, (0.0, 0))
+            phases[name] = (total + seconds, count + 1)
+        return phases
+
+    def server_timing(self) -> str:
+        """The Server-Timing header value for the phases finished so far, and the total time until now."""
+        entries = [
+            f'{name};dur={seconds * 1000:.2f}' + (f';desc="x{count}"' if count > 1 else "")
+            for name, (seconds, count) in self.phases().items()
+        ]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+        return ", ".join(entries)
+
+
+# The trace of the request being handled. Copied into worker threads by run_in_threadpool,
+# the spans of a request end up in its trace wherever they run
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+_NO_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("trace", "name", "started")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.trace.spans.append((self.name, time.perf_counter() - self.started))
+        return False
+
+
+def span(name: str):
+    """
+    Time a phase of the current request, as a context manager.
+
+    Outside of a traced request, or with tracing disabled, this returns a
+    shared no-op context manager, costing a single context variable lookup.
+    Spans may nest, every span is reported on its own.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name)
+
+
+class Tracer:
+    """
+    Per-phase timing of requests: Server-Timing headers, histograms and JSON timing logs.
+
+    TRACING_ENABLED (default on) turns tracing on; when it is off the
+    middleware passes requests straight through and ``span`` does nothing.
+    TRACING_LOG (default off) prints one JSON line with the phase timings of
+    every request.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, log: Optional[bool] = None):
+        self.enabled = enabled if enabled is not None else os.getenv("TRACING_ENABLED", "1").lower() in ("1", "true", "yes")
+        self.log = log if log is not None else os.getenv("TRACING_LOG", "").lower() in ("1", "true", "yes")
+        self.histograms: Dict[str, List[int]] = {}  # phase -> count per bucket
+        self.totals: Dict[str, Tuple[float, int]] = {}  # phase -> (total seconds, count)
+        self.histogram_lock = Lock()
+
+    def record(self, method: str, path: str, status: int, trace: Trace):
+        """Add the phases of a finished request to the histograms, and log them."""
+        total = time.perf_counter() - trace.started
+        phases = trace.phases()
+        with self.histogram_lock:
+            for name, seconds in [(name, seconds) for name, (seconds, _) in phases.items()] + [("total", total)]:
+                buckets = self.histograms.setdefault(name, [0] * (len(HISTOGRAM_BUCKETS_MS) + 1))
+                buckets[bisect_left(HISTOGRAM_BUCKETS_MS, seconds * 1000)] += 1
+                phase_total, count = self.totals.get(name, (0.0, 0))
+                self.totals[name] = (phase_total + seconds, count + 1)
+
+        if self.log:
+            print(json.dumps({
+                "event": "request_timing",
+                "method": method,
+                "path": path,
+                "status": status,
+                "total_ms": round(total * 1000, 3),
+                "phases_ms": {name: round(seconds * 1000, 3) for name, (seconds, _) in phases.items()},
+            }))
+
+    def metrics(self) -> dict:
+        """Histogram, count and mean of every phase, bucket keys are upper bounds in milliseconds."""
+        labels = [f"le_{bound}" for bound in HISTOGRAM_BUCKETS_MS] + ["le_inf"]
+        with self.histogram_lock:
+            return {
+                "enabled": self.enabled,
+                "phases": {
+                    name: {
+                        "count": self.totals[name][1],
+                        "mean_ms": self.totals[name][0] * 1000 / self.totals[name][1],
+                        "buckets": dict(zip(labels, buckets)),
+                    }
+                    for name, buckets in self.histograms.items()
+                },
+            }
+
+
+class TracingMiddleware:
+    """ASGI middleware giving every HTTP request a trace and adding its Server-Timing header."""
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        token = _current_trace.set(trace)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Phases still running, like the body of a streaming response, are not in the header
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            self.tracer.record(scope["method"], scope["path"], status, trace)
@@ -0,0 +1,138 @@
+"""
+Bounding boxes of a large board, object by object in Python compared to the batched NumPy kernel.
+
+Run from the backend folder:
+
+    python -m benchmarks.geometry [objects] [segments per stroke]
+
+Half of the objects are rotated, scaled and skewed rectangles, the other
+half freehand strokes of quadratic curves. Both sides compute the transformed
+bounds of every object and the bounds (curve extrema included) and length of
+every stroke.
+"""
+import math
+import random
+import statistics
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+from utils.geometry import ORIGIN_FRACTIONS, object_bounds, path_bounds, path_lengths, path_segments
+
+
+def make_board(objects: int, segments: int) -> List[dict]:
+    random_generator = random.Random(0)
+    board = []
+    for i in range(objects):
+        obj = {
+            "type": "rect", "left": random_generator.uniform(0, 800), "top": random_generator.uniform(0, 600),
+            "width": random_generator.uniform(5, 80), "height": random_generator.uniform(5, 80),
+            "scaleX": random_generator.uniform(0.5, 2), "scaleY": random_generator.uniform(0.5, 2),
+            "angle": random_generator.uniform(0, 360), "skewX": random_generator.uniform(-20, 20),
+            "originX": "center", "originY": "center",
+        }
+        if i % 2:
+            x, y = obj["left"], obj["top"]
+            path = [["M", x, y]]
+            for _ in range(segments):
+                control_x, control_y = x + random_generator.uniform(-3, 3), y + random_generator.uniform(-3, 3)
+                x, y = control_x + random_generator.uniform(-3, 3), control_y + random_generator.uniform(-3, 3)
+                path.append(["Q", control_x, control_y, x, y])
+            obj.update(type="path", path=path)
+        board.append(obj)
+    return board
+
+
+def object_bounds_python(obj: dict):
+    """Transformed bounds of one object, the four corners through its matrix."""
+    tan_x, tan_y = math.tan(math.radians(obj.get("skewX", 0))), math.tan(math.radians(obj.get("skewY", 0)))
+    scale_x = obj.get("scaleX", 1) * (-1 if obj.get("flipX") else 1)
+    scale_y = obj.get("scaleY", 1) * (-1 if obj.get("flipY") else 1)
+    s00, s01, s10, s11 = scale_x * (1 + tan_x * tan_y), scale_x * tan_x, scale_y * tan_y, scale_y
+    width, height = obj["width"], obj["height"]
+    offset_x = (0.5 - ORIGIN_FRACTIONS[obj.get("originX", "left")]) * (abs(s00) * width + abs(s01) * height)
+    offset_y = (0.5 - ORIGIN_FRACTIONS[obj.get("originY", "top")]) * (abs(s10) * width + abs(s11) * height)
+    cos, sin = math.cos(math.radians(obj.get("angle", 0))), math.sin(math.radians(obj.get("angle", 0)))
+    center_x = obj["left"] + cos * offset_x - sin * offset_y
+    center_y = obj["top"] + sin * offset_x + cos * offset_y
+    xs, ys = [], []
+    for x, y in ((-width / 2, -height / 2), (width / 2, -height / 2), (width / 2, height / 2), (-width / 2, height / 2)):
+        x, y = s00 * x + s01 * y, s10 * x + s11 * y
+        xs.append(center_x + cos * x - sin * y)
+        ys.append(center_y + sin * x + cos * y)
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def path_bounds_python(path: list):
+    """Bounds and length of one path of M and Q commands."""
+    left = right = path[0][1]
+    top = bottom = path[0][2]
+    length = 0.0
+    x0, y0 = path[0][1], path[0][2]
+    for _, cx, cy, x, y in path[1:]:
+        for start, control, end, axis in ((x0, cx, x, 0), (y0, cy, y, 1)):
+            candidates = [start, end]
+            denominator = start - 2 * control + end
+            if denominator:
+                t = min(max((start - control) / denominator, 0), 1)
+                candidates.append((1 - t) ** 2 * start + 2 * (1 - t) * t * control + t * t * end)
+            if axis == 0:
+                left, right = min(left, *candidates), max(right, *candidates)
+            else:
+                top, bottom = min(top, *candidates), max(bottom, *candidates)
+        # Same quadrature as the kernel
+        for node, weight in zip((0.0469100770306680, 0.2307653449471585, 0.5, 0.7692346550528415, 0.9530899229693320),
+                                (0.1184634425280945, 0.2393143352496832, 0.2844444444444444, 0.2393143352496832, 0.1184634425280945)):
+            dx = 2 * ((1 - node) * (cx - x0) + node * (x - cx))
+            dy = 2 * ((1 - node) * (cy - y0) + node * (y - cy))
+            length += weight * math.hypot(dx, dy)
+        x0, y0 = x, y
+    return (left, top, right, bottom), length
+
+
+def loop(board):
+    bounds = [object_bounds_python(obj) for obj in board]
+    paths = [path_bounds_python(obj["path"]) for obj in board if obj.get("path")]
+    return bounds, paths
+
+
+def batch(board):
+    bounds = object_bounds(board)
+    segments = path_segments([obj["path"] for obj in board if obj.get("path")])
+    return bounds, path_bounds(segments), path_lengths(segments)
+
+
+def measure(function, board, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function(board)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    segments = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    iterations = 3
+    board = make_board(objects, segments)
+    print(f"{objects} objects, half of them strokes of {segments} segments")
+
+    # Both compute the same thing
+    bounds, paths = loop(board)
+    batch_bounds, batch_path_bounds, batch_lengths = batch(board)
+    np.testing.assert_allclose(batch_bounds, bounds, atol=1e-6)
+    np.testing.assert_allclose(batch_path_bounds, [path for path, _ in paths], atol=1e-6)
+    np.testing.assert_allclose(batch_lengths, [length for _, length in paths], rtol=1e-9)
+
+    python = measure(loop, board, iterations)
+    numpy = measure(batch, board, iterations)
+    print(f"{'python':<8} {python * 1000:10.1f} ms")
+    print(f"{'numpy':<8} {numpy * 1000:10.1f} ms")
+    print(f"{python / numpy:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Loading and serializing path objects of a large board, with one model per path command
+(how Path used to store them) compared to the array backed Path.
+
+Run from the backend folder:
+
+    python -m benchmarks.path_model [objects] [segments per stroke]
+
+Every object is a freehand stroke of quadratic curves, loaded with
+CanvasObject.from_dict from its stored list of lists form and written back
+with to_dict and model_dump_json.
+"""
+import json
+import random
+import statistics
+import sys
+import time
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from app.schemas import CanvasObject
+from app.schemas.canvas import ClosePathCommand, LineCommand, MoveCommand, PathCommand, QuadraticCurveCommand
+
+
+class ModelPath(BaseModel):
+    """The previous Path: a validated model per command."""
+    commands: List[PathCommand] = Field(..., min_length=1)
+
+    @classmethod
+    def from_list(cls, commands):
+        path_commands = []
+        for cmd in commands:
+            if cmd[0] == "M":
+                path_commands.append(MoveCommand(x=cmd[1], y=cmd[2]))
+            elif cmd[0] == "L":
+                path_commands.append(LineCommand(x=cmd[1], y=cmd[2]))
+            elif cmd[0] == "Q":
+                path_commands.append(QuadraticCurveCommand(control_x=cmd[1], control_y=cmd[2], end_x=cmd[3], end_y=cmd[4]))
+            elif cmd[0] == "Z":
+                path_commands.append(ClosePathCommand())
+            else:
+                raise ValueError(f"Unknown command type: {cmd[0]}")
+        return cls(commands=path_commands)
+
+    def to_list(self):
+        return [cmd.to_list() for cmd in self.commands]
+
+
+class ModelCanvasObject(CanvasObject):
+    """CanvasObject with the previous Path and serialization."""
+    path: Optional[ModelPath] = None
+
+    @classmethod
+    def from_dict(cls, data):
+        data["path"] = ModelPath.from_list(data["path"])
+        return cls(**data)
+
+    def to_dict(self):
+        result = self.model_dump(exclude_none=True)
+        result["path"] = self.path.to_list()
+        return result
+
+    def model_dump_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+def make_board(objects: int, segments: int) -> List[dict]:
+    random_generator = random.Random(0)
+    board = []
+    for _ in range(objects):
+        x, y = random_generator.uniform(0, 800), random_generator.uniform(0, 600)
+        path = [["M", x, y]]
+        for _ in range(segments):
+            control_x, control_y = x + random_generator.uniform(-3, 3), y + random_generator.uniform(-3, 3)
+            x, y = control_x + random_generator.uniform(-3, 3), control_y + random_generator.uniform(-3, 3)
+            path.append(["Q", control_x, control_y, x, y])
+        path.append(["L", x, y])
+        board.append({"type": "path", "left": 0, "top": 0, "width": 800, "height": 600, "stroke": "#000000", "path": path})
+    return board
+
+
+def load_and_dump(model, board):
+    loaded = [model.from_dict(dict(data)) for data in board]
+    for obj in loaded:
+        obj.to_dict()
+        obj.model_dump_json()
+
+
+def measure(model, board, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        load_and_dump(model, board)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    segments = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    iterations = 3
+    board = make_board(objects, segments)
+    print(f"{objects} strokes of {segments} segments ({objects * (segments + 2)} path commands)")
+
+    models = measure(ModelCanvasObject, board, iterations)
+    arrays = measure(CanvasObject, board, iterations)
+    print(f"{'models':<8} {models * 1000:10.1f} ms")
+    print(f"{'arrays':<8} {arrays * 1000:10.1f} ms")
+    print(f"{models / arrays:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Per-request overhead of building the generation pipeline, compared to reusing the one built at startup.
+
+Run from the backend folder:
+
+    python -m benchmarks.pipeline_setup [iterations]
+
+Only the setup is measured, no request is sent to the model. Connection
+reuse by the shared HTTP client comes on top of the savings reported here.
+"""
+import statistics
+import sys
+import time
+
+from langchain_anthropic import ChatAnthropic
+
+from app.schemas import setup_langchain_parser, create_prompt_template
+from app.services import GenerationPipeline
+
+PROMPT_VARIABLES = {"description": "a red house with a chimney", "width": 800, "height": 600}
+
+
+def build_per_request():
+    """What every /generate call did before the pipeline was shared."""
+    llm = ChatAnthropic(model="claude-3-5-sonnet-20240620")
+    parser, format_instructions = setup_langchain_parser()
+    prompt_template = create_prompt_template(format_instructions)
+    chain = prompt_template | llm | parser
+    return chain, prompt_template.invoke(PROMPT_VARIABLES)
+
+
+def use_shared(pipeline):
+    chain = pipeline.chain
+    return chain, pipeline.prompt_template.invoke(PROMPT_VARIABLES)
+
+
+def measure(function, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(name, timings):
+    print(f"{name:<12} mean {statistics.mean(timings) * 1000:8.3f} ms   median {statistics.median(timings) * 1000:8.3f} ms")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    started = time.perf_counter()
+    pipeline = GenerationPipeline()
+    print(f"Startup build: {(time.perf_counter() - started) * 1000:.3f} ms (once per process)")
+
+    per_request = measure(build_per_request, iterations)
+    shared = measure(lambda: use_shared(pipeline), iterations)
+    report("per request", per_request)
+    report("shared", shared)
+    saved = statistics.mean(per_request) - statistics.mean(shared)
+    print(f"Saved per request: {saved * 1000:.3f} ms ({statistics.mean(per_request) / statistics.mean(shared):.1f}x less setup)")
+    pipeline.close()
+
+
+if __name__ == "__main__":
+    main()
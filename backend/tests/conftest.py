@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Make the database initialization script and the frontend modules importable
+sys.path.append(str(Path(__file__).parent.parent.parent / "db"))
+sys.path.append(str(Path(__file__).parent.parent.parent / "frontend"))
+
+from db_init import initialize_database
+from utils.db_manager import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A DatabaseManager backed by a fresh database file."""
+    db_path = tmp_path / "neurosketch.db"
+    initialize_database(str(db_path))
+    monkeypatch.setenv("PATH_TO_DB", str(db_path))
+    monkeypatch.setenv("GENERATION_CACHE_DIR", str(tmp_path / "generation_cache"))
+    # DatabaseManager is a singleton, start from a clean instance for every test
+    monkeypatch.setattr(DatabaseManager, "_instance", None)
+    return DatabaseManager()
+
+
+@pytest.fixture
+def signed_user(db):
+    """A user stored in the database and a function signing request payloads with their key."""
+    import base64
+    import json
+    import rsa
+    from utils.classes import Session, User
+
+    public_key, private_key = rsa.newkeys(512)
+    db.create_user(User(id="user-1", public_key=public_key.save_pkcs1().decode(), client_identifier="client-1"))
+    db.create_session(Session(id="session-1", title="Test", participants=["user-1"]))
+
+    def sign(payload: dict) -> dict:
+        """Return the Authorization header for a payload, signed like the frontend does."""
+        signature = rsa.sign(json.dumps(payload, sort_keys=True).encode("utf-8"), private_key, "SHA-256")
+        return {"Authorization": f"Bearer {base64.b64encode(signature).decode('utf-8')}"}
+
+    return sign
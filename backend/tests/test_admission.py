@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes.generate import get_admission_controller, get_pipeline
+from app.services import AdmissionController, AdmissionRejected
+
+
+def test_requests_over_the_limit_wait_in_order():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_per_user=5, max_queue=2, queue_timeout=5)
+        first = await controller.acquire("user-1")
+        second = asyncio.ensure_future(controller.acquire("user-2"))
+        third = asyncio.ensure_future(controller.acquire("user-3"))
+        await asyncio.sleep(0.01)
+        assert controller.metrics()["queue_depth"] == 2
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("user-4")
+        assert rejected.value.reason == "queue_full"
+        assert rejected.value.retry_after >= 1
+
+        first.release()
+        await asyncio.sleep(0.01)
+        assert second.done() and not third.done()
+        (await second).release()
+        (await third).release()
+        return controller.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert metrics["running"] == 0
+    assert metrics["admitted"] == 3
+    assert metrics["rejected"] == {"user_limit": 0, "queue_full": 1, "queue_timeout": 0}
+
+
+def test_user_limit_and_queue_timeout():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_per_user=1, max_queue=5, queue_timeout=0.05)
+        ticket = await controller.acquire("user-1")
+
+        with pytest.raises(AdmissionRejected, match="user_limit"):
+            await controller.acquire("user-1")
+        with pytest.raises(AdmissionRejected, match="queue_timeout"):
+            await controller.acquire("user-2")
+
+        ticket.release()
+        # The timed out request left the queue, the slot is free again
+        (await controller.acquire("user-2")).release()
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.running == 0
+    assert controller.per_user == {}
+    assert controller.metrics()["queue_depth"] == 0
+
+
+def test_rejected_requests_get_429_with_retry_after(signed_user):
+    app.dependency_overrides[get_pipeline] = lambda: None
+    app.dependency_overrides[get_admission_controller] = lambda: AdmissionController(max_per_user=0)
+    payload = {"user_id": "user-1", "session_id": "session-1", "timestamp": str(time.time()), "prompt": "a square"}
+    try:
+        with TestClient(app) as client:
+            response = client.post("/generate", json=payload, headers=signed_user(payload))
+            metrics = client.get("/metrics").json()["admission"]
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert metrics["queue_depth"] == 0
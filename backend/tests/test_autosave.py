@@ -0,0 +1,77 @@
+import threading
+import time
+
+from autosave import AutoSaver, coalesce_changes, empty_changes
+
+
+def _modified(object_id, version=1, **changes):
+    return {"id": object_id, "object": dict(changes), "version": version,
+            "changes": changes, "stamps": dict.fromkeys(changes, f"stamp-{object_id}-{sorted(changes)}")}
+
+
+def test_coalesce_keeps_latest_state_and_combines_property_edits():
+    changes = empty_changes()
+    changes["modified"] = [_modified("a", left=1), _modified("a", top=2), _modified("a", left=3), _modified("b", left=0)]
+
+    coalesced = coalesce_changes(changes)
+
+    [a, b] = coalesced["modified"]
+    assert a["changes"] == {"left": 3, "top": 2}
+    assert a["object"] == {"left": 3}
+    assert set(a["stamps"]) == {"left", "top"}
+    assert b["id"] == "b"
+
+
+def test_coalesce_folds_edits_of_new_objects_and_drops_deleted_ones():
+    changes = {
+        "new": [{"id": "n1", "left": 0}, {"id": "n2", "left": 0}, {"left": 5}, {"left": 6}],
+        "modified": [_modified("n1", left=10) | {"object": {"id": "n1", "left": 10}}, _modified("old", left=1)],
+        "deleted": [{"id": "n2", "version": 1}, {"id": "old", "version": 1}],
+    }
+
+    coalesced = coalesce_changes(changes)
+
+    # Objects without an ID are never merged with each other
+    assert coalesced["new"] == [{"id": "n1", "left": 10}, {"left": 5}, {"left": 6}]
+    assert coalesced["modified"] == []
+    assert coalesced["deleted"] == [{"id": "old", "version": 1}]
+
+
+def test_autosaver_flushes_once_after_the_debounce():
+    batches = []
+    saver = AutoSaver(lambda batch: batches.append(batch) or {}, debounce_seconds=0.05)
+
+    saver.queue({"new": [{"id": "n1"}]})
+    saver.queue({"modified": [_modified("n1", left=2) | {"object": {"id": "n1", "left": 2}}]})
+    assert saver.has_pending and not batches
+
+    time.sleep(0.3)
+    assert batches == [{"new": [{"id": "n1", "left": 2}], "modified": [], "deleted": []}]
+    assert not saver.has_pending
+
+
+def test_autosaver_retries_failed_batches_with_written_versions():
+    calls = []
+    fail = threading.Event()
+    fail.set()
+
+    def flush(batch):
+        calls.append(batch)
+        if fail.is_set():
+            raise RuntimeError("database is locked")
+        return {entry["id"]: entry["version"] + 1 for entry in batch["modified"]}
+
+    saver = AutoSaver(flush, debounce_seconds=60)
+    saver.queue({"modified": [_modified("a", version=1, left=1)]})
+    saver.flush()
+    assert isinstance(saver.last_error, RuntimeError) and saver.has_pending
+
+    fail.clear()
+    saver.flush()
+    assert saver.last_error is None and not saver.has_pending
+    assert len(calls) == 2 and calls[1]["modified"][0]["changes"] == {"left": 1}
+
+    # Entries recorded against the version loaded in the UI are moved on past the written one
+    saver.queue({"modified": [_modified("a", version=1, left=5)]})
+    saver.stop()
+    assert calls[2]["modified"][0]["version"] == 2
@@ -0,0 +1,76 @@
+import time
+
+from fastapi.testclient import TestClient
+from langchain_core.runnables import RunnableLambda
+
+from app.main import app
+from app.routes.generate import get_pipeline
+from app.schemas import CanvasObject, GenerateBatchRequest
+from app.services import GenerationCache, PipelineConfig, run_batch_generation
+
+
+def _generate(variables):
+    # Stands in for a model round trip
+    time.sleep(0.2)
+    if variables["description"] == "fail":
+        raise ValueError("model error")
+    return CanvasObject.from_dict({"type": "rect", "left": len(variables["description"]), "top": 0, "width": 10, "height": 10})
+
+
+class FakePipeline:
+    def __init__(self):
+        self.calls = []
+        self.chain = RunnableLambda(lambda variables: self.calls.append(variables) or _generate(variables))
+        self.config = PipelineConfig()
+        self.template_version = "v1"
+
+
+def _request(prompts, **kwargs):
+    return GenerateBatchRequest(user_id="user-1", session_id="session-1", timestamp="1", prompts=prompts, **kwargs)
+
+
+def test_batch_runs_model_calls_in_parallel(signed_user, db, monkeypatch):
+    monkeypatch.setenv("GENERATION_BATCH_CONCURRENCY", "10")
+    prompts = [f"object {'x' * i}" for i in range(10)]
+
+    started = time.perf_counter()
+    result = run_batch_generation(_request(prompts), FakePipeline())
+    elapsed = time.perf_counter() - started
+
+    # Ten round trips of 0.2 s in about the time of one
+    assert elapsed < 1.0
+    assert result["written"] == 10
+    assert [item["prompt"] for item in result["results"]] == prompts
+    assert len(db.get_session_canvas_objects("session-1")) == 10
+
+
+def test_batch_reports_failed_prompts_and_uses_cache(signed_user, db, tmp_path):
+    cache = GenerationCache(str(tmp_path / "cache"))
+    pipeline = FakePipeline()
+    run_batch_generation(_request(["a circle"]), pipeline, cache)
+    [stored] = db.get_session_canvas_objects("session-1")
+    db.delete_canvas_object(stored.id, 2)
+
+    result = run_batch_generation(_request(["a circle", "fail", "a square"]), pipeline, cache)
+
+    assert [item.get("cached") for item in result["results"]] == [True, None, False]
+    assert result["results"][1]["error"] == "model error"
+    assert result["written"] == 2
+    # The cached prompt was not sent to the model again
+    assert sorted(call["description"] for call in pipeline.calls) == ["a circle", "a square", "fail"]
+
+
+def test_batch_endpoint_checks_one_signature(signed_user):
+    pipeline = FakePipeline()
+    app.dependency_overrides[get_pipeline] = lambda: pipeline
+    payload = {"user_id": "user-1", "session_id": "session-1", "timestamp": str(time.time()), "prompts": ["a", "fail"]}
+    try:
+        with TestClient(app) as client:
+            response = client.post("/generate/batch", json=payload, headers=signed_user(payload)).json()
+            forged = client.post("/generate/batch", json=dict(payload, prompts=["b"]), headers=signed_user(payload)).json()
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response["status"] == "partial"
+    assert response["message"] == "Generated 1 of 2 objects"
+    assert forged["status"] == "error"
@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+
+from bulk_loader import _KINDS, load_csv, load_json
+from canvas import CanvasObject
+
+FIELDS = ["", "type", "left", "top", "stroke", "fill", "strokeWidth", "flipX", "backgroundColor", "path"]
+ROWS = [
+    ["0", "path", "10.5", "20", "#000000", "None", "3", "False", "", "[['M', 1.0, 2.0], ['Q', 3, 4, 5.5, -6e-1]]"],
+    # A path written over several lines, empty cells
+    ["1", "path", "", "1", "", "", "", "True", "null", "[['M', 0, 0],\n ['L', 7, 8],\r\n ['z']]"],
+    ["2", "rect", "5", "", "red", "blue", "1", "", "white", ""],
+]
+
+
+def _csv_text():
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    writer.writerows(ROWS)
+    return buffer.getvalue()
+
+
+def _assert_same(loaded, expected):
+    """Compare with CanvasObject.from_dict, whose numbers and booleans stay as the text they were read from."""
+    assert len(loaded) == len(expected)
+    for obj, reference in zip(loaded, expected):
+        for name, kind in _KINDS.items():
+            value, reference_value = getattr(obj, name), getattr(reference, name)
+            if isinstance(reference_value, str) and kind in ("float", "int"):
+                reference_value = float(reference_value) if reference_value else getattr(CanvasObject, name)
+            elif isinstance(reference_value, str) and kind == "bool":
+                reference_value = reference_value == "True" if reference_value else getattr(CanvasObject, name)
+            assert value == reference_value, (name, value, reference_value)
+        assert obj.path == reference.path
+
+
+def test_csv_loads_like_from_dict():
+    text = _csv_text()
+    expected = [CanvasObject.from_dict(row) for row in csv.DictReader(io.StringIO(text))]
+
+    loaded = load_csv(io.StringIO(text))
+
+    _assert_same(loaded, expected)
+    # Empty text cells stay empty, "None" and "null" are None
+    assert (loaded[1].stroke, loaded[1].fill, loaded[1].backgroundColor) == ("", "", None)
+    assert loaded[0].fill is None
+    assert loaded[1].path == [["M", 0.0, 0.0], ["L", 7.0, 8.0], ["z"]]
+    assert loaded[2].path is None
+    # Empty numbers take the field's default
+    assert loaded[1].left == 0.0 and loaded[1].strokeWidth == 1
+
+
+def test_json_loads_like_from_dict():
+    objects = [
+        {"type": "path", "left": 1.5, "stroke": "", "fill": None, "path": [["M", 1, 2], ["L", 3, 4]]},
+        {"type": "rect", "top": 4, "flipX": True, "backgroundColor": "null"},
+    ]
+    expected = [CanvasObject.from_dict(obj) for obj in objects]
+
+    loaded = load_json(io.StringIO(json.dumps({"objects": objects})))
+
+    _assert_same(loaded, expected)
+    # Missing properties take the field's default
+    assert loaded[1].stroke == CanvasObject.stroke and loaded[1].path is None
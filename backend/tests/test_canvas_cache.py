@@ -0,0 +1,150 @@
+import json
+import sys
+import threading
+import time
+
+import pytest
+
+from canvas_cache import CanvasSnapshot, CanvasView, SharedCanvasCache
+from utils.classes import CanvasObjectDB
+
+
+def _objects(count, size=10):
+    # Every object's JSON is ``size`` bytes long
+    return [CanvasObjectDB(id=f"obj-{i}", session_id="session-1", created_by="user-1",
+                           object_data=json.dumps({"t": "x" * (size - 9)})) for i in range(count)]
+
+
+def test_snapshot_is_dropped_once_its_last_viewer_leaves():
+    cache = SharedCanvasCache(max_bytes=1000, viewer_ttl=60)
+    first = cache.acquire("tab-1", ("session-1", 1), lambda: _objects(2))
+    assert cache.acquire("tab-2", ("session-1", 1), lambda: pytest.fail("loaded twice")) is first
+    assert cache.size == first.size == 20
+
+    # tab-1 moves on to a newer revision, tab-2 still views the old one
+    cache.acquire("tab-1", ("session-1", 2), lambda: _objects(3))
+    assert cache.get("tab-2") is first
+    cache.acquire("tab-2", ("session-1", 2), lambda: pytest.fail("loaded twice"))
+    cache.release("tab-1")
+
+    metrics = cache.metrics()
+    assert (metrics["snapshots"], metrics["viewers"], metrics["size"]) == (1, 1, 30)
+    assert (metrics["loads"], metrics["hits"], metrics["evictions"]) == (2, 2, 1)
+    cache.release("tab-2")
+    assert cache.metrics()["snapshots"] == 0 and cache.size == 0
+
+
+def test_least_recently_used_snapshots_go_over_the_memory_limit():
+    cache = SharedCanvasCache(max_bytes=50, viewer_ttl=60)
+    cache.acquire("tab-1", ("session-1", 1), lambda: _objects(2))
+    cache.acquire("tab-2", ("session-2", 1), lambda: _objects(2))
+    cache.get("tab-1")  # session-1 is now the most recently used
+
+    cache.acquire("tab-3", ("session-3", 1), lambda: _objects(2))
+
+    assert cache.get("tab-2") is None
+    assert cache.get("tab-1") is not None and cache.get("tab-3") is not None
+    assert cache.metrics()["pressure_evictions"] == 1 and cache.size == 40
+
+    # A snapshot over the limit on its own is kept while it is viewed
+    big = cache.acquire("tab-4", ("session-4", 1), lambda: _objects(10))
+    assert cache.get("tab-4") is big and cache.size == big.size == 100
+
+
+def test_viewers_that_did_not_rerun_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = SharedCanvasCache(max_bytes=1000, viewer_ttl=60)
+    cache.acquire("tab-1", ("session-1", 1), lambda: _objects(1))
+    cache.acquire("tab-2", ("session-1", 1), lambda: _objects(1))
+
+    now[0] += 45
+    assert cache.get("tab-2") is not None  # a rerun keeps the viewer alive
+    now[0] += 45
+    assert cache.get("tab-1") is None
+    assert cache.metrics()["snapshots"] == 1
+
+    now[0] += 61
+    assert cache.get("tab-2") is None
+    assert cache.metrics() | {"max_bytes": 0} == {"snapshots": 0, "viewers": 0, "size": 0, "max_bytes": 0,
+                                                  "hits": 1, "loads": 1, "evictions": 1, "pressure_evictions": 0}
+
+
+def test_concurrent_tabs_load_a_revision_once():
+    cache = SharedCanvasCache(max_bytes=1000, viewer_ttl=60)
+    loads, started = [], threading.Event()
+
+    def load():
+        loads.append(threading.current_thread().name)
+        started.set()
+        time.sleep(0.1)
+        if len(loads) == 1:
+            raise OSError("database is locked")
+        return _objects(3)
+
+    results, errors = {}, []
+
+    def view(viewer_id):
+        try:
+            results[viewer_id] = cache.acquire(viewer_id, ("session-1", 1), load)
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=view, args=(f"tab-{i}",), name=f"tab-{i}") for i in range(8)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The first load failed, one of the waiting tabs loaded it again for all others
+    assert len(errors) == 1 and len(loads) == 2
+    assert len({id(snapshot) for snapshot in results.values()}) == 1 and len(results) == 7
+    metrics = cache.metrics()
+    assert (metrics["loads"], metrics["hits"], metrics["viewers"], metrics["size"]) == (1, 6, 7, 30)
+
+
+def test_woken_tabs_find_the_snapshot_instead_of_loading_it():
+    # Switch threads often, so woken tabs run right after the loading one
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(50):
+            cache = SharedCanvasCache(max_bytes=1000, viewer_ttl=60)
+            barrier = threading.Barrier(8)
+
+            def view(viewer_id):
+                barrier.wait()
+                cache.acquire(viewer_id, ("session-1", 1), lambda: time.sleep(0.005) or _objects(1))
+
+            threads = [threading.Thread(target=view, args=(f"tab-{i}",)) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            metrics = cache.metrics()
+            assert (metrics["loads"], metrics["viewers"], metrics["size"]) == (1, 8, 10)
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+
+def test_drawn_objects_keep_their_ids_across_reruns():
+    view = CanvasView()
+    first = {"type": "path", "path": [["M", 0, 0], ["L", 1, 1]], "left": 0}
+    second = {"type": "rect", "fill": "red", "left": 5}
+    twin = dict(second)
+    stored = {"id": "obj-1", "type": "circle", "radius": 3}
+    ids = [obj["id"] for obj in view.assign_ids([first, second, twin, stored], None)]
+    assert ids[3] == "obj-1" and len(set(ids)) == 4
+
+    # Deleting an object does not shift the IDs of the others, moving one keeps its ID
+    moved = dict(second, left=50, top=8)
+    assert [obj["id"] for obj in view.assign_ids([moved, twin], None)] == ids[1:3]
+    assert [obj["id"] for obj in view.assign_ids([first, second, twin], None)] == ids[:3]
+
+    # Saved objects are in the snapshot and reported with their ID, their entries go
+    saved = CanvasObjectDB(id=ids[0], session_id="session-1", created_by="user-1", object_data=json.dumps(first))
+    snapshot = CanvasSnapshot(("session-1", 2), [saved])
+    assert [obj["id"] for obj in view.assign_ids([dict(first, id=ids[0]), second], snapshot)] == ids[:2]
+    assert sum(map(len, view.assigned_ids.values())) == 2
@@ -0,0 +1,57 @@
+import time
+
+from utils.change_feed import ChangeFeed
+from utils.classes import Session
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_one_leader_fans_out_changes_and_fails_over(db, tmp_path):
+    calls = {"a": 0, "b": 0}
+
+    def feed(name):
+        def callback():
+            calls[name] += 1
+        return ChangeFeed(callback, lock_path=str(tmp_path / "leader.lock"), socket_path=str(tmp_path / "changes.sock"),
+                          debounce_seconds=0.05, retry_seconds=0.05)
+
+    leader, follower = feed("a"), feed("b")
+    leader.start()
+    _wait_for(lambda: leader.is_leader)
+    follower.start()
+    _wait_for(lambda: leader.metrics()["followers"] == 1)
+    assert not follower.is_leader
+
+    leader.publish()
+    _wait_for(lambda: calls["b"] == 1)
+    assert calls["a"] == 1
+
+    # The leader goes away, the follower takes over the lock and the watcher
+    leader.stop()
+    _wait_for(lambda: follower.is_leader)
+    db.create_session(Session(id="session-1", title="Test"))
+    _wait_for(lambda: calls["b"] >= 2)
+    assert calls["a"] == 1
+    follower.stop()
+    assert follower.metrics()["elections_won"] == 1
+
+
+def test_leader_that_fails_to_start_releases_the_lock(tmp_path, monkeypatch):
+    monkeypatch.delenv("PATH_TO_DB", raising=False)
+    paths = {"lock_path": str(tmp_path / "leader.lock"), "socket_path": str(tmp_path / "changes.sock")}
+
+    # No database to watch, leading fails
+    failed = ChangeFeed(lambda: None, **paths)
+    failed.start()
+    failed.thread.join(timeout=5)
+    assert not failed.is_leader and failed.lock_file is None
+
+    # Another worker can take the lock over
+    other = ChangeFeed(lambda: None, **paths)
+    assert other._try_lock()
+    other.lock_file.close()
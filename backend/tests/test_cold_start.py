@@ -0,0 +1,34 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from utils.import_profile import profile_import
+
+BACKEND_DIR = Path(__file__).parent.parent
+FRONTEND_DIR = BACKEND_DIR.parent / "frontend"
+
+# Seconds a cold import may take, generous enough for slow CI machines
+API_BUDGET = float(os.getenv("API_COLD_START_BUDGET", "1.5"))
+UI_BUDGET = float(os.getenv("UI_COLD_START_BUDGET", "4.0"))
+
+
+def test_api_cold_start_within_budget():
+    profile = profile_import("app.main", cwd=str(BACKEND_DIR))
+
+    # The model SDKs are loaded by the pipeline build after startup, numpy by the first generation
+    loaded = [name for name in ("langchain_core", "langchain_anthropic", "anthropic", "numpy") if name in profile.modules]
+    assert loaded == []
+    assert profile.import_seconds < API_BUDGET, profile.slowest(10)
+
+
+def test_ui_cold_start_within_budget(db):
+    pytest.importorskip("streamlit")
+    pytest.importorskip("streamlit_drawable_canvas")
+    pytest.importorskip("extra_streamlit_components")
+
+    profile = profile_import("app", cwd=str(FRONTEND_DIR))
+
+    loaded = [name for name in ("utils.path_simplify", "utils.key_pool", "rsa") if name in profile.modules]
+    assert loaded == []
+    assert profile.import_seconds < UI_BUDGET, profile.slowest(10)
@@ -0,0 +1,214 @@
+import json
+
+import pytest
+
+from utils.classes import Session
+
+
+def _add_path_object(db, object_id="obj-1"):
+    db.create_session(Session(id="session-1", title="Test", participants=["user-1"]))
+    object_data = {"type": "path", "left": 10, "top": 20, "path": [["M", 0, 0], ["Q", 1, 1, 2, 2]]}
+    db.add_canvas_object({
+        "id": object_id,
+        "session_id": "session-1",
+        "object_data": json.dumps(object_data),
+        "created_by": "user-1",
+    })
+    return object_data
+
+
+def test_edit_stores_patch_and_materializes_on_read(db):
+    object_data = _add_path_object(db)
+
+    moved = dict(object_data, left=50, top=60)
+    assert db.edit_canvas_object("obj-1", json.dumps(moved), 2)
+
+    # Only the changed properties are written
+    with db._get_connection() as conn:
+        patches = conn.execute("SELECT patch FROM canvas_object_patches").fetchall()
+        base = conn.execute("SELECT object_data, version FROM canvas_objects").fetchone()
+    assert [json.loads(p[0]) for p in patches] == [{"left": 50, "top": 60}]
+    assert json.loads(base[0]) == object_data and base[1] == 1
+
+    [obj] = db.get_session_canvas_objects("session-1")
+    assert json.loads(obj.object_data) == moved
+    assert obj.version == 2
+
+
+def test_version_checks_use_latest_patch(db):
+    object_data = _add_path_object(db)
+    assert db.edit_canvas_object("obj-1", json.dumps(dict(object_data, left=1)), 2)
+
+    assert not db.edit_canvas_object("obj-1", json.dumps(dict(object_data, left=2)), 2)
+    assert not db.delete_canvas_object("obj-1", 2)
+    assert db.delete_canvas_object("obj-1", 3)
+
+    with db._get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM canvas_object_patches").fetchone()[0] == 0
+
+
+def test_patches_are_folded_at_threshold(db):
+    object_data = _add_path_object(db)
+    db.patch_fold_threshold = 3
+
+    for version in range(2, 5):
+        assert db.edit_canvas_object("obj-1", json.dumps(dict(object_data, left=version)), version)
+
+    with db._get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM canvas_object_patches").fetchone()[0] == 0
+        base = conn.execute("SELECT object_data, version FROM canvas_objects").fetchone()
+    assert json.loads(base[0])["left"] == 4 and base[1] == 4
+
+
+def test_revision_changes_with_canvas_objects(db):
+    object_data = _add_path_object(db)
+    revision = db.get_session_revision("session-1")
+    assert revision > 0
+
+    db.edit_canvas_object("obj-1", json.dumps(dict(object_data, left=1)), 2)
+    assert db.get_session_revision("session-1") > revision
+
+    revision = db.get_session_revision("session-1")
+    db.delete_canvas_object("obj-1", 3)
+    assert db.get_session_revision("session-1") > revision
+    assert db.get_session("session-1").revision == db.get_session_revision("session-1")
+
+
+def test_dedupe_keeps_highest_version_in_one_statement(db):
+    object_data = _add_path_object(db, "obj-1")
+    for object_id in ("obj-2", "obj-3"):
+        db.add_canvas_object({
+            "id": object_id,
+            "session_id": "session-1",
+            "object_data": json.dumps(dict(object_data, left=99)),
+            "created_by": "user-1",
+        })
+    db.edit_canvas_object("obj-2", json.dumps(dict(object_data, left=5)), 2)
+
+    assert db.dedupe_session_objects("session-1") == 2
+    assert [obj.id for obj in db.get_session_canvas_objects("session-1")] == ["obj-2"]
+
+
+def test_unique_content_rejects_duplicate_inserts(db):
+    object_data = _add_path_object(db)
+    db.enforce_unique_canvas_content()
+
+    duplicate = {"id": "obj-2", "session_id": "session-1", "object_data": json.dumps(object_data), "created_by": "user-1"}
+    assert not db.add_canvas_object(duplicate)
+
+
+def test_unique_content_rejects_edits_to_a_duplicate_path(db):
+    from utils.hlc import HybridLogicalClock
+
+    object_data = _add_path_object(db, "obj-1")
+    other_path = [["M", 5, 5], ["L", 9, 9]]
+    db.add_canvas_object({"id": "obj-2", "session_id": "session-1", "created_by": "user-1",
+                          "object_data": json.dumps(dict(object_data, path=other_path))})
+    db.enforce_unique_canvas_content()
+    revision = db.get_session_revision("session-1")
+    hashes = {obj.id: obj.content_hash for obj in db.get_session_canvas_objects("session-1")}
+
+    # Nothing of the rejected edit is written, a retry is rejected the same way
+    for _ in range(2):
+        assert not db.edit_canvas_object("obj-2", json.dumps(object_data), 2)
+    assert db.get_canvas_object("obj-2").version == 1
+    assert db.get_session_revision("session-1") == revision
+
+    # A merge keeps its other properties
+    result = db.merge_canvas_object("obj-2", {"path": object_data["path"], "left": 40}, str(HybridLogicalClock().now()))
+    assert result.applied == ["left"] and result.rejected == ["path"]
+    stored = json.loads(db.get_canvas_object("obj-2").object_data)
+    assert stored["path"] == other_path and stored["left"] == 40
+    assert {obj.id: obj.content_hash for obj in db.get_session_canvas_objects("session-1")} == hashes
+
+
+def test_add_canvas_objects_writes_all_or_nothing(db):
+    object_data = _add_path_object(db)
+    revision = db.get_session_revision("session-1")
+    rows = [
+        {"id": f"rect-{i}", "session_id": "session-1", "object_data": json.dumps({"type": "rect", "left": i}), "created_by": "user-1"}
+        for i in range(3)
+    ]
+    assert db.add_canvas_objects(rows) == 3
+    assert db.get_session_revision("session-1") == revision + 3
+
+    # The duplicate id fails the batch, the first row is rolled back with it
+    failing = [dict(rows[0], id="rect-new"), rows[1]]
+    try:
+        db.add_canvas_objects(failing)
+    except Exception:
+        pass
+    assert len(db.get_session_canvas_objects("session-1")) == 4
+
+    # With unique content enforced, duplicates are skipped instead
+    db.unique_canvas_content = True
+    db.enforce_unique_canvas_content()
+    duplicate = {"id": "obj-2", "session_id": "session-1", "object_data": json.dumps(object_data), "created_by": "user-1"}
+    assert db.add_canvas_objects([duplicate, dict(rows[0], id="rect-3")]) == 1
+
+
+def test_concurrent_edits_of_different_properties_both_apply(db):
+    from utils.hlc import HybridLogicalClock
+
+    object_data = _add_path_object(db)
+    alice, bob = HybridLogicalClock("alice"), HybridLogicalClock("bob")
+    # Both edit the version they loaded, neither has seen the other's edit
+    moved = db.merge_canvas_object("obj-1", {"left": 50, "top": 60}, str(alice.now()))
+    restyled = db.merge_canvas_object("obj-1", {"stroke": "#ff0000"}, str(bob.now()))
+
+    assert moved.applied == ["left", "top"] and restyled.applied == ["stroke"]
+    assert restyled.version == 3
+    obj = db.get_canvas_object("obj-1")
+    assert json.loads(obj.object_data) == dict(object_data, left=50, top=60, stroke="#ff0000")
+
+
+def test_conflicting_edits_resolve_the_same_in_any_order(db):
+    from utils.hlc import Timestamp
+
+    earlier, later = str(Timestamp(1000, 0, "alice")), str(Timestamp(1000, 0, "bob"))
+    object_data = _add_path_object(db)
+    db.add_canvas_object({"id": "obj-2", "session_id": "session-1", "object_data": json.dumps(object_data), "created_by": "user-1"})
+
+    # obj-1 gets the later edit first, obj-2 last
+    assert db.merge_canvas_object("obj-1", {"left": 2}, later).applied == ["left"]
+    result = db.merge_canvas_object("obj-1", {"left": 1, "top": 5}, {"left": earlier, "top": earlier})
+    assert result.applied == ["top"] and result.rejected == ["left"]
+    db.merge_canvas_object("obj-2", {"left": 1}, earlier)
+    db.merge_canvas_object("obj-2", {"left": 2}, later)
+
+    assert json.loads(db.get_canvas_object("obj-1").object_data)["left"] == 2
+    assert json.loads(db.get_canvas_object("obj-2").object_data)["left"] == 2
+
+
+def test_merges_respect_versioned_edits_and_clock_drift(db):
+    from utils.hlc import Timestamp
+
+    object_data = _add_path_object(db)
+    stale = str(Timestamp(1000, 0, "alice"))
+    assert db.edit_canvas_object("obj-1", json.dumps(dict(object_data, left=7)), 2)
+
+    # Made before the versioned edit, which stamped the properties it changed
+    assert db.merge_canvas_object("obj-1", {"left": 1}, stale).rejected == ["left"]
+    # Stamped far in the future
+    future = str(Timestamp(10 ** 15, 0, "alice"))
+    assert db.merge_canvas_object("obj-1", {"fill": "#000"}, future).rejected == ["fill"]
+    assert db.merge_canvas_object("missing", {"left": 1}, stale) is None
+    assert json.loads(db.get_canvas_object("obj-1").object_data)["left"] == 7
+
+
+def test_edit_writes_patch_and_stamps_together(db, monkeypatch):
+    import sqlite3
+
+    object_data = _add_path_object(db)
+    assert db.edit_canvas_object("obj-1", json.dumps(dict(object_data, left=7, top=3)), 2)
+    with db._get_connection() as conn:
+        assert sorted(row[0] for row in conn.execute(
+            "SELECT property FROM canvas_object_clocks WHERE object_id = 'obj-1'"
+        )) == ["left", "top"]
+
+    # A patch is never stored without the timestamps of its properties
+    monkeypatch.setattr(db, "_STAMP_SQL", "INSERT INTO missing_clocks VALUES (?, ?, ?)")
+    with pytest.raises(sqlite3.OperationalError):
+        db.edit_canvas_object("obj-1", json.dumps(dict(object_data, left=8)), 3)
+    assert db.get_canvas_object("obj-1").version == 2
+    assert json.loads(db.get_canvas_object("obj-1").object_data)["left"] == 7
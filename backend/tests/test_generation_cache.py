@@ -0,0 +1,104 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes.generate import get_pipeline
+from app.schemas import CanvasObject, GenerateRequest
+from app.services import GenerationCache, PipelineConfig, generation_cache_key, run_generation
+
+RECT = {"type": "rect", "left": 10, "top": 20, "width": 30, "height": 40}
+
+
+class CountingChain:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, variables):
+        self.calls += 1
+        return CanvasObject.from_dict(dict(RECT))
+
+
+class FakePipeline:
+    def __init__(self, model="model-a"):
+        self.chain = CountingChain()
+        self.config = PipelineConfig(model=model)
+        self.template_version = "v1"
+
+
+def test_memory_tier_is_lru(tmp_path):
+    cache = GenerationCache(str(tmp_path), memory_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, {"key": key})
+    assert list(cache.memory) == ["b", "c"]
+
+    # Evicted from memory, still on disk
+    assert cache.get("a") == {"key": "a"}
+    assert cache.metrics()["disk_hits"] == 1
+    assert cache.get("a") == {"key": "a"}
+    assert cache.metrics()["memory_hits"] == 1
+
+
+def test_disk_tier_survives_restarts_and_evicts_by_size(tmp_path):
+    cache = GenerationCache(str(tmp_path), memory_entries=0, disk_max_bytes=1000)
+    for index in range(10):
+        cache.put(f"key-{index}", {"padding": "x" * 180})
+        time.sleep(0.01)
+
+    metrics = cache.metrics()
+    assert metrics["disk_bytes"] <= 1000
+    assert metrics["evictions"] > 0
+    # The most recent entries are kept
+    restarted = GenerationCache(str(tmp_path), memory_entries=0, disk_max_bytes=1000)
+    assert restarted.get("key-9") == {"padding": "x" * 180}
+    assert restarted.get("key-0") is None
+    assert restarted.metrics()["hit_rate"] == 0.5
+
+
+def test_key_covers_every_input():
+    base = ("a red square", 800, 600, "The canvas is empty.", "model-a", "v1")
+    keys = {generation_cache_key(*base)}
+    for index, changed in enumerate(("a blue square", 801, 601, "1 objects", "model-b", "v2")):
+        keys.add(generation_cache_key(*base[:index], changed, *base[index + 1:]))
+    assert len(keys) == 7
+
+
+def test_run_generation_uses_cache(signed_user, db, tmp_path):
+    cache = GenerationCache(str(tmp_path / "cache"))
+    pipeline = FakePipeline()
+    request = GenerateRequest(user_id="user-1", session_id="session-1", timestamp="1", prompt="a red square")
+
+    first = run_generation(request, pipeline, cache)
+    # The first object changes the board, draw on a fresh session to hit the same context again
+    db.delete_canvas_object(first["object_id"], 2)
+    second = run_generation(request, pipeline, cache)
+    db.delete_canvas_object(second["object_id"], 2)
+    third = run_generation(request.model_copy(update={"bypass_cache": True}), pipeline, cache)
+
+    assert (first["cached"], second["cached"], third["cached"]) == (False, True, False)
+    assert pipeline.chain.calls == 2
+    assert cache.metrics()["bypasses"] == 1
+
+    # Another model is another cache entry
+    run_generation(request, FakePipeline(model="model-b"), cache)
+    assert cache.metrics()["misses"] == 2
+
+
+def test_bypass_flag_is_signed_and_metrics_are_reported(signed_user):
+    pipeline = FakePipeline()
+    app.dependency_overrides[get_pipeline] = lambda: pipeline
+    payload = {"user_id": "user-1", "session_id": "session-1", "timestamp": str(time.time()), "prompt": "a red square"}
+    try:
+        with TestClient(app) as client:
+            # Signed without the flag, the default is not part of the signature
+            assert client.post("/generate", json=payload, headers=signed_user(payload)).json()["status"] == "success"
+            bypass = dict(payload, bypass_cache=True)
+            assert client.post("/generate", json=bypass, headers=signed_user(bypass)).json()["data"]["cached"] is False
+            assert client.post("/generate", json=bypass, headers=signed_user(payload)).json()["status"] == "error"
+            metrics = client.get("/metrics").json()["generation_cache"]
+    finally:
+        app.dependency_overrides.clear()
+
+    assert metrics["bypasses"] == 1
+    assert metrics["misses"] == 1
+    assert metrics["disk_bytes"] > 0
@@ -0,0 +1,150 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.schemas import GenerateRequest
+from app.services import JobQueue
+
+
+def _wait_for(job_queue, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = job_queue.get(job_id)
+        if job.status in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def _request(prompt="a red square"):
+    return GenerateRequest(user_id="user-1", session_id="session-1", timestamp="1", prompt=prompt)
+
+
+def test_jobs_report_results_and_errors(db):
+    def runner(request):
+        if request.prompt == "fail":
+            raise ValueError("model unavailable")
+        return {"object_id": "obj-1"}
+
+    job_queue = JobQueue(runner, max_workers=2)
+    succeeded = _wait_for(job_queue, job_queue.submit(_request()).id)
+    failed = _wait_for(job_queue, job_queue.submit(_request("fail")).id)
+
+    assert succeeded.result == '{"object_id": "obj-1"}'
+    assert failed.error == "model unavailable"
+
+
+def test_unfinished_jobs_are_resumed(db):
+    from utils.classes import GenerationJob
+
+    # A job left queued by a previous run of the API
+    db.create_generation_job(GenerationJob(id="job-1", user_id="user-1", session_id="session-1", request=_request().model_dump_json()))
+
+    job_queue = JobQueue(lambda request: {"prompt": request.prompt}, max_workers=1)
+    assert job_queue.resume() == 1
+    assert _wait_for(job_queue, "job-1").result == '{"prompt": "a red square"}'
+
+
+def test_workers_run_every_job_once(db, tmp_path):
+    from utils.classes import GenerationJob
+
+    runs = []
+    for i in range(10):
+        db.create_generation_job(GenerationJob(id=f"job-{i}", user_id="user-1", session_id="session-1",
+                                               request=_request(f"prompt {i}").model_dump_json()))
+
+    # Every worker of a multi-worker API resumes the same jobs on start
+    workers = [JobQueue(lambda request: runs.append(request.prompt) or {}, max_workers=2, lease_dir=str(tmp_path))
+               for _ in range(3)]
+    for worker in workers:
+        worker.resume()
+    for i in range(10):
+        _wait_for(workers[0], f"job-{i}")
+
+    assert sorted(runs) == sorted(f"prompt {i}" for i in range(10))
+
+
+def test_only_jobs_of_stopped_workers_are_resumed(db, tmp_path):
+    from utils.classes import GenerationJob
+
+    live = JobQueue(lambda request: {}, max_workers=1, lease_dir=str(tmp_path))
+    for job_id, worker in (("job-live", live.worker_id), ("job-dead", "stopped-worker"), ("job-old", None)):
+        db.create_generation_job(GenerationJob(id=job_id, user_id="user-1", session_id="session-1",
+                                               request=_request().model_dump_json()))
+        db.claim_generation_job(job_id, worker)
+
+    job_queue = JobQueue(lambda request: {"worker": "new"}, max_workers=1, lease_dir=str(tmp_path))
+    assert job_queue.resume() == 2
+    assert _wait_for(job_queue, "job-dead").worker == job_queue.worker_id
+    assert _wait_for(job_queue, "job-old").result == '{"worker": "new"}'
+    assert job_queue.get("job-live").status == "running"
+
+    # A claimed job is not claimed again
+    assert not db.claim_generation_job("job-dead", live.worker_id)
+
+
+def test_lease_is_released_once_running_jobs_finish(db, tmp_path):
+    import os
+    import threading
+
+    leases = tmp_path / "leases"
+    release = threading.Event()
+    job_queue = JobQueue(lambda request: release.wait(5) and {}, max_workers=1, lease_dir=str(leases))
+    lease = leases / f"{job_queue.worker_id}.lock"
+    job = job_queue.submit(_request())
+    while job_queue.get(job.id).status != "running":
+        time.sleep(0.01)
+
+    # The running job is not taken over by other workers before it finished
+    job_queue.shutdown()
+    assert lease.exists()
+    release.set()
+    _wait_for(job_queue, job.id)
+    job_queue.executor.shutdown(wait=True)
+    assert not lease.exists()
+
+    idle = JobQueue(lambda request: {}, max_workers=1, lease_dir=str(leases))
+    idle.shutdown()
+    assert os.listdir(leases) == []
+
+
+def test_jobs_of_workers_stopped_later_are_queued_again(db, tmp_path):
+    from utils.classes import GenerationJob
+
+    leases = tmp_path / "leases"
+    job_queue = JobQueue(lambda request: {"worker": "live"}, max_workers=1, lease_dir=str(leases),
+                         stale_check_interval=0.05)
+    assert job_queue.resume() == 0
+
+    # A worker stopped without releasing its lease while running a job
+    (leases / "stopped-worker.lock").touch()
+    db.create_generation_job(GenerationJob(id="job-stale", user_id="user-1", session_id="session-1",
+                                           request=_request().model_dump_json()))
+    db.claim_generation_job("job-stale", "stopped-worker")
+
+    assert _wait_for(job_queue, "job-stale").worker == job_queue.worker_id
+    # The stopped worker's lease file goes after its jobs were queued
+    deadline = time.time() + 5
+    while (leases / "stopped-worker.lock").exists() and time.time() < deadline:
+        time.sleep(0.01)
+    assert [path.name for path in leases.iterdir()] == [f"{job_queue.worker_id}.lock"]
+    job_queue.shutdown()
+
+
+def test_job_endpoints(signed_user):
+    payload = {"user_id": "user-1", "session_id": "session-1", "timestamp": str(time.time()), "prompt": "a red square"}
+    with TestClient(app) as client:
+        app.state.job_queue.runner = lambda request: {"object_id": "obj-1"}
+
+        response = client.post("/generate/jobs", json=payload, headers=signed_user(payload))
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        _wait_for(app.state.job_queue, job_id)
+        response = client.get(f"/generate/jobs/{job_id}")
+        assert response.json() == {"job_id": job_id, "status": "succeeded", "result": {"object_id": "obj-1"}, "error": None}
+
+        response = client.post("/generate/jobs", json=payload, headers=signed_user(dict(payload, prompt="other")))
+        assert response.status_code == 401
+        assert client.get("/generate/jobs/unknown").status_code == 404
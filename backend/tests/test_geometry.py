@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.schemas import CanvasObject
+from utils.geometry import object_bounds, object_corners, path_bounds, path_lengths, quadratic_bounds, transformed_paths
+
+
+def test_rotation_turns_the_box_around_its_origin():
+    rect = {"left": 100, "top": 100, "width": 80, "height": 20, "originX": "center", "originY": "center", "angle": 90}
+    np.testing.assert_allclose(object_bounds([rect])[0], [90, 60, 110, 140])
+
+    # A top left origin stays where it is, the box swings around it
+    rect = {"left": 0, "top": 0, "width": 80, "height": 20, "angle": 90}
+    np.testing.assert_allclose(object_corners([rect])[0], [[0, 0], [0, 80], [-20, 80], [-20, 0]], atol=1e-9)
+
+
+def test_scale_flip_and_skew():
+    objects = [
+        {"left": 10, "top": 10, "width": 10, "height": 10, "scaleX": 2, "flipY": True},
+        {"left": 0, "top": 0, "width": 10, "height": 10, "skewX": 45},
+        {"left": 0, "top": 0, "width": 10, "height": 10, "strokeWidth": 2},
+    ]
+    np.testing.assert_allclose(object_bounds(objects), [[10, 10, 30, 20], [0, 0, 20, 10], [0, 0, 10, 10]], atol=1e-9)
+    np.testing.assert_allclose(object_bounds(objects[2:], stroke=True), [[0, 0, 12, 12]])
+
+
+def test_bounds_match_one_object_at_a_time():
+    rng = np.random.default_rng(3)
+    objects = [
+        {"left": float(rng.uniform(-100, 100)), "top": float(rng.uniform(-100, 100)),
+         "width": float(rng.uniform(1, 50)), "height": float(rng.uniform(1, 50)),
+         "scaleX": float(rng.uniform(0.5, 2)), "scaleY": float(rng.uniform(0.5, 2)),
+         "angle": float(rng.uniform(0, 360)), "skewX": float(rng.uniform(-30, 30)), "skewY": float(rng.uniform(-30, 30)),
+         "originX": ("left", "center", "right")[i % 3], "originY": ("top", "center", "bottom")[i % 3]}
+        for i in range(50)
+    ]
+    corners = object_corners(objects)
+    batch = object_bounds(objects)
+    np.testing.assert_allclose(batch[:, :2], corners.min(axis=1))
+    np.testing.assert_allclose(batch[:, 2:], corners.max(axis=1))
+    for obj, bounds in zip(objects, batch):
+        np.testing.assert_allclose(object_bounds([obj])[0], bounds)
+
+
+def test_quadratic_bounds_include_the_curve_extremum():
+    bounds = quadratic_bounds(np.array([[0.0, 0.0]]), np.array([[5.0, 10.0]]), np.array([[10.0, 0.0]]))
+    np.testing.assert_allclose(bounds, [[0, 0, 10, 5]])
+
+
+def test_path_bounds_and_lengths():
+    paths = [
+        [["M", 0, 0], ["L", 3, 4], ["L", 3, 0], ["Z"]],
+        [["M", 0, 0], ["Q", 5, 10, 10, 0]],
+        [["M", 7, 8]],
+        None,
+    ]
+    bounds = path_bounds(paths)
+    np.testing.assert_allclose(bounds[:3], [[0, 0, 3, 4], [0, 0, 10, 5], [7, 8, 7, 8]])
+    assert np.isnan(bounds[3]).all()
+
+    lengths = path_lengths(paths)
+    assert lengths[0] == pytest.approx(12)
+    # Closed form length of the parabola y = x (10 - x) / 5
+    exact = 5 * (math.sqrt(5) + math.asinh(2) / 2)
+    assert lengths[1] == pytest.approx(exact, rel=1e-3)
+    assert list(lengths[2:]) == [0, 0]
+
+
+def test_paths_are_placed_on_their_object():
+    stroke = {"type": "path", "left": 100, "top": 50, "width": 10, "height": 10, "scaleX": 2,
+              "path": [["M", 0, 0], ["L", 10, 10]]}
+    points, owners = transformed_paths([{"type": "rect", "width": 5, "height": 5}, stroke])
+    np.testing.assert_allclose(points, [[100, 50], [105, 52.5], [110, 55], [115, 57.5], [120, 60]])
+    assert owners.tolist() == [1] * 5
+
+
+def test_model_bounds():
+    obj = CanvasObject.from_dict({"type": "path", "left": 0, "top": 0, "width": 10, "height": 5,
+                                  "path": [["M", 0, 0], ["Q", 5, 10, 10, 0]]})
+    assert obj.bounds() == (0, 0, 10, 5)
+    assert obj.path.bounds() == (0, 0, 10, 5)
+    assert obj.path.length() == pytest.approx(14.789, rel=1e-3)
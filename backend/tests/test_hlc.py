@@ -0,0 +1,21 @@
+from utils.hlc import HybridLogicalClock, Timestamp
+
+
+def test_timestamps_increase_and_round_trip():
+    clock = HybridLogicalClock("node-a")
+    stamps = [clock.now() for _ in range(1000)]
+    assert stamps == sorted(set(stamps))
+    # The string form sorts like the timestamps
+    assert [str(stamp) for stamp in stamps] == sorted(str(stamp) for stamp in stamps)
+    assert Timestamp.parse(str(stamps[-1])) == stamps[-1]
+
+
+def test_clock_moves_past_received_timestamps():
+    clock = HybridLogicalClock("node-a")
+    remote = Timestamp(clock.now().wall + 60_000, 7, "node-b")
+
+    received = clock.update(remote)
+    assert received > remote
+    assert clock.now() > received
+    # Same time and counter, the node id decides
+    assert Timestamp(5, 0, "node-b") > Timestamp(5, 0, "node-a")
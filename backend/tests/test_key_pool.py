@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from utils.key_pool import KeyPool
+
+
+@pytest.fixture
+def key_pool(monkeypatch):
+    """A fresh pool of small keys, its workers stopped after the test."""
+    def create(size, low_water):
+        monkeypatch.setenv("KEY_POOL_BITS", "512")
+        monkeypatch.setenv("KEY_POOL_SIZE", str(size))
+        monkeypatch.setenv("KEY_POOL_LOW_WATER", str(low_water))
+        monkeypatch.setenv("KEY_POOL_WORKERS", "1")
+        monkeypatch.setattr(KeyPool, "_instance", None)
+        pools.append(KeyPool())
+        return pools[-1]
+
+    pools = []
+    yield create
+    for pool in pools:
+        pool.shutdown()
+
+
+def _wait_for_depth(pool, depth, timeout=30):
+    deadline = time.monotonic() + timeout
+    while pool.metrics()["depth"] < depth:
+        assert time.monotonic() < deadline, pool.metrics()
+        time.sleep(0.05)
+
+
+def test_pool_is_refilled_at_the_low_water_mark(key_pool):
+    pool = key_pool(size=2, low_water=1)
+    _wait_for_depth(pool, 2)
+    assert pool.metrics()["last_key_seconds"] > 0
+
+    public_key, private_key = pool.acquire()
+    assert public_key.n == private_key.n
+    # One key left is the low-water mark, the pool is topped back up
+    assert pool.metrics()["pending"] == 1
+    _wait_for_depth(pool, 2)
+
+    metrics = pool.metrics()
+    assert (metrics["hits"], metrics["misses"], metrics["pending"]) == (1, 0, 0)
+
+
+def test_empty_pool_generates_inline(key_pool):
+    pool = key_pool(size=0, low_water=0)
+
+    public_key, private_key = pool.acquire()
+
+    assert public_key.n == private_key.n
+    metrics = pool.metrics()
+    assert (metrics["hits"], metrics["misses"], metrics["pending"]) == (0, 1, 0)
+
+
+def test_shut_down_pool_still_hands_out_keys(key_pool):
+    pool = key_pool(size=2, low_water=1)
+    _wait_for_depth(pool, 2)
+    pool.shutdown()
+
+    # Ready keys are used up, then keys are generated inline without resubmitting work
+    for _ in range(3):
+        public_key, private_key = pool.acquire()
+        assert public_key.n == private_key.n
+    metrics = pool.metrics()
+    assert (metrics["hits"], metrics["misses"], metrics["pending"]) == (2, 1, 0)
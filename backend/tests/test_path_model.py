@@ -0,0 +1,65 @@
+import json
+from pathlib import Path as FilePath
+
+import pytest
+
+from app.schemas import CanvasObject
+from app.schemas.canvas import MoveCommand, Path
+
+SCHEMA_FILE = FilePath(__file__).parent / "data" / "canvas_object_schema.json"
+
+STROKE = [["M", 0, 0], ["Q", 1, 2, 3, 4.5], ["L", 5, 6], ["Z"]]
+SCHEMA_FORM = {"commands": [
+    {"command_type": "M", "x": 0, "y": 0},
+    {"command_type": "Q", "control_x": 1, "control_y": 2, "end_x": 3, "end_y": 4.5},
+    {"command_type": "L", "x": 5, "y": 6},
+    {"command_type": "Z"},
+]}
+
+
+def test_json_schema_is_unchanged():
+    # The schema the LLM output parser shows the model, as generated by the model per command Path
+    expected = json.loads(SCHEMA_FILE.read_text())
+
+    assert CanvasObject.model_json_schema() == expected
+
+
+def test_both_forms_load_into_the_same_arrays():
+    from_list = Path.from_list(STROKE)
+    from_schema = Path.validate(SCHEMA_FORM)
+
+    assert from_list == from_schema
+    assert from_list.codes.tolist() == [0, 2, 1, 3]
+    assert from_list.coords.tolist() == [0, 0, 1, 2, 3, 4.5, 5, 6]
+    assert from_list.to_list() == [["M", 0.0, 0.0], ["Q", 1.0, 2.0, 3.0, 4.5], ["L", 5.0, 6.0], ["Z"]]
+    assert from_list.commands[0] == MoveCommand(x=0, y=0)
+
+
+def test_serialized_forms_match():
+    obj = CanvasObject.from_dict({"type": "path", "left": 1, "top": 2, "width": 3, "height": 4, "path": STROKE})
+
+    assert json.loads(obj.model_dump_json()) == obj.to_dict()
+    assert json.loads(obj.path.to_json()) == obj.path.to_list()
+    assert obj.model_dump()["path"] == Path.validate(SCHEMA_FORM).to_schema_dict()
+    assert CanvasObject.model_validate({**obj.model_dump(), "path": SCHEMA_FORM}).path == obj.path
+
+
+@pytest.mark.parametrize("commands, message", [
+    ([], "at least one command"),
+    ([["X", 1, 2]], "Unknown command type"),
+    ([["M", 1]], "Wrong number of values in path command 0"),
+    ([["M", 0, 0], ["Q", 1, 2, 3]], "Wrong number of values in path command 1"),
+    ([["M", "left", 2]], "must be numbers"),
+    ([["M", float("nan"), 2]], "must be finite"),
+])
+def test_invalid_paths_are_rejected(commands, message):
+    with pytest.raises(ValueError, match=message):
+        Path.from_list(commands)
+
+
+def test_invalid_schema_form_fails_model_validation():
+    with pytest.raises(ValueError, match="Invalid path command 0"):
+        CanvasObject.model_validate({
+            "type": "path", "left": 0, "top": 0, "width": 1, "height": 1,
+            "path": {"commands": [{"command_type": "M", "x": 1}]},
+        })
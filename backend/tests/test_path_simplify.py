@@ -0,0 +1,36 @@
+from utils.path_simplify import simplify_object, simplify_path
+
+
+def _pencil_path(points):
+    """Build a path the way the Fabric.js pencil brush does."""
+    path = [["M", points[0][0], points[0][1]]]
+    for (x1, y1), (x2, y2) in zip(points, points[1:]):
+        path.append(["Q", x1, y1, (x1 + x2) / 2, (y1 + y2) / 2])
+    path.append(["L", points[-1][0], points[-1][1]])
+    return path
+
+
+def test_collinear_freedraw_stroke_is_reduced_to_its_ends():
+    path = _pencil_path([(x, 2 * x) for x in range(50)])
+
+    simplified, removed = simplify_path(path, tolerance=1.0)
+
+    assert removed == 48
+    assert simplified == [["M", 0, 0], ["Q", 0.0, 0.0, 24.5, 49.0], ["L", 49.0, 98.0]]
+
+
+def test_corners_are_kept():
+    path = _pencil_path([(0, 0), (5, 0), (10, 0), (10, 5), (10, 10)])
+
+    simplified, removed = simplify_path(path, tolerance=1.0)
+
+    assert removed == 2
+    assert [cmd[1:3] for cmd in simplified[1:-1]] == [[0.0, 0.0], [10.0, 0.0]]
+
+
+def test_other_paths_and_objects_are_untouched():
+    curve = [["M", 0, 0], ["Q", 10, 30, 20, 0], ["Z"]]
+    assert simplify_path(curve, tolerance=5.0) == (curve, 0)
+
+    rect = {"type": "rect", "left": 0, "top": 0}
+    assert simplify_object(rect, tolerance=5.0) == (rect, 0)
@@ -0,0 +1,87 @@
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes.generate import get_pipeline
+from app.schemas import CanvasObject
+from app.services import GenerationPipeline, PipelineConfig
+
+
+class FakeChain:
+    def __init__(self):
+        self.calls = []
+
+    def invoke(self, variables):
+        self.calls.append(variables)
+        return CanvasObject.from_dict({"type": "rect", "left": 10, "top": 20, "width": 30, "height": 40})
+
+
+class FakePipeline:
+    def __init__(self):
+        self.chain = FakeChain()
+        self.config = PipelineConfig()
+        self.template_version = "test"
+
+
+def test_pipeline_is_built_once_per_app(signed_user, monkeypatch):
+    built = []
+    original_init = GenerationPipeline.__init__
+
+    def counting_init(self, *args, **kwargs):
+        built.append(self)
+        original_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(GenerationPipeline, "__init__", counting_init)
+    with TestClient(app) as client:
+        client.get("/")
+        client.get("/")
+        assert built == [app.state.pipeline_future.result(timeout=30)]
+
+
+def test_generate_uses_injected_pipeline(signed_user, db):
+    pipeline = FakePipeline()
+    app.dependency_overrides[get_pipeline] = lambda: pipeline
+    payload = {"user_id": "user-1", "session_id": "session-1", "timestamp": str(time.time()), "prompt": "a rectangle"}
+    try:
+        with TestClient(app) as client:
+            response = client.post("/generate", json=payload, headers=signed_user(payload))
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.json()["status"] == "success"
+    assert [call["description"] for call in pipeline.chain.calls] == ["a rectangle"]
+    stored = db.get_session_canvas_objects("session-1")
+    assert [json.loads(obj.object_data)["type"] for obj in stored] == ["rect"]
+
+
+def test_reload_rebuilds_model(monkeypatch):
+    monkeypatch.setenv("GENERATION_MODEL", "model-a")
+    pipeline = GenerationPipeline()
+    parser = pipeline.parser
+
+    monkeypatch.setenv("GENERATION_MODEL", "model-b")
+    monkeypatch.setenv("GENERATION_MAX_RETRIES", "5")
+    pipeline.reload()
+    assert pipeline.llm.model == "model-b"
+    assert pipeline.llm.max_retries == 5
+    assert pipeline.parser is parser
+
+
+def test_reload_endpoint_needs_operator_token(db, monkeypatch):
+    pipeline = FakePipeline()
+    pipeline.reload = lambda: pipeline.config
+    app.dependency_overrides[get_pipeline] = lambda: pipeline
+    try:
+        with TestClient(app) as client:
+            assert client.post("/generate/reload").status_code == 403
+
+            monkeypatch.setenv("PIPELINE_RELOAD_TOKEN", "secret")
+            assert client.post("/generate/reload", headers={"Authorization": "Bearer guess"}).status_code == 401
+            response = client.post("/generate/reload", headers={"Authorization": "Bearer secret"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.json()["config"]["model"] == PipelineConfig.model
@@ -0,0 +1,40 @@
+import pytest
+
+st = pytest.importorskip("streamlit")
+
+from render_cache import memoize
+
+
+@pytest.fixture(autouse=True)
+def session_state(monkeypatch):
+    """A plain dict stands in for the session state of one browser tab."""
+    state = {}
+    monkeypatch.setattr(st, "session_state", state)
+    return state
+
+
+def test_memoize_reuses_the_value_until_the_key_changes():
+    builds = []
+
+    def build():
+        builds.append(len(builds))
+        return f"value-{len(builds)}"
+
+    assert memoize("summary", ("session-1", 1), build) == "value-1"
+    assert memoize("summary", ("session-1", 1), build) == "value-1"
+    assert len(builds) == 1
+
+    # A new revision invalidates the value, only the latest one is kept
+    assert memoize("summary", ("session-1", 2), build) == "value-2"
+    assert memoize("summary", ("session-1", 1), build) == "value-3"
+    assert len(builds) == 3
+
+
+def test_memoize_keeps_names_apart_and_skips_without_key(session_state):
+    assert memoize("a", 1, lambda: "a") == "a"
+    assert memoize("b", 1, lambda: "b") == "b"
+    assert memoize("a", 1, lambda: "rebuilt") == "a"
+
+    assert memoize("c", None, lambda: "first") == "first"
+    assert memoize("c", None, lambda: "second") == "second"
+    assert set(session_state["render_memo"]) == {"a", "b"}
@@ -0,0 +1,52 @@
+import random
+
+from app.services.scene import estimate_tokens, object_bbox, summarize_scene
+
+
+def _stroke(left, top, size=10, color="#000000"):
+    return {"type": "path", "left": left, "top": top, "width": size, "height": size, "stroke": color,
+            "path": [["M", left, top], ["Q", left + 1, top + 1, left + size, top + size]]}
+
+
+def _rect(left, top, fill="#ff0000"):
+    return {"type": "rect", "left": left, "top": top, "width": 40, "height": 30, "fill": fill, "stroke": "#000000", "strokeWidth": 2}
+
+
+def test_empty_canvas():
+    assert summarize_scene([], 800, 600) == "The canvas is empty."
+
+
+def test_bbox_honors_scale_and_origin():
+    obj = {"left": 100, "top": 100, "width": 40, "height": 20, "scaleX": 2, "originX": "center", "originY": "center"}
+    assert object_bbox(obj) == (60, 90, 140, 110)
+
+
+def test_lists_type_bbox_and_colors():
+    summary = summarize_scene([_rect(10, 20)], 800, 600, token_budget=200)
+    assert "- rect bbox=(10,20,40,30) colors=#000000,#ff0000 strokeWidth=2" in summary
+
+
+def test_nearby_strokes_are_clustered():
+    strokes = [_stroke(100 + 8 * i, 100) for i in range(5)] + [_stroke(600, 500), _stroke(110, 110, color="#00ff00")]
+    summary = summarize_scene(strokes, 800, 600, token_budget=200)
+    assert "path x5 bbox=(100,100,42,10)" in summary
+    assert summary.count("- path") == 3
+
+
+def test_summary_stays_within_budget():
+    random.seed(1)
+    objects = [_rect(random.uniform(0, 760), random.uniform(0, 570), fill=f"#{i:06x}") for i in range(5000)]
+    summary = summarize_scene(objects, 800, 600, token_budget=300)
+    assert estimate_tokens(summary) <= 300
+    assert summary.startswith("5000 objects")
+    assert "more" in summary
+
+
+def test_prompt_region_gets_the_detail():
+    objects = [_rect(20 + 45 * (i % 16), 20 + 60 * (i // 16), fill=f"#{i:06x}") for i in range(160)]
+    summary = summarize_scene(objects, 800, 600, prompt="add a sun in the top right corner", token_budget=150)
+    detailed = [line for line in summary.splitlines() if "bbox=" in line]
+    assert detailed
+    # The first objects described are the ones closest to the top right
+    first_left, first_top = [int(value) for value in detailed[0].split("bbox=(")[1].split(",")[:2]]
+    assert first_left > 600 and first_top < 200
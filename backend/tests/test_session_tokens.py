@@ -0,0 +1,52 @@
+import pytest
+
+from utils.session_tokens import SessionTokenManager
+
+
+@pytest.fixture
+def tokens(monkeypatch):
+    monkeypatch.setenv("SESSION_TOKEN_SECRET", "test-secret")
+    monkeypatch.setenv("SESSION_TOKEN_TTL", "60")
+    monkeypatch.setattr(SessionTokenManager, "_instance", None)
+    return SessionTokenManager()
+
+
+def test_token_is_bound_to_user_and_signature(tokens):
+    token = tokens.issue("user-1")
+
+    assert tokens.verify(token, "user-1")
+    assert not tokens.verify(token, "user-2")
+
+    payload, signature = token.split(".")
+    assert not tokens.verify(f"{payload}.{signature[:-2]}AA", "user-1")
+    assert not tokens.verify("not-a-token", "user-1")
+
+
+def test_expired_and_revoked_tokens_are_rejected(tokens, monkeypatch):
+    token = tokens.issue("user-1")
+    other = tokens.issue("user-1")
+
+    tokens.revoke(token)
+    assert not tokens.verify(token, "user-1")
+    assert tokens.verify(other, "user-1")
+
+    tokens.revoke_user("user-1")
+    assert not tokens.verify(other, "user-1")
+
+    tokens.ttl = -1
+    assert not tokens.verify(tokens.issue("user-3"), "user-3")
+
+
+def test_revocations_are_forgotten_once_the_tokens_expired(tokens, monkeypatch):
+    import time
+
+    now = time.time()
+    tokens.revoke(tokens.issue("user-1"))
+    tokens.revoke_user("user-1")
+    assert len(tokens.revoked_tokens) == 1 and list(tokens.revoked_users) == ["user-1"]
+
+    # A TTL later, only the newest revocations are kept
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    tokens.revoke(tokens.issue("user-2"))
+    tokens.revoke_user("user-2")
+    assert len(tokens.revoked_tokens) == 1 and list(tokens.revoked_users) == ["user-2"]
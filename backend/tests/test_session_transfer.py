@@ -0,0 +1,191 @@
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from db_init import initialize_database
+from utils.classes import Session, User
+from utils.db_manager import DatabaseManager
+from utils.session_transfer import export_ndjson, export_parquet, import_ndjson, import_parquet
+
+
+def _make_session(db, objects=5):
+    db.create_user(User(id="user-1", public_key="key-1", client_identifier="client-1", display_name="Ada"))
+    db.create_session(Session(id="session-1", title="Board", width=1024, height=768, participants=["user-1"]))
+    db.add_canvas_objects([{
+        "id": f"obj-{i}",
+        "session_id": "session-1",
+        "object_data": json.dumps({"type": "path", "left": i, "path": [["M", 0, 0], ["Q", i, 1, 2, i + 2]]}),
+        "created_by": "user-1",
+    } for i in range(objects)])
+    # One object with a stored patch and stamped properties
+    db.edit_canvas_object("obj-1", json.dumps({"type": "path", "left": 50, "path": [["M", 0, 0], ["L", 1, 1]]}), 2)
+
+
+def _snapshot(db):
+    objects = {obj.id: (json.loads(obj.object_data), obj.version, obj.content_hash)
+               for obj in db.get_session_canvas_objects("session-1")}
+    with db._get_connection() as conn:
+        stamps = sorted(tuple(row) for row in conn.execute("SELECT * FROM canvas_object_clocks").fetchall())
+        session = tuple(conn.execute("SELECT title, width, height, created_at FROM sessions").fetchone())
+    participants = [user.id for user in db.get_session_participants("session-1")]
+    return objects, stamps, session, participants
+
+
+@pytest.fixture
+def other_db(tmp_path, monkeypatch):
+    """Switch DatabaseManager to a second, empty database, as on another deployment."""
+    def switch():
+        db_path = tmp_path / "other.db"
+        initialize_database(str(db_path))
+        monkeypatch.setenv("PATH_TO_DB", str(db_path))
+        monkeypatch.setattr(DatabaseManager, "_instance", None)
+        return DatabaseManager()
+    return switch
+
+
+@pytest.mark.parametrize("format", ["ndjson", "parquet"])
+def test_session_moves_between_databases(db, other_db, format):
+    if format == "parquet":
+        pytest.importorskip("pyarrow")
+    _make_session(db, objects=25)
+    expected = _snapshot(db)
+
+    # Small batches and row groups, so they are actually streamed
+    if format == "parquet":
+        exported = list(export_parquet("session-1", batch_size=4, row_group_size=10))
+    else:
+        exported = list(export_ndjson("session-1", batch_size=4))
+    assert len(exported) > 2
+
+    target = other_db()
+    body = io.BytesIO(b"".join(exported))
+    importer = import_parquet if format == "parquet" else import_ndjson
+    counts = importer(body, batch_size=4)
+
+    assert counts == {"session_id": "session-1", "users": 1, "participants": 1, "objects": 25}
+    assert _snapshot(target) == expected
+    assert target.get_user("user-1").display_name == "Ada"
+
+
+def test_import_is_all_or_nothing_and_replaces_on_request(db):
+    _make_session(db)
+    lines = b"".join(export_ndjson("session-1")).splitlines()
+
+    with pytest.raises(ValueError, match="already exists"):
+        import_ndjson(lines)
+    with pytest.raises(ValueError, match="starts with the session"):
+        import_ndjson(lines[1:])
+
+    # A broken record rolls the whole import back
+    revision = db.get_session_revision("session-1")
+    with pytest.raises(ValueError):
+        import_ndjson(lines + [b'{"type": "comment"}'], replace=True)
+    assert len(db.get_session_canvas_objects("session-1")) == 5
+    assert db.get_session_revision("session-1") == revision
+
+    # Replacing keeps the session row, its revision keeps growing
+    counts = import_ndjson(lines[:-1], replace=True)
+    assert counts["objects"] == 4
+    assert len(db.get_session_canvas_objects("session-1")) == 4
+    assert db.get_session_revision("session-1") > revision
+
+
+def test_transfer_endpoints(db, monkeypatch):
+    from app.main import app
+
+    _make_session(db)
+    with TestClient(app) as client:
+        assert client.get("/sessions/session-1/export").status_code == 403
+
+        monkeypatch.setenv("SESSION_TRANSFER_TOKEN", "secret")
+        headers = {"Authorization": "Bearer secret"}
+        assert client.get("/sessions/session-1/export", headers={"Authorization": "Bearer guess"}).status_code == 401
+        assert client.get("/sessions/missing/export", headers=headers).status_code == 404
+
+        response = client.get("/sessions/session-1/export", headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        body = response.content
+        assert [json.loads(line)["type"] for line in body.splitlines()][:3] == ["session", "user", "participant"]
+
+        response = client.post("/sessions/import", content=body, headers=headers)
+        assert response.status_code == 400 and "already exists" in response.json()["detail"]
+
+        response = client.post("/sessions/import?replace=true", content=body, headers=headers)
+        assert response.status_code == 200
+        assert response.json() == {"status": "success", "session_id": "session-1", "users": 0, "participants": 1, "objects": 5}
+
+        # Another session with the same object IDs
+        renamed = body.replace(b'"id": "session-1"', b'"id": "session-2"', 1)
+        assert client.post("/sessions/import", content=renamed, headers=headers).status_code == 409
+
+        # Records without the keys of their type are a bad upload, not a server error
+        for broken in (b'{"type": "session", "id": "x"}',
+                       b'{"type": "session", "id": "x", "title": "t"}\n{"type": "user", "id": "u"}',
+                       b'{"type": "session", "id": "x", "title": "t"}\n{"type": "object", "id": "o", "created_by": "u"}',
+                       b'[1, 2]'):
+            response = client.post("/sessions/import", content=broken, headers=headers)
+            assert response.status_code == 400, broken
+        assert db.get_session("x") is None
+
+
+@pytest.mark.parametrize("format", ["ndjson", "parquet"])
+def test_concurrent_exports_of_large_sessions(db, monkeypatch, format):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.main import app
+
+    if format == "parquet":
+        pytest.importorskip("pyarrow")
+    # More objects than one batch of the export reads
+    _make_session(db, objects=2500)
+    monkeypatch.setenv("SESSION_TRANSFER_TOKEN", "secret")
+    with TestClient(app) as client:
+        def export(_):
+            response = client.get(f"/sessions/session-1/export?format={format}",
+                                  headers={"Authorization": "Bearer secret"})
+            assert response.status_code == 200
+            return response.content
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            bodies = list(pool.map(export, range(4)))
+    assert len(set(bodies)) == 1
+
+    counts = (import_parquet(io.BytesIO(bodies[0]), replace=True) if format == "parquet"
+              else import_ndjson(bodies[0].splitlines(), replace=True))
+    assert counts["objects"] == 2500
+
+
+def test_import_skips_duplicate_content_and_rejects_taken_ids(db):
+    import sqlite3
+
+    _make_session(db)
+    db.unique_canvas_content = True
+    db.enforce_unique_canvas_content()
+    with db._get_connection() as conn:
+        clocks = [tuple(row) for row in conn.execute("SELECT * FROM canvas_object_clocks ORDER BY object_id, property")]
+    records = [json.loads(line) for line in b"".join(export_ndjson("session-1")).splitlines()]
+    session, objects = records[0], [record for record in records if record["type"] == "object"]
+    copy = [dict(session, id="session-2")] + [dict(obj, id=f"copy-{obj['id']}") for obj in objects]
+
+    # A duplicate of an imported object is skipped together with its timestamps
+    duplicate = dict(objects[1], id="duplicate", stamps={"left": "9999999999999:0:other"})
+    counts = import_ndjson([json.dumps(record) for record in copy + [duplicate]])
+    assert counts["objects"] == 5
+    with db._get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM canvas_object_clocks WHERE object_id = 'duplicate'").fetchone()[0] == 0
+        copied = conn.execute("SELECT property, stamp FROM canvas_object_clocks WHERE object_id = 'copy-obj-1'").fetchall()
+    assert sorted(map(tuple, copied)) == [(prop, stamp) for object_id, prop, stamp in clocks if object_id == "obj-1"]
+
+    # An ID of another session's object is a conflict, not a skipped row
+    taken = [dict(session, id="session-3"), dict(objects[0], object_data={"type": "rect", "left": 1},
+                                                 content_hash=None, stamps={"left": "9999999999999:0:other"})]
+    with pytest.raises(sqlite3.IntegrityError):
+        import_ndjson([json.dumps(record) for record in taken])
+    assert db.get_session("session-3") is None
+    with db._get_connection() as conn:
+        assert [tuple(row) for row in conn.execute(
+            "SELECT * FROM canvas_object_clocks WHERE object_id LIKE 'obj-%' ORDER BY object_id, property"
+        )] == clocks
@@ -0,0 +1,91 @@
+import base64
+import json
+import time
+
+import pytest
+import rsa
+
+from app.schemas import GenerateRequest
+from app.services import AuthenticationError, SignatureVerifier
+
+
+def _request(**fields):
+    payload = {"user_id": "user-1", "session_id": "session-1", "timestamp": str(time.time()), "prompt": "a square", **fields}
+    return payload, GenerateRequest(**payload)
+
+
+def _sign(payload, private_key):
+    signature = rsa.sign(json.dumps(payload, sort_keys=True).encode("utf-8"), private_key, "SHA-256")
+    return f"Bearer {base64.b64encode(signature).decode('utf-8')}"
+
+
+def test_public_key_is_parsed_once(signed_user, monkeypatch):
+    parsed = []
+    load_pkcs1 = rsa.PublicKey.load_pkcs1
+    monkeypatch.setattr(rsa.PublicKey, "load_pkcs1", lambda data: parsed.append(data) or load_pkcs1(data))
+    verifier = SignatureVerifier()
+
+    for index in range(3):
+        payload, request = _request(nonce=f"nonce-{index}")
+        verifier.verify(request, signed_user(payload)["Authorization"])
+
+    assert len(parsed) == 1
+
+
+def test_replays_are_rejected(signed_user):
+    verifier = SignatureVerifier()
+    payload, request = _request(nonce="nonce-1")
+    verifier.verify(request, signed_user(payload)["Authorization"])
+
+    with pytest.raises(AuthenticationError, match="Replayed request"):
+        verifier.verify(request, signed_user(payload)["Authorization"])
+
+    # Without a nonce the signature identifies the request
+    payload, request = _request()
+    verifier.verify(request, signed_user(payload)["Authorization"])
+    with pytest.raises(AuthenticationError, match="Replayed request"):
+        verifier.verify(request, signed_user(payload)["Authorization"])
+
+
+def test_timestamps_outside_the_window_are_rejected(signed_user):
+    verifier = SignatureVerifier(replay_window=60)
+
+    for timestamp in (str(time.time() - 120), str(time.time() + 120), "yesterday"):
+        payload, request = _request(timestamp=timestamp, nonce=timestamp)
+        with pytest.raises(AuthenticationError):
+            verifier.verify(request, signed_user(payload)["Authorization"])
+
+
+def test_remembered_requests_expire(monkeypatch):
+    verifier = SignatureVerifier(replay_window=10)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    assert verifier._remember(("user-1", "nonce-1"))
+    assert not verifier._remember(("user-1", "nonce-1"))
+
+    monkeypatch.setattr(time, "time", lambda: now + 21)
+    assert verifier._remember(("user-1", "nonce-2"))
+    assert list(verifier.seen) == [("user-1", "nonce-2")]
+
+
+def test_changed_public_key_is_picked_up(signed_user, db):
+    verifier = SignatureVerifier()
+    payload, request = _request(nonce="nonce-1")
+    verifier.verify(request, signed_user(payload)["Authorization"])
+
+    public_key, private_key = rsa.newkeys(512)
+    db._execute_with_retry("UPDATE users SET public_key = ? WHERE id = ?", (public_key.save_pkcs1().decode(), "user-1"))
+
+    # The cached key fails, the stored one is tried before rejecting the request
+    payload, request = _request(nonce="nonce-2")
+    verifier.verify(request, _sign(payload, private_key))
+
+    # Refreshing drops keys that no longer match the database
+    verifier.invalidate()
+    verifier.public_key("user-1")
+    db._execute_with_retry("DELETE FROM users WHERE id = ?", ("user-1",))
+    verifier.refresh()
+    assert "user-1" not in verifier.keys
+    payload, request = _request(nonce="nonce-3")
+    with pytest.raises(AuthenticationError, match="User not found"):
+        verifier.verify(request, _sign(payload, private_key))
@@ -0,0 +1,84 @@
+import json
+import time
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes.generate import get_pipeline
+from app.schemas import GenerateRequest
+from app.services import stream_generation
+from app.services.streaming import IncrementalJSONParser
+
+PATH_OBJECT = {
+    "type": "path", "left": 0, "top": 0, "width": 10, "height": 10,
+    "path": {"commands": [
+        {"command_type": "M", "x": 0, "y": 0},
+        {"command_type": "Q", "control_x": 5, "control_y": 0, "end_x": 10, "end_y": 10},
+    ]},
+}
+RECT = {"type": "rect", "left": 20, "top": 20, "width": 5, "height": 5, "stroke": "#ff0000 {not a brace}"}
+INVALID = {"type": "rect", "left": 20, "top": 20, "width": -5, "height": 5}
+
+
+def _chunks(text, size=7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class FakePipeline:
+    def __init__(self, objects):
+        text = "Here you go:\n```json\n" + json.dumps(objects) + "\n```"
+        self.stream_chain = SimpleNamespace(stream=lambda variables: (SimpleNamespace(content=chunk) for chunk in _chunks(text)))
+
+
+def test_parser_reports_segments_before_their_object():
+    parser = IncrementalJSONParser()
+    events = []
+    for chunk in _chunks("```json\n" + json.dumps([PATH_OBJECT, RECT]) + "\n```", size=3):
+        events.extend(parser.feed(chunk))
+
+    assert [kind for kind, _ in events] == ["segment", "segment", "object", "object"]
+    assert events[1][1] == PATH_OBJECT["path"]["commands"][1]
+    assert events[2][1] == PATH_OBJECT
+    assert events[3][1] == RECT
+
+
+def test_parser_handles_list_paths_and_single_objects():
+    parser = IncrementalJSONParser()
+    obj = {"type": "path", "path": [["M", 0, 0], ["L", 1, 1]]}
+    events = list(parser.feed(json.dumps(obj)))
+    assert events == [("segment", ["M", 0, 0]), ("segment", ["L", 1, 1]), ("object", obj)]
+
+
+def test_objects_are_stored_as_they_arrive(signed_user, db):
+    request = GenerateRequest(user_id="user-1", session_id="session-1", timestamp="1", prompt="a house")
+    events = stream_generation(request, FakePipeline([PATH_OBJECT, INVALID, RECT]))
+
+    stored_at_event = []
+    kinds = []
+    for event in events:
+        kinds.append(event["event"])
+        if event["event"] == "object":
+            stored_at_event.append(len(db.get_session_canvas_objects("session-1")))
+
+    assert kinds == ["segment", "segment", "object", "invalid", "object", "done"]
+    # Every object was committed before the next one was parsed
+    assert stored_at_event == [1, 2]
+    assert event == {"event": "done", "objects": 2, "invalid": 1}
+
+
+def test_stream_endpoint_sends_ndjson(signed_user):
+    app.dependency_overrides[get_pipeline] = lambda: FakePipeline([RECT])
+    payload = {"user_id": "user-1", "session_id": "session-1", "timestamp": str(time.time()), "prompt": "a square"}
+    try:
+        with TestClient(app) as client:
+            response = client.post("/generate/stream", json=payload, headers=signed_user(payload))
+            forged = client.post("/generate/stream", json=dict(payload, prompt="x"), headers=signed_user(payload))
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["event"] for event in events] == ["object", "done"]
+    assert events[0]["object"]["stroke"] == RECT["stroke"]
+    assert forged.status_code == 401
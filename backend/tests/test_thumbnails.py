@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from thumbnails import ThumbnailCache
+from utils.classes import Session, User
+
+
+def _wait(cache):
+    # One worker renders in submission order, a no-op queued last runs after every render
+    cache.executor.submit(lambda: None).result()
+
+
+def test_thumbnails_are_cached_per_revision(db, tmp_path):
+    db.create_user(User(id="user-1", public_key="key-1", client_identifier="client-1"))
+    db.create_session(Session(id="session-1", title="Board", width=800, height=600, participants=["user-1"]))
+    db.add_canvas_object({"id": "obj-1", "session_id": "session-1", "created_by": "user-1",
+                          "object_data": json.dumps({"type": "rect", "left": 10, "top": 10, "width": 100,
+                                                     "height": 50, "fill": "red"})})
+    cache = ThumbnailCache(cache_dir=str(tmp_path), max_workers=1)
+    session = db.get_session("session-1")
+
+    # Nothing rendered yet, the render runs in the background
+    assert cache.get(session) is None
+    _wait(cache)
+    first = tmp_path / f"session-1_{session.revision}.png"
+    assert first.exists()
+    assert cache.get(session) == first
+
+    # A hit does not render again
+    mtime = first.stat().st_mtime_ns
+    cache.get(session)
+    _wait(cache)
+    assert first.stat().st_mtime_ns == mtime and not cache.in_flight
+
+    # A new revision misses, the older thumbnail is shown until the new one is rendered
+    db.edit_canvas_object("obj-1", json.dumps({"type": "rect", "left": 200, "top": 10, "width": 100,
+                                               "height": 50, "fill": "blue"}), 2)
+    session = db.get_session("session-1")
+    assert session.revision > int(first.stem.rsplit("_", 1)[1])
+    assert cache.get(session) == first
+    _wait(cache)
+
+    second = tmp_path / f"session-1_{session.revision}.png"
+    assert cache.get(session) == second
+    # Thumbnails of older revisions are removed
+    assert sorted(tmp_path.glob("session-1_*.png")) == [second]
+    cache.executor.shutdown()
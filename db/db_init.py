@@ -1,54 +1,87 @@
 import sqlite3
 
-# Create the database file and tables
-conn = sqlite3.connect("neurosketch.db")
-cursor = conn.cursor()
-
-# Create sessions table
-cursor.execute('''
-CREATE TABLE sessions(
-    id TEXT PRIMARY KEY,
-    title VARCHAR(255) NOT NULL,
-    height INTEGER NOT NULL,
-    width INTEGER NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)''')
-
-cursor.execute('''
-CREATE TABLE canvas_objects(
-    id TEXT PRIMARY KEY,
-    session_id TEXT NOT NULL,
-    object_data TEXT NOT NULL,
-    created_by TEXT NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    version INTEGER DEFAULT 1,
-    FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE,
-    FOREIGN KEY (created_by) REFERENCES users(id)
-)''')
-
-# Create session_participants table
-cursor.execute('''
-CREATE TABLE session_participants(
-    id TEXT,
-    user_id TEXT NOT NULL,
-    PRIMARY KEY (id, user_id),
-    FOREIGN KEY (id) REFERENCES sessions(id) ON DELETE CASCADE
-)''')
-
-# Create users table
-cursor.execute('''
-CREATE TABLE users(
-    id TEXT PRIMARY KEY,
-    public_key TEXT NOT NULL,
-    client_identifier VARCHAR(255) NOT NULL UNIQUE,
-    display_name VARCHAR(100),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)''')
-
-# Commit changes and close connection
-conn.commit()
-conn.close()
-
-print("Database initialized successfully!")
\ No newline at end of file
+
+def initialize_database(db_path: str = "neurosketch.db"):
+    """Create the database file and tables."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    # Create sessions table
+    cursor.execute('''
+    CREATE TABLE sessions(
+        id TEXT PRIMARY KEY,
+        title VARCHAR(255) NOT NULL,
+        height INTEGER NOT NULL,
+        width INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        revision INTEGER NOT NULL DEFAULT 0
+    )''')
+
+    cursor.execute('''
+    CREATE TABLE canvas_objects(
+        id TEXT PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        object_data TEXT NOT NULL,
+        created_by TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        version INTEGER DEFAULT 1,
+        content_hash TEXT,
+        FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE,
+        FOREIGN KEY (created_by) REFERENCES users(id)
+    )''')
+
+    # Edits to canvas objects are stored as JSON Merge Patches on top of
+    # canvas_objects.object_data and folded back periodically
+    cursor.execute('''
+    CREATE TABLE canvas_object_patches(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        object_id TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        patch TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+
+    # Generation jobs submitted to the API, kept so they survive restarts
+    cursor.execute('''
+    CREATE TABLE generation_jobs(
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        session_id TEXT NOT NULL,
+        request TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        result TEXT,
+        error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        worker TEXT
+    )''')
+
+    # Create session_participants table
+    cursor.execute('''
+    CREATE TABLE session_participants(
+        id TEXT,
+        user_id TEXT NOT NULL,
+        PRIMARY KEY (id, user_id),
+        FOREIGN KEY (id) REFERENCES sessions(id) ON DELETE CASCADE
+    )''')
+
+    # Create users table
+    cursor.execute('''
+    CREATE TABLE users(
+        id TEXT PRIMARY KEY,
+        public_key TEXT NOT NULL,
+        client_identifier VARCHAR(255) NOT NULL UNIQUE,
+        display_name VARCHAR(100),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+
+    # Commit changes and close connection
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    initialize_database()
+    print("Database initialized successfully!")
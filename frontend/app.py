@@ -7,99 +7,172 @@ sys.path.append(str(Path(__file__).parent.parent))
 import base64
 import json
 import os
-import re
+import sqlite3
 import time
 import uuid
 import atexit
-import threading
-from io import BytesIO
-from PIL import Image
-import numpy as np
 from classes import User
-import requests
-import pandas as pd
 import streamlit as st
 from streamlit_drawable_canvas import st_canvas
 from classes import Session
 from identity_utils import IdentityUtils
-from dotenv import load_dotenv
-import random
+from autosave import AutoSaver, coalesce_changes, diff_properties, empty_changes
+from thumbnails import ThumbnailCache
+from render_cache import memoize
+from canvas_cache import CanvasSnapshot, CanvasView, SharedCanvasCache
+from utils.env import load_environment
 from utils.db_manager import DatabaseManager
 from utils.db_watcher import setup_db_watcher
+from utils.hlc import HybridLogicalClock
 import extra_streamlit_components as stx
-import rsa
+
+# pandas, numpy, PIL, requests, rsa and the key pool are imported where they
+# are used, so a script start only pays for what the current page needs
 
 
 # Helper functions for canvas operations
-def save_canvas_changes(session_id, user_id):
-    """Save pending changes to the database"""
-    if "pending_changes" not in st.session_state:
-        return
-        
+def write_canvas_changes(changes, session_id, user_id):
+    """
+    Write a batch of changes to the database.
+    Does not touch st.session_state, so it can run on a background thread.
+
+    Returns:
+        dict: The version written for each modified or deleted object id
+    """
+    from utils.path_simplify import simplify_object
+
+    written_versions = {}
+    points_removed = 0
+
     # Process new objects
-    for obj in st.session_state["pending_changes"].get("new", []):
+    for obj in changes.get("new", []):
+        # Freedraw strokes carry many nearly collinear points, simplify before storing
+        obj, removed = simplify_object(obj)
+        points_removed += removed
         canvas_obj = {
-            "id": str(uuid.uuid4()),
+            # The tab gave the object its ID when it was drawn, later edits refer to it
+            "id": obj.get("id") or str(uuid.uuid4()),
             "session_id": session_id,
             "object_data": json.dumps(obj),
             "created_by": user_id
         }
-        db_manager.add_canvas_object(canvas_obj)
+        try:
+            db_manager.add_canvas_object(canvas_obj)
+        except sqlite3.IntegrityError:
+            # Already written by an earlier attempt of this batch
+            if not db_manager.get_canvas_object(canvas_obj["id"]):
+                raise
     
     # Process modified objects
-    for obj_data in st.session_state["pending_changes"].get("modified", []):
+    for obj_data in changes.get("modified", []):
         obj_id = obj_data["id"]
+        if "changes" in obj_data:
+            # Property edits merge with concurrent edits of other users, no version check
+            result = db_manager.merge_canvas_object(obj_id, obj_data["changes"], obj_data["stamps"])
+            if result:
+                written_versions[obj_id] = result.version
+                if result.rejected:
+                    print(f"Newer edits of {obj_id} kept for: {', '.join(result.rejected)}")
+            continue
         obj = obj_data["object"]
         current_version = obj_data["version"]
-        db_manager.edit_canvas_object(
+        if db_manager.edit_canvas_object(
             obj_id,
             json.dumps(obj),
             current_version + 1
-        )
+        ):
+            written_versions[obj_id] = current_version + 1
     
     # Process deleted objects
-    for obj_data in st.session_state["pending_changes"].get("deleted", []):
+    for obj_data in changes.get("deleted", []):
         obj_id = obj_data["id"]
         current_version = obj_data["version"]
-        db_manager.delete_canvas_object(obj_id, current_version + 1)
+        if db_manager.delete_canvas_object(obj_id, current_version + 1):
+            written_versions[obj_id] = current_version + 1
+
+    if points_removed:
+        print(f"Path simplification removed {points_removed} points")
+    return written_versions
+
+def save_canvas_changes(session_id, user_id):
+    """Save pending changes to the database"""
+    if "pending_changes" not in st.session_state:
+        return
+
+    # Dragging a shape records one entry per rerun, only the latest state matters
+    write_canvas_changes(coalesce_changes(st.session_state["pending_changes"]), session_id, user_id)
     
     # Clear pending changes
-    st.session_state["pending_changes"] = {"new": [], "modified": [], "deleted": []}
+    st.session_state["pending_changes"] = empty_changes()
     st.session_state["has_unsaved_changes"] = False
 
+def get_autosaver(session_id, user_id) -> AutoSaver:
+    """Get the background auto-saver for the current session, creating it if needed."""
+    autosaver = st.session_state.get("autosaver")
+    if autosaver is None or st.session_state.get("autosaver_session") != session_id:
+        if autosaver is not None:
+            autosaver.stop()
+        autosaver = AutoSaver(
+            lambda changes: write_canvas_changes(changes, session_id, user_id),
+            debounce_seconds=float(os.getenv("AUTOSAVE_DEBOUNCE_SECONDS", "2")),
+        )
+        st.session_state["autosaver"] = autosaver
+        st.session_state["autosaver_session"] = session_id
+    return autosaver
+
 @st.dialog("Confirm Refresh")
 def confirm_blank_canvas_refresh():
     """Dialog to confirm refreshing when canvas is blank in database"""
     st.write("The canvas has been cleared by another user. Your unsaved changes will be lost if you refresh.")
     if st.button("Refresh Anyway", key="confirm_refresh_button"):
-        # Get the stored data
-        db_objects = st.session_state.get("temp_refresh_data", {}).get("db_objects", [])
-        
         # Update session state with fresh data
-        st.session_state["canvas_objects"] = db_objects
-        st.session_state["canvas_drawing_state"] = convert_db_objects_to_canvas_format(db_objects)
+        refresh_canvas_data(st.session_state["selected_session"].id)
         
         # Clear pending changes
-        st.session_state["pending_changes"] = {"new": [], "modified": [], "deleted": []}
+        st.session_state["pending_changes"] = empty_changes()
         st.session_state["has_unsaved_changes"] = False
         
         st.success("Canvas refreshed with latest changes (blank canvas)")
         return True
     return False
 
-def refresh_canvas_data(session_id):
+def refresh_canvas_data(session_id) -> CanvasSnapshot:
     """Refresh canvas data from the database with confirmation if needed"""
-    # First check if the database canvas is empty
-    db_objects = db_manager.get_session_canvas_objects(session_id)
+    # The canvas is shared by every tab viewing the same (session_id, revision),
+    # an unchanged canvas is neither reloaded nor converted again
+    canvas_state_key = (session_id, db_manager.get_session_revision(session_id))
+    cache = get_canvas_cache()
+    previous = cache.get(get_viewer_id())
+    snapshot = cache.acquire(get_viewer_id(), canvas_state_key,
+                             lambda: db_manager.get_session_canvas_objects(session_id))
     
     # If canvas is empty in database and user has unsaved changes, confirm before proceeding
    
     # For normal refresh (non-empty canvas or no unsaved changes)
-    st.session_state["canvas_objects"] = db_objects
-    st.session_state["canvas_drawing_state"] = convert_db_objects_to_canvas_format(db_objects)
+    st.session_state.setdefault("canvas_view", CanvasView()).rebase(previous, snapshot)
+    st.session_state["canvas_state_key"] = canvas_state_key
+    return snapshot
+
+def current_canvas(session_id) -> CanvasSnapshot:
+    """The canvas this tab shows, loaded again if it was dropped from the shared cache"""
+    snapshot = get_canvas_cache().get(get_viewer_id())
+    if snapshot is None or snapshot.key[0] != session_id:
+        snapshot = refresh_canvas_data(session_id)
+    return snapshot
+
+def build_canvas_dataframe(objects):
+    """Flatten canvas objects into a dataframe for the "Canvas Data" expander"""
+    import pandas as pd
+
+    dataframe = pd.json_normalize(objects)
+    for col in dataframe.select_dtypes(include=["object"]).columns:
+        dataframe[col] = dataframe[col].astype("str")
+    return dataframe
 
 
-load_dotenv()
+load_environment()
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
 
 # Get a single instance of DatabaseManager to use throughout the app
 db_manager = DatabaseManager()
@@ -118,17 +191,6 @@ cookie_manager = stx.CookieManager()
 key_for_cookie = "user_identity"
 st.session_state["identity_utils"] = IdentityUtils(cookie_manager.get(key_for_cookie))
 
-def convert_db_objects_to_canvas_format(db_objects):
-    """Convert CanvasObjectDB objects to canvas-compatible format"""
-    canvas_objects = []
-    for obj in db_objects:
-        # Parse object_data JSON string back to dict
-        canvas_obj = json.loads(obj.object_data)
-        # Ensure object has correct ID
-        canvas_obj["id"] = obj.id
-        canvas_objects.append(canvas_obj)
-    return {"objects": canvas_objects}
-
 def on_db_change():
     """Handle database changes by updating in-memory canvas objects and refreshing the UI."""
     if "selected_session" in st.session_state and st.session_state["selected_session"]:
@@ -140,24 +202,36 @@ def on_db_change():
 
 def reset_canvas_state():
     """Reset all canvas-related session state variables"""
-    # Clear canvas objects and drawing state
-    st.session_state["canvas_objects"] = []
-    st.session_state["canvas_drawing_state"] = {"objects": []}
-    st.session_state["previous_canvas_state"] = []
+    # Stop viewing the shared canvas and forget this tab's own objects
+    get_canvas_cache().release(get_viewer_id())
+    st.session_state["canvas_state_key"] = None
+    st.session_state["canvas_view"] = CanvasView()
     
     # Reset change tracking
     st.session_state["has_unsaved_changes"] = False
-    st.session_state["pending_changes"] = {"new": [], "modified": [], "deleted": []}
+    st.session_state["pending_changes"] = empty_changes()
 
 def initialize_db_watcher():
     """Initialize the database watcher and canvas objects state."""
     #if "db_watcher" not in st.session_state:
         #st.session_state["db_watcher"] = setup_db_watcher(on_db_change)
-    if "canvas_objects" not in st.session_state:
-        st.session_state["canvas_objects"] = []
-    if "previous_canvas_state" not in st.session_state:
-        st.session_state["previous_canvas_state"] = []
+    if "canvas_view" not in st.session_state:
+        st.session_state["canvas_view"] = CanvasView()
+
 
+@st.cache_resource
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Thumbnail cache shared by every browser session of this process."""
+    return ThumbnailCache()
+
+@st.cache_resource
+def get_canvas_cache() -> SharedCanvasCache:
+    """Loaded canvases shared by every browser session of this process, see canvas_cache.py."""
+    return SharedCanvasCache()
+
+def get_viewer_id() -> str:
+    """Identifies this browser session to the shared canvas cache."""
+    return st.session_state.setdefault("viewer_id", str(uuid.uuid4()))
 
 def show_session_list():
     st.title("Available Drawing Sessions")
@@ -203,8 +277,15 @@ def show_session_list():
     if not sessions:
         st.warning("No sessions available. Create a new session to get started with drawing!")
     
+    thumbnails = get_thumbnail_cache()
     for session in sessions:
         with st.expander(f"📝 {session.title}"):
+            # Thumbnails are cached per canvas revision and rendered in the background
+            thumbnail = thumbnails.get(session)
+            if thumbnail:
+                st.image(str(thumbnail))
+            else:
+                st.caption("Preview is being rendered...")
             st.text(f"Session ID: {session.id}")
             st.write("Participants:")
             # Get participants for this session
@@ -227,7 +308,9 @@ def show_session_list():
                 st.rerun()
 
 def create_identity(username: str):
-    (pubkey,privkey) = rsa.newkeys(2048)
+    from utils.key_pool import KeyPool
+
+    (pubkey,privkey) = KeyPool().acquire()
     key_data = {    
         "username": username,
         "private_key": privkey.save_pkcs1().decode()
@@ -242,7 +325,16 @@ def handle_identity_creation():
     st.session_state["login_button_disabled"] = True
 
 def show_identity_creation():
+    import rsa
+    from utils.key_pool import KeyPool
+
     st.warning("⚠️ New User Detected! You need to create an identity to use Neurosketch.")
+    # Start filling the key pool while the user types their name
+    key_pool_metrics = KeyPool().metrics()
+    st.caption(
+        f"Key pool: {key_pool_metrics['depth']} ready, {key_pool_metrics['pending']} generating"
+        + (f", last key took {key_pool_metrics['last_key_seconds']:.1f}s" if key_pool_metrics['last_key_seconds'] else "")
+    )
     display_name = st.text_input("Enter your display name:")
     
     if st.button("Create Identity", disabled=st.session_state["login_button_disabled"]):
@@ -274,29 +366,12 @@ def clean_duplicate_objects(session_id: str):
     Remove duplicate objects from the database based on path data.
     This helps clean up objects that have been duplicated due to transform operations.
     """
-    db_objects = db_manager.get_session_canvas_objects(session_id)
-    
-    # Group objects by their path data
-    path_groups = {}
-    for db_obj in db_objects:
-        obj_data = json.loads(db_obj.object_data)
-        if obj_data.get("type") == "path" and "path" in obj_data:
-            path_key = json.dumps(obj_data.get("path"))
-            if path_key not in path_groups:
-                path_groups[path_key] = []
-            path_groups[path_key].append(db_obj)
-    
-    # For each group of objects with the same path, keep only the one with the highest version
-    for path_key, objs in path_groups.items():
-        if len(objs) > 1:
-            # Sort by version (descending)
-            sorted_objs = sorted(objs, key=lambda x: x.version, reverse=True)
-            # Keep the highest version, delete the rest
-            for obj_to_delete in sorted_objs[1:]:
-                db_manager.delete_canvas_object(obj_to_delete.id, obj_to_delete.version + 1)
+    # Duplicates are found by content hash and deleted in a single statement on the database side
+    removed = db_manager.dedupe_session_objects(session_id)
+    print(f"Removed {removed} duplicate objects")
     
     # Refresh canvas objects in session state
-    st.session_state["canvas_objects"] = db_manager.get_session_canvas_objects(session_id)
+    refresh_canvas_data(session_id)
 
 def process_canvas_changes(canvas_result, session_id: str, user_id: str):
     """
@@ -306,24 +381,37 @@ def process_canvas_changes(canvas_result, session_id: str, user_id: str):
         return
 
     current_objects = canvas_result.json_data["objects"]
-    previous_objects = st.session_state.get("previous_canvas_state", [])
+    snapshot = current_canvas(session_id)
+    view = st.session_state.setdefault("canvas_view", CanvasView())
     
     # Convert objects to dictionaries for easier comparison
-    current_dict = {obj.get("id", str(i)): obj for i, obj in enumerate(current_objects)}
-    previous_dict = {obj.get("id", str(i)): obj for i, obj in enumerate(previous_objects)}
+    # Objects drawn in this tab get their ID now, so that edits made before or
+    # after they are saved (in the background when auto-saving) refer to the stored object
+    current_dict = {obj["id"]: obj for obj in view.assign_ids(current_objects, snapshot)}
+    previous_dict = view.objects(snapshot)
     
-    # Create path-based lookup for database objects
-    path_to_db_obj = {}
-    for db_obj in st.session_state.get("canvas_objects", []):
-        obj_data = json.loads(db_obj.object_data)
-        if obj_data.get("type") == "path" and "path" in obj_data:
-            # Use path data as a key for lookup
-            path_key = json.dumps(obj_data.get("path"))
-            path_to_db_obj[path_key] = db_obj
+    # Path-based lookup for database objects, built once per canvas revision
+    path_to_db_obj = snapshot.by_path
     
     # Initialize pending changes if not already done
     if "pending_changes" not in st.session_state:
-        st.session_state["pending_changes"] = {"new": [], "modified": [], "deleted": []}
+        st.session_state["pending_changes"] = empty_changes()
+    # Every tab has its own clock, edits are ordered by it when they are merged on the server
+    clock = st.session_state.setdefault("clock", HybridLogicalClock())
+
+    def record_modification(object_id, obj, prev_obj, version):
+        changes = diff_properties(prev_obj, obj)
+        if not changes:
+            return
+        stamp = str(clock.now())
+        st.session_state["pending_changes"]["modified"].append({
+            "id": object_id,
+            "object": obj,
+            "version": version,
+            "changes": changes,
+            "stamps": dict.fromkeys(changes, stamp),
+        })
+        st.session_state["has_unsaved_changes"] = True
     
     # Handle new and modified objects
     for obj_id, obj in current_dict.items():
@@ -350,67 +438,31 @@ def process_canvas_changes(canvas_result, session_id: str, user_id: str):
                     if path_key in path_to_db_obj:
                         db_obj = path_to_db_obj[path_key]
                         # Add to pending changes
-                        st.session_state["pending_changes"]["modified"].append({
-                            "id": db_obj.id,
-                            "object": obj,
-                            "version": db_obj.version
-                        })
-                        st.session_state["has_unsaved_changes"] = True
+                        record_modification(db_obj.id, obj, prev_obj, db_obj.version)
                     else:
                         # Fallback if no matching path found
-                        current_version = 1
-                        for db_obj in st.session_state.get("canvas_objects", []):
-                            if db_obj.id == obj_id:
-                                current_version = db_obj.version
-                                break
+                        current_version = snapshot.versions.get(obj_id, 1)
                         
                         # Add to pending changes
-                        st.session_state["pending_changes"]["modified"].append({
-                            "id": obj_id,
-                            "object": obj,
-                            "version": current_version
-                        })
-                        st.session_state["has_unsaved_changes"] = True
+                        record_modification(obj_id, obj, prev_obj, current_version)
                 # For other changes to path objects (actual path data changed)
                 elif obj.get("path") != prev_obj.get("path"):
-                    current_version = 1
-                    for db_obj in st.session_state.get("canvas_objects", []):
-                        if db_obj.id == obj_id:
-                            current_version = db_obj.version
-                            break
+                    current_version = snapshot.versions.get(obj_id, 1)
                     
                     # Add to pending changes
-                    st.session_state["pending_changes"]["modified"].append({
-                        "id": obj_id,
-                        "object": obj,
-                        "version": current_version
-                    })
-                    st.session_state["has_unsaved_changes"] = True
+                    record_modification(obj_id, obj, prev_obj, current_version)
             # For non-path objects, use the existing comparison logic
             elif json.dumps(obj, sort_keys=True) != json.dumps(prev_obj, sort_keys=True):
-                current_version = 1
-                for db_obj in st.session_state.get("canvas_objects", []):
-                    if db_obj.id == obj_id:
-                        current_version = db_obj.version
-                        break
+                current_version = snapshot.versions.get(obj_id, 1)
                 
                 # Add to pending changes
-                st.session_state["pending_changes"]["modified"].append({
-                    "id": obj_id,
-                    "object": obj,
-                    "version": current_version
-                })
-                st.session_state["has_unsaved_changes"] = True
+                record_modification(obj_id, obj, prev_obj, current_version)
     
     # Handle deleted objects
     for obj_id in previous_dict:
         if obj_id not in current_dict:
             # Get current version for deletion
-            current_version = 1
-            for db_obj in st.session_state.get("canvas_objects", []):
-                if db_obj.id == obj_id:
-                    current_version = db_obj.version
-                    break
+            current_version = snapshot.versions.get(obj_id, 1)
             
             # Add to pending changes
             st.session_state["pending_changes"]["deleted"].append({
@@ -419,8 +471,8 @@ def process_canvas_changes(canvas_result, session_id: str, user_id: str):
             })
             st.session_state["has_unsaved_changes"] = True
     
-    # Update previous state for the next comparison
-    st.session_state["previous_canvas_state"] = current_objects
+    # Update previous state for the next comparison, only what differs from the shared canvas is kept
+    view.remember(current_dict, snapshot)
 
 def main():
     # Initialize database watcher and canvas state
@@ -449,6 +501,11 @@ def main():
         else:
             st.title(f"Drawing Session: {st.session_state['selected_session'].title}")
             if st.button("← Back to Sessions"):
+                if st.session_state.get("autosaver"):
+                    st.session_state["autosaver"].stop()
+                    st.session_state["autosaver"] = None
+                # Other tabs may still share the canvas, it is dropped once none views it
+                get_canvas_cache().release(get_viewer_id())
                 st.session_state["show_canvas"] = False
                 st.session_state["selected_session"] = None
                 st.rerun()
@@ -468,6 +525,17 @@ def main():
                     st.write(f"User: {st.session_state['identity_utils'].user_id}")
                 else:
                     st.write("Not connected")
+            if st.button("Sign out"):
+                if st.session_state.get("autosaver"):
+                    st.session_state["autosaver"].stop()
+                    st.session_state["autosaver"] = None
+                get_canvas_cache().release(get_viewer_id())
+                # Revokes the verified-session tokens of every tab of this user
+                st.session_state["identity_utils"].sign_out()
+                cookie_manager.delete(key_for_cookie)
+                st.session_state["show_canvas"] = False
+                st.session_state["selected_session"] = None
+                st.rerun()
             st.markdown("---")
 
 
@@ -479,8 +547,7 @@ def clear_canvas(session_id:str):
         db_manager.clear_canvas(session_id)
         st.success("Canvas cleared successfully!")
         #Refresh canvas objects in session state
-        st.session_state["canvas_objects"] = db_manager.get_session_canvas_objects(session_id)
-        st.session_state["canvas_drawing_state"] = convert_db_objects_to_canvas_format(st.session_state["canvas_objects"])
+        refresh_canvas_data(session_id)
 
 @st.dialog("Invite Participants")
 def invite_participants(session_id:str,participants:List[User]):
@@ -512,10 +579,7 @@ def full_app():
     
     # Only fetch fresh objects from the database when needed
     # This prevents constant reloading that makes modals unusable
-    if "canvas_objects" not in st.session_state or "canvas_drawing_state" not in st.session_state:
-        db_objects = db_manager.get_session_canvas_objects(session_id)
-        st.session_state["canvas_objects"] = db_objects
-        st.session_state["canvas_drawing_state"] = convert_db_objects_to_canvas_format(db_objects)
+    current_canvas(session_id)
     
     # Specify canvas parameters in application
     drawing_mode = st.sidebar.selectbox(
@@ -538,6 +602,8 @@ def full_app():
 
     if st.sidebar.button("Clear Canvas"):
         clear_canvas(session_id)
+
+    auto_save = st.sidebar.checkbox("Auto-save changes", key="auto_save")
         
     # Add Save and Refresh buttons
     col1, col2 = st.columns(2)
@@ -561,6 +627,8 @@ def full_app():
     # Show unsaved changes indicator if needed
     if st.session_state.get("has_unsaved_changes", False):
         st.warning("You have unsaved changes. Click 'Save Changes' to save them to the database.")
+    elif auto_save and get_autosaver(session_id, user_id).has_pending:
+        st.caption("Auto-saving changes...")
     
     # Create a canvas component
     canvas_result = st_canvas(
@@ -575,39 +643,57 @@ def full_app():
         point_display_radius=point_display_radius if drawing_mode == "point" else 0,
         display_toolbar=False,
         key="canvas_app",
-        initial_drawing=st.session_state.get("canvas_drawing_state", {"objects": []})
+        initial_drawing=current_canvas(session_id).drawing_state
     )
     
     # Process any changes to canvas objects
     if canvas_result.json_data is not None:
         process_canvas_changes(canvas_result, session_id, user_id)
 
+    # In auto-save mode the changes are handed to the background writer
+    # instead of waiting for the "Save Changes" button
+    if auto_save and st.session_state.get("has_unsaved_changes", False):
+        get_autosaver(session_id, user_id).queue(st.session_state["pending_changes"])
+        st.session_state["pending_changes"] = empty_changes()
+        st.session_state["has_unsaved_changes"] = False
+
     
     # Do something interesting with the image data and paths
     #if canvas_result.image_data is not None:
     #    st.image(canvas_result.image_data)
     with st.expander("Canvas Data"):
         # Use the session state canvas objects for display to ensure consistency
-        if st.session_state["canvas_drawing_state"] and "objects" in st.session_state["canvas_drawing_state"]:
-            objects = pd.json_normalize(st.session_state["canvas_drawing_state"]["objects"])
-            for col in objects.select_dtypes(include=["object"]).columns:
-                objects[col] = objects[col].astype("str")
+        drawing_state = current_canvas(session_id).drawing_state
+        if drawing_state["objects"]:
+            # Only rebuilt when the loaded canvas revision changes
+            objects = memoize(
+                "canvas_dataframe",
+                st.session_state.get("canvas_state_key"),
+                lambda: build_canvas_dataframe(drawing_state["objects"])
+            )
             st.dataframe(objects)
         else:
             st.write("No canvas objects found.")
 
     ai_prompt = st.text_input("Have Claude 3.7 generate a drawing for you!")
+    bypass_cache = st.checkbox("Generate a new drawing even if this prompt was drawn before")
+    stream_objects = st.checkbox("Show objects as they are generated")
     if st.button("Generate Drawing"):
         if ai_prompt:
+            import requests
+            import rsa
+
             # Call the backend API to generate a drawing
-            # For now, we will just show a success message
-            st.success(f"Drawing generation queued: {ai_prompt}")
             generate_request_obj = {
                 "user_id": st.session_state["identity_utils"].user_id,
                 "session_id": st.session_state["selected_session"].id,
                 "timestamp": str(time.time()),
+                "nonce": str(uuid.uuid4()),
                 "prompt": ai_prompt
             }
+            # Only sent when set, the signature covers exactly the fields sent
+            if bypass_cache:
+                generate_request_obj["bypass_cache"] = True
             # Convert to string in a consistent way
             request_data = json.dumps(generate_request_obj, sort_keys=True)
             private_key = rsa.PrivateKey.load_pkcs1(st.session_state["identity_utils"].private_key.encode("utf-8"))
@@ -617,17 +703,99 @@ def full_app():
             signature_b64 = base64.b64encode(signature).decode("utf-8")
             print("Request data being signed:", request_data)
             print("Signature:", signature_b64)
-            # Create POST request to localhost:8000/generate, with signature as header
+            # Create POST request to the backend, with signature as header
             headers = {
                 "Authorization": f"Bearer {signature_b64}"
             }
-            # Make the request to the backend API
-            response = requests.post("http://localhost:8000/generate", json=generate_request_obj, headers=headers)
-            print("Response:", response.json())
+            if stream_objects:
+                stream_generated_objects(generate_request_obj, headers, session_id)
+            else:
+                # The backend only queues the generation, the result is polled below
+                try:
+                    response = requests.post(f"{BACKEND_URL}/generate/jobs", json=generate_request_obj, headers=headers, timeout=10)
+                    response.raise_for_status()
+                    job = response.json()
+                    print("Generation job:", job)
+                    st.session_state.setdefault("generation_jobs", []).append({"id": job["job_id"], "prompt": ai_prompt})
+                    st.success(f"Drawing generation queued: {ai_prompt}")
+                except requests.RequestException as e:
+                    st.error(f"Could not queue the drawing generation: {e}")
 
         else:
             st.error("Please enter a prompt to generate a drawing.")
 
+    show_generation_jobs(session_id)
+
+
+def stream_generated_objects(generate_request_obj, headers, session_id):
+    """Generate through the streaming endpoint, listing each object as soon as the backend stored it"""
+    import requests
+
+    stored = 0
+    with st.status(f"Generating: {generate_request_obj['prompt']}", expanded=True) as status:
+        progress = st.empty()
+        segments = 0
+        try:
+            with requests.post(f"{BACKEND_URL}/generate/stream", json=generate_request_obj, headers=headers,
+                               stream=True, timeout=(10, 300)) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event["event"] == "segment":
+                        segments += 1
+                        progress.caption(f"{segments} path commands received")
+                    elif event["event"] == "object":
+                        stored += 1
+                        st.write(f"Added a {event['object']['type']}")
+                    elif event["event"] in ("invalid", "error"):
+                        st.write(f"Skipped an invalid object: {event['error']}")
+        except requests.RequestException as e:
+            status.update(label=f"Drawing generation failed: {e}", state="error")
+            return
+        status.update(label=f"Generated {stored} objects", state="complete" if stored else "error")
+
+    if stored:
+        refresh_canvas_data(session_id)
+        st.rerun()
+
+
+@st.fragment(run_every=2)
+def show_generation_jobs(session_id):
+    """Poll the backend for queued generations, refreshing the canvas once one finished"""
+    jobs = st.session_state.get("generation_jobs", [])
+    if not jobs:
+        return
+
+    import requests
+
+    pending = []
+    finished = False
+    for job in jobs:
+        try:
+            response = requests.get(f"{BACKEND_URL}/generate/jobs/{job['id']}", timeout=5)
+            status = response.json() if response.ok else {"status": "failed", "error": response.text}
+        except requests.RequestException as e:
+            # Keep the job and try again on the next poll
+            print(f"Error polling generation job {job['id']}: {e}")
+            pending.append(job)
+            continue
+
+        if status["status"] == "succeeded":
+            finished = True
+            st.toast(f"Drawing generated: {job['prompt']}")
+        elif status["status"] == "failed":
+            st.toast(f"Drawing generation failed: {status.get('error')}")
+        else:
+            pending.append(job)
+            st.caption(f"Generating \"{job['prompt']}\" ({status['status']})...")
+
+    st.session_state["generation_jobs"] = pending
+    if finished:
+        refresh_canvas_data(session_id)
+        st.rerun(scope="app")
+
 
 
 
@@ -635,6 +803,9 @@ def full_app():
 def cleanup_resources():
     """Clean up resources when the app is closing."""
     print("Cleaning up resources...")
+    # Write any changes still waiting in the auto-saver
+    if st.session_state.get("autosaver"):
+        st.session_state["autosaver"].stop()
     # Stop the watcher if it exists
     if "db_watcher" in st.session_state:
         try:
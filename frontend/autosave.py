@@ -0,0 +1,143 @@
+from threading import Timer, Lock
+from typing import Callable, Dict, Optional
+
+
+def empty_changes() -> dict:
+    """Return an empty pending changes structure."""
+    return {"new": [], "modified": [], "deleted": []}
+
+
+def diff_properties(previous: dict, current: dict) -> dict:
+    """
+    The top level properties that differ between two states of an object.
+    Removed properties map to None.
+    """
+    changes = {key: value for key, value in current.items() if key not in previous or previous[key] != value}
+    changes.update({key: None for key in previous if key not in current})
+    return changes
+
+
+def coalesce_changes(changes: dict) -> dict:
+    """
+    Collapse pending canvas changes so every object appears at most once.
+
+    Entries are expected in the order they were recorded:
+    - repeated modifications of an object keep only the latest state, their
+      property edits are combined (later edits of a property replace earlier ones)
+    - a modification of a new object is folded into the new object
+    - a deleted object drops its modifications, and a new object that is
+      deleted before being saved disappears entirely
+
+    Args:
+        changes: Dictionary with "new", "modified" and "deleted" lists
+
+    Returns:
+        dict: Coalesced changes with the same structure
+    """
+    new_objects = {}
+    for index, obj in enumerate(changes.get("new", [])):
+        # Objects drawn in this session may not carry an id yet, never merge those
+        key = obj.get("id") or f"__new_{index}"
+        new_objects[key] = obj
+
+    modified = {}
+    for entry in changes.get("modified", []):
+        if entry["id"] in new_objects:
+            new_objects[entry["id"]] = entry["object"]
+        elif "changes" in entry and "changes" in modified.get(entry["id"], {}):
+            earlier = modified[entry["id"]]
+            modified[entry["id"]] = dict(
+                entry,
+                changes={**earlier["changes"], **entry["changes"]},
+                stamps={**earlier["stamps"], **entry["stamps"]},
+            )
+        else:
+            modified[entry["id"]] = entry
+
+    deleted = {}
+    for entry in changes.get("deleted", []):
+        modified.pop(entry["id"], None)
+        if entry["id"] in new_objects:
+            del new_objects[entry["id"]]
+        else:
+            deleted[entry["id"]] = entry
+
+    return {
+        "new": list(new_objects.values()),
+        "modified": list(modified.values()),
+        "deleted": list(deleted.values()),
+    }
+
+
+class AutoSaver:
+    """
+    Collects canvas changes and writes them in the background once no new
+    changes arrived for ``debounce_seconds``, so Streamlit reruns never wait
+    on database writes.
+    """
+
+    def __init__(self, flush_function: Callable[[dict], Optional[Dict[str, int]]], debounce_seconds: float = 2.0):
+        """
+        Args:
+            flush_function: Writes a batch of coalesced changes and returns the
+                            versions it wrote, keyed by object id
+            debounce_seconds: Quiet period before pending changes are flushed
+        """
+        self.flush_function = flush_function
+        self.debounce_seconds = debounce_seconds
+        self.pending = empty_changes()
+        self.written_versions = {}
+        self.timer = None
+        self.lock = Lock()
+        self.flush_lock = Lock()
+        self.last_error = None
+
+    @property
+    def has_pending(self) -> bool:
+        with self.lock:
+            return any(self.pending.values())
+
+    def queue(self, changes: dict):
+        """Merge changes into the pending batch and restart the debounce timer."""
+        with self.lock:
+            merged = {key: self.pending[key] + changes.get(key, []) for key in self.pending}
+            self.pending = coalesce_changes(merged)
+
+            if self.timer:
+                self.timer.cancel()
+            self.timer = Timer(self.debounce_seconds, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        """Write all pending changes now."""
+        with self.flush_lock:
+            with self.lock:
+                batch = self.pending
+                self.pending = empty_changes()
+            if not any(batch.values()):
+                return
+
+            # Entries were recorded against the versions loaded into the UI,
+            # earlier background flushes may have moved them on since
+            for entry in batch["modified"] + batch["deleted"]:
+                entry["version"] = max(entry["version"], self.written_versions.get(entry["id"], 0))
+
+            try:
+                self.written_versions.update(self.flush_function(batch) or {})
+                self.last_error = None
+            except Exception as e:
+                print(f"Error in auto-save: {e}")
+                self.last_error = e
+                # Keep the batch so the next flush retries it
+                with self.lock:
+                    merged = {key: batch[key] + self.pending[key] for key in self.pending}
+                    self.pending = coalesce_changes(merged)
+
+    def stop(self):
+        """Cancel the timer and write whatever is still pending."""
+        with self.lock:
+            if self.timer:
+                self.timer.cancel()
+                self.timer = None
+        self.flush()
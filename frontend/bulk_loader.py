@@ -0,0 +1,296 @@
+"""
+Column-wise loading of exported canvas data (CSV and JSON).
+
+CanvasObject.from_dict handles one row at a time. An export of a large
+board is instead parsed into one NumPy array per property and a handful of
+flat arrays for all paths together:
+
+- path_offsets (n + 1): the commands of object i are path_offsets[i]:path_offsets[i + 1]
+- path_codes (m): the command letters as ASCII codes
+- coord_offsets (m + 1): the coordinates of command j are coord_offsets[j]:coord_offsets[j + 1]
+- path_coords (k): all coordinates
+
+Paths exported as strings ("[['M', 1.0, 2.0], ['Q', ...]]") are tokenized
+by looking at their bytes with NumPy, never evaluated. CanvasObject instances are only
+built when an object is accessed.
+
+Values are read like CanvasObject.from_dict reads them, except that numbers
+and booleans are converted and an empty number takes the field's default.
+"""
+import csv
+import json
+import warnings
+from dataclasses import MISSING, fields
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+from canvas import CanvasObject
+
+
+
+def _byte_table(characters: bytes) -> np.ndarray:
+    """Lookup table: True for the given bytes."""
+    table = np.zeros(256, dtype=bool)
+    table[np.frombuffer(characters, dtype=np.uint8)] = True
+    return table
+
+
+# Bytes around the tokens of a path written as a Python or JSON list: command letters
+# are quoted, numbers follow a separator
+_LETTERS = _byte_table(b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
+_QUOTES = _byte_table(b"'\"")
+_NUMBER_CHARACTERS = _byte_table(b"0123456789-+.eE")
+_NUMBER_STARTS = _byte_table(b"0123456789-+.")
+_NUMBER_PRECEDERS = _byte_table(b" ,[\t\n")
+NONE_VALUES = {"", "None", "null", "nan", "NaN"}
+# Text read as None by CanvasObject.from_dict, other strings (the empty one included) are kept
+NONE_STRINGS = {"None", "null"}
+TRUE_VALUES = {"True", "true", "1"}
+# A property an object does not have, it gets the field's default
+_MISSING = object()
+
+_FIELDS = {field.name: field for field in fields(CanvasObject)}
+
+
+def _kind(annotation) -> str:
+    """How a CanvasObject field is stored: float, int, bool, str or object."""
+    for kind, python_type in (("bool", bool), ("int", int), ("float", float)):
+        if annotation is python_type:
+            return kind
+    if annotation is str or annotation == Optional[str]:
+        return "str"
+    return "object"
+
+
+_KINDS = {name: _kind(field.type) for name, field in _FIELDS.items() if name != "path"}
+
+
+def _default(name: str):
+    field = _FIELDS[name]
+    return field.default if field.default is not MISSING else None
+
+
+def parse_path(value: Any) -> Optional[List[list]]:
+    """
+    A single path, as list of lists, from its exported string form. Lists are returned as they are.
+    """
+    if value is None or isinstance(value, list):
+        return value
+    loaded = _PathArrays.build([value])
+    return loaded.path(0)
+
+
+class _PathArrays:
+    """All paths of an export in flat arrays, see the module docstring."""
+
+    def __init__(self, path_offsets: np.ndarray, path_codes: np.ndarray, coord_offsets: np.ndarray,
+                 path_coords: np.ndarray, present: np.ndarray):
+        self.path_offsets = path_offsets
+        self.path_codes = path_codes
+        self.coord_offsets = coord_offsets
+        self.path_coords = path_coords
+        self.present = present  # False for objects without a path
+
+    @classmethod
+    def build(cls, values: List[Any]) -> '_PathArrays':
+        """
+        Parse the paths of many objects at once.
+
+        Every path is written as text (lists as JSON), one per line. Command
+        letters are the quoted letters and numbers start after a separator,
+        both are located by their byte offsets in the whole text and all
+        numbers are parsed by a single call, so no Python code runs per
+        command or per coordinate.
+
+        Raises:
+            ValueError: If a path is not a list of commands, or has coordinates before its first command
+        """
+        # Paths are separated by newlines, line breaks within a path are only whitespace
+        texts = [
+            json.dumps(value) if isinstance(value, list) else
+            value.replace("\r", " ").replace("\n", " ") if isinstance(value, str) and value not in NONE_VALUES else ""
+            for value in values
+        ]
+        text = "\n".join(texts).encode("utf-8")
+        data = np.frombuffer(text, dtype=np.uint8)
+        previous = np.concatenate([np.frombuffer(b"\n", dtype=np.uint8), data])[:-1]
+
+        is_command = _LETTERS[data] & _QUOTES[previous]
+        is_number = _NUMBER_STARTS[data] & _NUMBER_PRECEDERS[previous]
+        command_positions = np.flatnonzero(is_command)
+        number_positions = np.flatnonzero(is_number)
+
+        # Blank out everything but the numbers and parse them in one go
+        numbers = data.copy()
+        numbers[~_NUMBER_CHARACTERS[data]] = ord(" ")
+        numbers[command_positions] = ord(" ")
+        with warnings.catch_warnings():
+            # Raised for text that is not all numbers, caught by the count check below
+            warnings.simplefilter("ignore", DeprecationWarning)
+            path_coords = np.fromstring(numbers.tobytes(), dtype=np.float64, sep=" ")
+        if len(path_coords) != len(number_positions):
+            raise ValueError("Unreadable path data")
+        path_codes = data[command_positions].copy()
+
+        line_ends = np.flatnonzero(data == ord("\n"))
+        command_paths = np.searchsorted(line_ends, command_positions)
+        number_commands = np.searchsorted(command_positions, number_positions) - 1
+        if len(path_coords) and (number_commands.min() < 0 or np.any(
+                command_paths[number_commands] != np.searchsorted(line_ends, number_positions))):
+            raise ValueError("Path coordinates before the first command")
+
+        path_offsets = np.zeros(len(values) + 1, dtype=np.intp)
+        np.cumsum(np.bincount(command_paths, minlength=len(values)), out=path_offsets[1:])
+        coord_offsets = np.zeros(len(command_positions) + 1, dtype=np.intp)
+        np.cumsum(np.bincount(number_commands, minlength=len(command_positions)), out=coord_offsets[1:])
+        return cls(path_offsets, path_codes, coord_offsets, path_coords, np.diff(path_offsets) > 0)
+
+    def path(self, i: int) -> Optional[List[list]]:
+        if not self.present[i]:
+            return None
+        start, end = self.path_offsets[i], self.path_offsets[i + 1]
+        coords = self.path_coords[self.coord_offsets[start]:self.coord_offsets[end]].tolist()
+        counts = np.diff(self.coord_offsets[start:end + 1]).tolist()
+        path, position = [], 0
+        for code, count in zip(self.path_codes[start:end].tobytes().decode("ascii"), counts):
+            path.append([code] + coords[position:position + count])
+            position += count
+        return path
+
+
+class CanvasColumns:
+    """
+    Canvas objects stored column by column.
+
+    Scalar properties are NumPy arrays (float64, int64, bool, or object for
+    strings and nested values) with missing values replaced by the
+    CanvasObject defaults. Paths are kept in flat arrays. Indexing or
+    iterating builds CanvasObject instances on demand, each at most once.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], paths: _PathArrays):
+        self.columns = columns
+        self.paths = paths
+        self._objects: Dict[int, CanvasObject] = {}
+
+    def __len__(self) -> int:
+        return len(self.paths.present)
+
+    def column(self, name: str) -> np.ndarray:
+        """The values of a property for all objects."""
+        return self.columns[name]
+
+    @property
+    def path_offsets(self) -> np.ndarray:
+        return self.paths.path_offsets
+
+    @property
+    def path_codes(self) -> np.ndarray:
+        return self.paths.path_codes
+
+    @property
+    def coord_offsets(self) -> np.ndarray:
+        return self.paths.coord_offsets
+
+    @property
+    def path_coords(self) -> np.ndarray:
+        return self.paths.path_coords
+
+    def path(self, i: int) -> Optional[List[list]]:
+        """The path of an object as list of lists, None if it has none."""
+        return self.paths.path(i)
+
+    def __getitem__(self, i: int) -> CanvasObject:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        canvas_object = self._objects.get(i)
+        if canvas_object is None:
+            values = {name: column[i].item() if isinstance(column[i], np.generic) else column[i]
+                      for name, column in self.columns.items()}
+            canvas_object = CanvasObject(**values, path=self.path(i))
+            self._objects[i] = canvas_object
+        return canvas_object
+
+    def __iter__(self) -> Iterator[CanvasObject]:
+        return (self[i] for i in range(len(self)))
+
+
+def _column(values: List[Any], kind: str, default: Any) -> np.ndarray:
+    """Convert the raw values of a property, strings from CSV cells included."""
+    if kind in ("float", "int"):
+        column = np.array([np.nan if value is None or value is _MISSING or value in NONE_VALUES else value
+                           for value in values], dtype=object).astype(np.float64)
+        column[np.isnan(column)] = default
+        return column.astype(np.int64) if kind == "int" else column
+    if kind == "bool":
+        return np.array([value in TRUE_VALUES if isinstance(value, str) else
+                         (default if value is None or value is _MISSING else bool(value)) for value in values], dtype=bool)
+
+    column = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        if value is _MISSING:
+            column[i] = default
+        elif value is None or (isinstance(value, str) and value in NONE_STRINGS):
+            column[i] = None
+        elif kind == "object" and isinstance(value, str) and value[:1] in "[{":
+            # Nested values (strokeDashArray, shadow) are written as JSON or Python literals
+            try:
+                column[i] = json.loads(value)
+            except ValueError:
+                try:
+                    column[i] = json.loads(value.replace("'", '"').replace("None", "null")
+                                           .replace("True", "true").replace("False", "false"))
+                except ValueError:
+                    column[i] = value
+        else:
+            column[i] = value
+    return column
+
+
+def load_records(records: Iterable[dict]) -> CanvasColumns:
+    """
+    Load objects given as dictionaries: JSON objects, or the rows of a CSV export.
+
+    Args:
+        records: Objects in Fabric.js JSON form or as exported by CanvasObject.to_dict
+
+    Returns:
+        CanvasColumns: The objects, column by column
+    """
+    records = list(records)
+    # The unnamed first column of a CSV export is the index
+    index_source = "" if records and "" in records[0] and "index" not in records[0] else "index"
+    columns = {
+        name: _column([record.get(index_source if name == "index" else name, _MISSING) for record in records],
+                      kind, _default(name))
+        for name, kind in _KINDS.items()
+    }
+    paths = _PathArrays.build([record.get("path") for record in records])
+    return CanvasColumns(columns, paths)
+
+
+def load_csv(source: Union[str, Path, Iterable[str]]) -> CanvasColumns:
+    """Load a CSV export: a file path, or an open file."""
+    if isinstance(source, (str, Path)):
+        with open(source, newline="", encoding="utf-8") as file:
+            return load_records(csv.DictReader(file))
+    return load_records(csv.DictReader(source))
+
+
+def load_json(source: Union[str, Path, Iterable[str]]) -> CanvasColumns:
+    """Load a JSON export: a list of objects, or a canvas state with an "objects" list."""
+    if isinstance(source, (str, Path)):
+        with open(source, encoding="utf-8") as file:
+            data = json.load(file)
+    else:
+        data = json.load(source)
+    return load_records(data["objects"] if isinstance(data, dict) else data)
+
+
+def load_export(path: Union[str, Path]) -> CanvasColumns:
+    """Load a CSV or JSON export, by its file extension."""
+    return load_csv(path) if Path(path).suffix.lower() == ".csv" else load_json(path)
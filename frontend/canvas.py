@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import List, Optional, Any, Union
+from typing import List, Optional, Any, Tuple, Union
 import json
 import ast
 
@@ -105,3 +105,26 @@ class CanvasObject:
                 result[key] = value
         return result
 
+    def bounds(self, stroke: bool = False) -> Tuple[float, float, float, float]:
+        """
+        Axis aligned bounding box on the canvas, with the object's transforms applied.
+
+        Args:
+            stroke: Include the stroke width, like Fabric.js' getBoundingRect
+
+        Returns:
+            Tuple[float, float, float, float]: left, top, right, bottom
+        """
+        return tuple(self.bounds_of([self], stroke)[0].tolist())
+
+    @staticmethod
+    def bounds_of(objects: List['CanvasObject'], stroke: bool = False):
+        """
+        Bounding boxes of many objects at once.
+
+        Returns:
+            np.ndarray: Shape (n, 4), left, top, right, bottom
+        """
+        from utils.geometry import object_bounds
+
+        return object_bounds([obj.__dict__ for obj in objects], stroke)
@@ -0,0 +1,283 @@
+"""
+Canvas data shared by every browser tab of the Streamlit process.
+
+A board is loaded and parsed once per (session_id, revision) into a
+CanvasSnapshot, which all tabs viewing that revision share. Snapshots are
+never modified: a tab only keeps a CanvasView, the objects its own canvas
+changed, added or removed on top of the snapshot.
+
+The cache counts the viewers of every snapshot. A snapshot is dropped as
+soon as its last viewer moved on to another revision or left, and the least
+recently used ones are dropped once the cached canvases take more memory
+than allowed. Streamlit does not say when a tab is closed, so viewers that
+did not rerun for a while are forgotten; a tab whose snapshot was dropped
+loads the current revision again on its next rerun.
+"""
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from threading import Condition
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from utils.classes import CanvasObjectDB
+
+CanvasKey = Tuple[str, int]  # (session_id, revision)
+
+# Properties that change when an object is moved, resized or rotated
+_TRANSFORM_PROPERTIES = frozenset({
+    "left", "top", "width", "height", "scaleX", "scaleY", "angle", "flipX", "flipY", "skewX", "skewY",
+})
+
+
+def content_key(obj: dict) -> str:
+    """What an object draws, the same before and after it is moved, resized or rotated."""
+    if obj.get("type") == "path" and "path" in obj:
+        # As in CanvasSnapshot.by_path
+        return json.dumps(obj["path"])
+    return json.dumps({key: value for key, value in obj.items() if key not in _TRANSFORM_PROPERTIES}, sort_keys=True)
+
+
+class CanvasSnapshot:
+    """One revision of a session's canvas, parsed once. Shared between tabs, must not be modified."""
+
+    def __init__(self, key: CanvasKey, db_objects: List[CanvasObjectDB]):
+        self.key = key
+        self.db_objects = tuple(db_objects)
+        objects = []
+        for obj in db_objects:
+            canvas_obj = json.loads(obj.object_data)
+            # The canvas reports objects by the ID they are stored with
+            canvas_obj["id"] = obj.id
+            objects.append(canvas_obj)
+        # Passed to the canvas component as its initial drawing
+        self.drawing_state = {"objects": objects}
+        self.objects_by_id = {obj["id"]: obj for obj in objects}
+        self.versions = {obj.id: obj.version for obj in db_objects}
+        # Stored path objects by their path data, a transformed path keeps its path but may lose its ID
+        self.by_path = {
+            json.dumps(canvas_obj["path"]): db_obj
+            for canvas_obj, db_obj in zip(objects, db_objects)
+            if canvas_obj.get("type") == "path" and "path" in canvas_obj
+        }
+        # Memory is accounted by the length of the objects' JSON, parsed they take a few times more
+        self.size = sum(len(obj.object_data) for obj in db_objects)
+
+
+class CanvasView:
+    """
+    The canvas state of one tab, as differences to a snapshot.
+
+    Holds the objects the tab's canvas reported last time, which the next
+    rerun compares against to find what the user changed.
+    """
+
+    def __init__(self):
+        self.key: Optional[CanvasKey] = None  # Snapshot the differences apply to, None for an empty canvas
+        self.changed: Dict[str, dict] = {}  # Objects added or changed by this tab
+        self.removed: Set[str] = set()  # IDs of snapshot objects this tab no longer has
+        # IDs given to objects the canvas reports without one, by their content key
+        self.assigned_ids: Dict[str, List[str]] = {}
+
+    def assign_ids(self, objects: List[dict], snapshot: Optional[CanvasSnapshot]) -> List[dict]:
+        """
+        The canvas objects, those without an ID given the same one on every rerun.
+
+        Objects are recognised by their content key rather than their position,
+        so deleting an object does not hand its ID to the next one. Identical
+        objects keep their IDs in drawing order. An ID is forgotten once its
+        object is in the snapshot, the canvas then reports the object with it.
+        """
+        stored = snapshot.objects_by_id if snapshot is not None else {}
+        for key, ids in list(self.assigned_ids.items()):
+            ids[:] = [object_id for object_id in ids if object_id not in stored]
+            if not ids:
+                del self.assigned_ids[key]
+
+        seen: Dict[str, int] = {}
+        result = []
+        for obj in objects:
+            if "id" not in obj:
+                key = content_key(obj)
+                ids = self.assigned_ids.setdefault(key, [])
+                index = seen[key] = seen.get(key, -1) + 1
+                if index == len(ids):
+                    ids.append(str(uuid.uuid4()))
+                obj = dict(obj, id=ids[index])
+            result.append(obj)
+        return result
+
+    def objects(self, snapshot: Optional[CanvasSnapshot]) -> Dict[str, dict]:
+        """The tab's objects by ID. The objects are shared, they must not be modified."""
+        base = snapshot.objects_by_id if snapshot is not None and snapshot.key == self.key else {}
+        objects = {object_id: obj for object_id, obj in base.items() if object_id not in self.removed}
+        objects.update(self.changed)
+        return objects
+
+    def remember(self, objects: Dict[str, dict], snapshot: Optional[CanvasSnapshot]):
+        """Store the tab's objects, as far as they differ from the snapshot."""
+        base = snapshot.objects_by_id if snapshot is not None else {}
+        self.key = snapshot.key if snapshot is not None else None
+        self.changed = {object_id: obj for object_id, obj in objects.items() if base.get(object_id) != obj}
+        self.removed = base.keys() - objects.keys()
+
+    def rebase(self, old: Optional[CanvasSnapshot], new: CanvasSnapshot):
+        """Keep the same objects on top of another snapshot, e.g. after a refresh loaded a newer revision."""
+        if self.key == new.key:
+            return
+        if self.key is not None and (old is None or old.key != self.key):
+            # The old snapshot is gone, assume the canvas shows what was loaded
+            self.key, self.changed, self.removed = new.key, {}, set()
+            return
+        self.remember(self.objects(old), new)
+
+
+class _Entry:
+    def __init__(self, snapshot: CanvasSnapshot):
+        self.snapshot = snapshot
+        self.viewers: Set[str] = set()
+
+
+class SharedCanvasCache:
+    """
+    Reference-counted canvas snapshots keyed by (session_id, revision). Thread safe.
+
+    A viewer is a browser tab, identified by an ID it keeps in its session
+    state, and views at most one snapshot at a time.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, viewer_ttl: Optional[float] = None):
+        """
+        Args:
+            max_bytes: Object JSON the cached snapshots may hold together, defaults to CANVAS_CACHE_MAX_MB
+            viewer_ttl: Seconds after which a tab that did not rerun stops counting as a viewer,
+                        defaults to CANVAS_CACHE_VIEWER_TTL
+        """
+        self.max_bytes = max_bytes if max_bytes is not None else int(float(os.getenv("CANVAS_CACHE_MAX_MB", "256")) * 1024 * 1024)
+        self.viewer_ttl = viewer_ttl if viewer_ttl is not None else float(os.getenv("CANVAS_CACHE_VIEWER_TTL", "900"))
+
+        self.entries: "OrderedDict[CanvasKey, _Entry]" = OrderedDict()  # least recently used first
+        self.viewers: Dict[str, Tuple[CanvasKey, float]] = {}  # viewer_id -> (key, last seen)
+        self.loading: Set[CanvasKey] = set()
+        self.size = 0
+        self.condition = Condition()
+
+        # Metrics
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0  # Snapshots without viewers left
+        self.pressure_evictions = 0  # Snapshots dropped over the memory limit
+
+    def _expire_viewers(self, now: float):
+        expired = [viewer_id for viewer_id, (_, seen) in self.viewers.items() if now - seen > self.viewer_ttl]
+        for viewer_id in expired:
+            self._drop_viewer(viewer_id)
+
+    def _drop_viewer(self, viewer_id: str):
+        key, _ = self.viewers.pop(viewer_id)
+        self._leave(viewer_id, key)
+
+    def _leave(self, viewer_id: str, key: CanvasKey):
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        entry.viewers.discard(viewer_id)
+        if not entry.viewers:
+            self._evict(key)
+            self.evictions += 1
+
+    def _evict(self, key: CanvasKey):
+        entry = self.entries.pop(key)
+        self.size -= entry.snapshot.size
+        for viewer_id in entry.viewers:
+            self.viewers.pop(viewer_id, None)
+
+    def _view(self, viewer_id: str, key: CanvasKey, now: float) -> CanvasSnapshot:
+        """Make ``key`` the snapshot of a viewer, releasing the one it viewed before."""
+        previous = self.viewers.get(viewer_id)
+        entry = self.entries[key]
+        entry.viewers.add(viewer_id)
+        self.viewers[viewer_id] = (key, now)
+        if previous is not None and previous[0] != key:
+            self._leave(viewer_id, previous[0])
+        self.entries.move_to_end(key)
+        return entry.snapshot
+
+    def acquire(self, viewer_id: str, key: CanvasKey, load: Callable[[], List[CanvasObjectDB]]) -> CanvasSnapshot:
+        """
+        Start viewing a revision of a canvas, loading it unless another tab already did.
+        Tabs asking for a revision that is being loaded wait for it instead of loading it again.
+
+        Args:
+            viewer_id: ID of the tab
+            key: (session_id, revision) to view
+            load: Reads the canvas objects of the revision
+
+        Returns:
+            CanvasSnapshot: The shared snapshot
+        """
+        with self.condition:
+            while True:
+                self._expire_viewers(time.monotonic())
+                if key in self.entries:
+                    self.hits += 1
+                    return self._view(viewer_id, key, time.monotonic())
+                if key not in self.loading:
+                    break
+                self.condition.wait()
+            self.loading.add(key)
+
+        try:
+            snapshot = CanvasSnapshot(key, load())
+        except BaseException:
+            # One of the waiting tabs loads it instead
+            with self.condition:
+                self.loading.discard(key)
+                self.condition.notify_all()
+            raise
+
+        # Stored before the waiting tabs are woken up, they find it instead of loading it again
+        with self.condition:
+            self.loading.discard(key)
+            self.condition.notify_all()
+            self.loads += 1
+            self.entries[key] = _Entry(snapshot)
+            self.size += snapshot.size
+            snapshot = self._view(viewer_id, key, time.monotonic())
+            # Least recently used first, the snapshot just loaded stays even if it is over the limit on its own
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                self._evict(next(iter(self.entries)))
+                self.pressure_evictions += 1
+            return snapshot
+
+    def get(self, viewer_id: str) -> Optional[CanvasSnapshot]:
+        """The snapshot a tab views, None if it views none or its snapshot was dropped."""
+        with self.condition:
+            now = time.monotonic()
+            self._expire_viewers(now)
+            viewed = self.viewers.get(viewer_id)
+            if viewed is None:
+                return None
+            self.viewers[viewer_id] = (viewed[0], now)
+            self.entries.move_to_end(viewed[0])
+            return self.entries[viewed[0]].snapshot
+
+    def release(self, viewer_id: str):
+        """Stop viewing, e.g. when a tab leaves its session."""
+        with self.condition:
+            if viewer_id in self.viewers:
+                self._drop_viewer(viewer_id)
+
+    def metrics(self) -> dict:
+        with self.condition:
+            return {
+                "snapshots": len(self.entries),
+                "viewers": len(self.viewers),
+                "size": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "pressure_evictions": self.pressure_evictions,
+            }
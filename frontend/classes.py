@@ -12,6 +12,7 @@ class Session:
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     participants: List[str] = None
+    revision: int = 0
 
     def __post_init__(self):
         if self.participants is None:
@@ -27,7 +28,8 @@ class Session:
             width=row[2],
             height=row[3],
             created_at=datetime.fromisoformat(row[4]) if row[4] else None,
-            updated_at=datetime.fromisoformat(row[5]) if row[5] else None
+            updated_at=datetime.fromisoformat(row[5]) if row[5] else None,
+            revision=row[6] if len(row) > 6 else 0
         )
 
 @dataclass
@@ -73,6 +75,7 @@ class CanvasObjectDB:
     version: int = 1
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    content_hash: Optional[str] = None  # Hash of the path geometry, None for other objects
     
     
     @classmethod
@@ -86,7 +89,7 @@ class CanvasObjectDB:
             created_at=datetime.fromisoformat(row[4]) if row[4] else None,
             updated_at=datetime.fromisoformat(row[5]) if row[5] else None,
             version=row[6] if row[6] else 1,
-            
+            content_hash=row[7] if len(row) > 7 else None,
         )
 
 # Sample sessions for testing
@@ -1,11 +1,11 @@
 from pathlib import Path
-import rsa
 import json
 import time
 import streamlit as st
 import extra_streamlit_components as stx
 from extra_streamlit_components import CookieManager
 from utils.db_manager import DatabaseManager
+from utils.session_tokens import SessionTokenManager
 
 class IdentityUtils:
     def __init__(self,key_json):
@@ -17,21 +17,17 @@ class IdentityUtils:
         self.user_id = key_json.get("user_id", None)
         self.private_key = key_json.get("private_key", None)
         
-        # Check if we need to verify identity based on timestamp
-        current_time = time.time()
-        last_verified = st.session_state.get("last_identity_verification", 0)
-        verification_interval = 5  # seconds
-        
-        if current_time - last_verified >= verification_interval:
-            print(f"Verifying identity (last verified {current_time - last_verified:.1f}s ago)")
-            self.has_identity = self._check_identity()
-            # Store the verification result and timestamp
-            st.session_state["identity_verified"] = self.has_identity
-            st.session_state["last_identity_verification"] = current_time
+        # A verified-session token replaces the RSA challenge until it expires
+        tokens = SessionTokenManager()
+        token = st.session_state.get("identity_token")
+        if token and tokens.verify(token, self.user_id):
+            self.has_identity = True
         else:
-            # Use the cached verification result
-            self.has_identity = st.session_state.get("identity_verified", False)
-            print(f"Using cached identity verification (verified {current_time - last_verified:.1f}s ago)")
+            print("Verifying identity (no valid session token)")
+            # The tab switched to another identity, the token of the previous one is revoked
+            self._drop_token()
+            self.has_identity = self._check_identity()
+            st.session_state["identity_token"] = tokens.issue(self.user_id) if self.has_identity else None
     
     def _check_identity(self) -> bool:
         print("Checking identity of", self.user_id) 
@@ -42,6 +38,7 @@ class IdentityUtils:
             # Load the private key
                 
             # Load the private key
+            import rsa
             private_key = rsa.PrivateKey.load_pkcs1(self.private_key.encode())
             
             # Verify identity using challenge-response
@@ -61,8 +58,26 @@ class IdentityUtils:
             print(f"Error checking identity: {str(e)}")
             return False
     
+    @staticmethod
+    def _drop_token() -> None:
+        """Revoke and forget the verified-session token of this tab."""
+        token = st.session_state.pop("identity_token", None)
+        if token:
+            SessionTokenManager().revoke(token)
+
+    def sign_out(self) -> None:
+        """Revoke every verified-session token of the user, in all of their tabs."""
+        if getattr(self, "user_id", None):
+            SessionTokenManager().revoke_user(self.user_id)
+        st.session_state.pop("identity_token", None)
+        self.has_identity = False
+
     def create_identity(self, user_id:str) -> None:
-        (pubkey, privkey) = rsa.newkeys(2048)
+        # A new identity replaces the one this tab had
+        self._drop_token()
+        # Keys are generated ahead of time in the background, see utils/key_pool.py
+        from utils.key_pool import KeyPool
+        (pubkey, privkey) = KeyPool().acquire()
         key_data = {
             "user_id": user_id,
             "private_key": privkey.save_pkcs1().decode()
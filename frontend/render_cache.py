@@ -0,0 +1,33 @@
+from typing import Any, Callable, Hashable, Optional
+
+import streamlit as st
+
+
+def memoize(name: str, key: Optional[Hashable], build: Callable[[], Any]) -> Any:
+    """
+    Per browser session memoization for work done while rendering.
+
+    The value stored under ``name`` is reused as long as it was built for the
+    same ``key`` - typically (session_id, canvas revision) - so reruns that do
+    not change the canvas skip the work entirely. Only the latest value is kept
+    per name. A ``None`` key disables caching.
+
+    Args:
+        name: Name of the cached value
+        key: Key the value is valid for
+        build: Function producing the value on a miss
+
+    Returns:
+        The cached or freshly built value
+    """
+    if key is None:
+        return build()
+
+    memo = st.session_state.setdefault("render_memo", {})
+    entry = memo.get(name)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+
+    value = build()
+    memo[name] = (key, value)
+    return value
@@ -0,0 +1,159 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from utils.db_manager import DatabaseManager
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+THUMBNAIL_SIZE = (240, 180)
+BACKGROUND_COLOR = (238, 238, 238, 255)  # Same as the canvas background (#eee)
+ELLIPSE_SEGMENTS = 32
+
+
+def _parse_color(value) -> Optional[Tuple[int, int, int, int]]:
+    """Convert a Fabric.js color string to an RGBA tuple, None for no color."""
+    if not value or value == "transparent":
+        return None
+    from PIL import ImageColor
+
+    value = value.strip()
+    try:
+        if value.startswith("rgba("):
+            r, g, b, a = [part.strip() for part in value[5:-1].split(",")]
+            return int(r), int(g), int(b), int(float(a) * 255)
+        return ImageColor.getcolor(value, "RGBA")
+    except ValueError:
+        return None
+
+
+def render_thumbnail(objects: List[dict], canvas_width: int, canvas_height: int,
+                     size: Tuple[int, int] = THUMBNAIL_SIZE) -> 'Image.Image':
+    """
+    Rasterize canvas objects into a small preview image.
+    The outlines of all objects are transformed at once (origin, scale, flips, rotation and skew).
+
+    Args:
+        objects: Canvas objects in Fabric.js JSON form
+        canvas_width: Width of the session canvas
+        canvas_height: Height of the session canvas
+        size: Size of the thumbnail in pixels
+
+    Returns:
+        Image.Image: The rendered thumbnail
+    """
+    # Only loaded by the background renderer, not on every script start
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    from utils.geometry import object_corners, object_sizes, transform_matrices, transform_points, transformed_paths
+
+    image = Image.new("RGBA", size, BACKGROUND_COLOR)
+    draw = ImageDraw.Draw(image, "RGBA")
+    scale = min(size[0] / max(canvas_width, 1), size[1] / max(canvas_height, 1))
+    if not objects:
+        return image
+
+    matrices = transform_matrices(objects)
+    corners = object_corners(objects) * scale
+    # Ellipses as polygons, the unit circle through every object's transform
+    angles = np.linspace(0, 2 * np.pi, ELLIPSE_SEGMENTS, endpoint=False)
+    circle = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+    path_points, path_owners = transformed_paths(objects)
+    path_points *= scale
+    path_starts = np.searchsorted(path_owners, np.arange(len(objects) + 1))
+
+    for i, obj in enumerate(objects):
+        stroke = _parse_color(obj.get("stroke"))
+        fill = _parse_color(obj.get("fill"))
+        line_width = max(1, round((obj.get("strokeWidth") or 1) * scale))
+        obj_type = obj.get("type")
+
+        if obj_type == "rect":
+            draw.polygon([tuple(point) for point in corners[i].tolist()], fill=fill, outline=stroke, width=line_width)
+        elif obj_type in ("circle", "ellipse"):
+            points = transform_points(matrices[i], circle * object_sizes([obj])[0] / 2) * scale
+            draw.polygon([tuple(point) for point in points.tolist()], fill=fill, outline=stroke, width=line_width)
+        elif obj_type == "line":
+            # Line end points are stored relative to the center of the object
+            ends = [[obj.get("x1") or 0, obj.get("y1") or 0], [obj.get("x2") or 0, obj.get("y2") or 0]]
+            points = transform_points(matrices[i], ends) * scale
+            draw.line([tuple(point) for point in points.tolist()], fill=stroke, width=line_width)
+        elif obj_type == "path":
+            points = path_points[path_starts[i]:path_starts[i + 1]]
+            if len(points) < 2:
+                continue
+            draw.line([tuple(point) for point in points.tolist()], fill=stroke, width=line_width, joint="curve")
+    return image
+
+
+class ThumbnailCache:
+    """
+    On-disk cache of session previews keyed by (session_id, canvas revision).
+    Missing thumbnails are rendered by a background worker pool, so looking
+    one up never blocks a rerun.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, size: Tuple[int, int] = THUMBNAIL_SIZE, max_workers: int = 2):
+        self.cache_dir = Path(cache_dir or os.getenv("THUMBNAIL_DIR", Path(__file__).parent / "tmp" / "thumbnails"))
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.size = size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnail")
+        self.in_flight = set()
+        self.latest = {}  # session_id -> (revision, path) of the newest rendered thumbnail
+        self.lock = Lock()
+
+    def path_for(self, session_id: str, revision: int) -> Path:
+        return self.cache_dir / f"{session_id}_{revision}.png"
+
+    def get(self, session) -> Optional[Path]:
+        """
+        Get the thumbnail of a session.
+
+        Returns the thumbnail for the current revision if it exists. Otherwise
+        a render is scheduled and the newest older thumbnail (if any) is returned.
+        """
+        path = self.path_for(session.id, session.revision)
+        if path.exists():
+            return path
+
+        self.schedule(session)
+        with self.lock:
+            return self.latest.get(session.id, (None, None))[1]
+
+    def schedule(self, session):
+        """Render the thumbnail of a session in the background unless it is already being rendered."""
+        key = (session.id, session.revision)
+        with self.lock:
+            if key in self.in_flight:
+                return
+            self.in_flight.add(key)
+        self.executor.submit(self._render, session.id, session.revision, session.width, session.height)
+
+    def _render(self, session_id: str, revision: int, width: int, height: int):
+        try:
+            objects = [json.loads(obj.object_data) for obj in DatabaseManager().get_session_canvas_objects(session_id)]
+            image = render_thumbnail(objects, width, height, self.size)
+
+            path = self.path_for(session_id, revision)
+            tmp_path = path.with_suffix(".tmp")
+            image.save(tmp_path, format="PNG")
+            os.replace(tmp_path, path)
+
+            # Thumbnails of older revisions are no longer needed
+            for old_path in self.cache_dir.glob(f"{session_id}_*.png"):
+                if int(old_path.stem.rsplit("_", 1)[1]) < revision:
+                    old_path.unlink(missing_ok=True)
+            with self.lock:
+                if revision >= self.latest.get(session_id, (-1, None))[0]:
+                    self.latest[session_id] = (revision, path)
+        except Exception as e:
+            print(f"Error rendering thumbnail for session {session_id}: {e}")
+        finally:
+            with self.lock:
+                self.in_flight.discard((session_id, revision))
@@ -0,0 +1,230 @@
+"""
+Database change notifications shared by all workers of a multi-worker server.
+
+Every worker process (``uvicorn --workers N``) creates a ChangeFeed. The
+workers elect a leader through an exclusive lock on a lock file: only the
+leader watches the database file, and it passes every change on to the
+other workers over a Unix socket. The lock is released by the operating
+system when the leader's process dies, its socket connections close, and
+the remaining workers compete for the lock again, so leadership fails over
+without any timeouts to tune.
+
+Where file locks (fcntl) or Unix sockets are not available, every worker
+is its own leader and runs its own watcher, as before.
+"""
+import hashlib
+import os
+import socket
+import tempfile
+import threading
+from typing import Callable, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from .db_watcher import setup_db_watcher
+from .env import load_environment
+
+CHANGE_MESSAGE = b"change\n"
+
+
+def _default_path(suffix: str) -> str:
+    """A path in the temp folder shared by all workers using the same database."""
+    load_environment()
+    database = os.path.abspath(os.getenv("PATH_TO_DB") or "neurosketch.db")
+    # Unix socket paths are limited to about a hundred characters, hash the database path
+    key = hashlib.sha1(database.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"neurosketch-{key}.{suffix}")
+
+
+class ChangeFeed:
+    """
+    Calls ``callback`` in every worker when the database changes, with a single file watcher for all of them.
+    """
+
+    def __init__(self, callback: Callable[[], None], lock_path: Optional[str] = None,
+                 socket_path: Optional[str] = None, debounce_seconds: float = 1, retry_seconds: Optional[float] = None):
+        """
+        Args:
+            callback: Called on a background thread after every database change
+            lock_path: Lock file of the leader election, defaults to WORKER_LOCK_PATH
+            socket_path: Unix socket the leader publishes changes on, defaults to WORKER_SOCKET_PATH
+            debounce_seconds: Passed on to the database watcher
+            retry_seconds: How often a worker without a leader retries the election,
+                           defaults to WORKER_RETRY_SECONDS
+        """
+        self.callback = callback
+        self.lock_path = lock_path or os.getenv("WORKER_LOCK_PATH") or _default_path("lock")
+        self.socket_path = socket_path or os.getenv("WORKER_SOCKET_PATH") or _default_path("sock")
+        self.debounce_seconds = debounce_seconds
+        self.retry_seconds = retry_seconds if retry_seconds is not None else float(os.getenv("WORKER_RETRY_SECONDS", "1"))
+
+        self.is_leader = False
+        self.lock_file = None
+        self.observer = None
+        self.server: Optional[socket.socket] = None
+        self.followers: List[socket.socket] = []
+        self.connection: Optional[socket.socket] = None  # to the leader, while following
+        self.followers_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+        # Metrics
+        self.elections_won = 0
+        self.changes_published = 0
+        self.changes_received = 0
+
+    @property
+    def supported(self) -> bool:
+        """Whether workers can share one watcher on this platform."""
+        return fcntl is not None and hasattr(socket, "AF_UNIX")
+
+    def start(self):
+        if not self.supported:
+            self._lead()
+            return
+        self.thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+        self.thread.start()
+
+    def _try_lock(self) -> bool:
+        lock_file = open(self.lock_path, "a+")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def _run(self):
+        while not self.stopped.is_set():
+            if self._try_lock():
+                try:
+                    self._lead()
+                except Exception as e:
+                    print(f"Error starting the change feed leader: {e}")
+                    # Let another worker take over instead of holding the lock without watching
+                    self._resign()
+                return
+            if not self._follow():
+                # No leader to connect to yet (it may be starting up or just died)
+                self.stopped.wait(self.retry_seconds)
+
+    def _lead(self):
+        """Become the leader: watch the database and serve the other workers."""
+        self.is_leader = True
+        self.elections_won += 1
+        print(f"Worker {os.getpid()} is the change feed leader")
+        if self.supported:
+            # The lock guarantees no other leader uses the socket, a leftover file is stale
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(self.socket_path)
+            self.server.listen()
+            threading.Thread(target=self._accept, name="change-feed-accept", daemon=True).start()
+        self.observer = setup_db_watcher(self.publish, self.debounce_seconds)
+
+    def _accept(self):
+        while not self.stopped.is_set():
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return  # The server socket was closed
+            with self.followers_lock:
+                self.followers.append(connection)
+
+    def _follow(self) -> bool:
+        """Receive changes from the leader until it goes away. Returns False if there is no leader to connect to."""
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(self.socket_path)
+        except OSError:
+            connection.close()
+            return False
+
+        self.connection = connection
+        try:
+            buffer = b""
+            while not self.stopped.is_set():
+                data = connection.recv(4096)
+                if not data:
+                    break  # The leader stopped or died
+                buffer += data
+                while CHANGE_MESSAGE in buffer:
+                    buffer = buffer.replace(CHANGE_MESSAGE, b"", 1)
+                    self.changes_received += 1
+                    self._notify()
+        except OSError:
+            pass
+        finally:
+            self.connection = None
+            connection.close()
+        return True
+
+    def _notify(self):
+        try:
+            self.callback()
+        except Exception as e:
+            print(f"Error in database change callback: {e}")
+
+    def publish(self):
+        """Tell this worker and every follower that the database changed. Called by the leader's watcher."""
+        self.changes_published += 1
+        with self.followers_lock:
+            for follower in list(self.followers):
+                try:
+                    follower.sendall(CHANGE_MESSAGE)
+                except OSError:
+                    self.followers.remove(follower)
+                    follower.close()
+        self._notify()
+
+    def stop(self):
+        """Stop watching or following, handing leadership over to another worker."""
+        self.stopped.set()
+        connection = self.connection
+        if connection:
+            try:
+                # Wakes up the thread blocked in recv
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self.thread:
+            self.thread.join()
+        self._resign()
+
+    def _resign(self):
+        """Stop watching and serving the followers, and release the leader lock."""
+        if self.observer:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+        if self.server:
+            self.server.close()
+            self.server = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        with self.followers_lock:
+            for follower in self.followers:
+                follower.close()
+            self.followers.clear()
+        if self.lock_file:
+            # Closing the file releases the lock
+            self.lock_file.close()
+            self.lock_file = None
+        self.is_leader = False
+
+    def metrics(self) -> dict:
+        with self.followers_lock:
+            followers = len(self.followers)
+        return {
+            "pid": os.getpid(),
+            "leader": self.is_leader,
+            "followers": followers,
+            "elections_won": self.elections_won,
+            "changes_published": self.changes_published,
+            "changes_received": self.changes_received,
+        }
@@ -12,6 +12,7 @@ class Session:
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     participants: List[str] = None
+    revision: int = 0
 
     def __post_init__(self):
         if self.participants is None:
@@ -27,7 +28,8 @@ class Session:
             width=row[2],
             height=row[3],
             created_at=datetime.fromisoformat(row[4]) if row[4] else None,
-            updated_at=datetime.fromisoformat(row[5]) if row[5] else None
+            updated_at=datetime.fromisoformat(row[5]) if row[5] else None,
+            revision=row[6] if len(row) > 6 else 0
         )
 
 @dataclass
@@ -73,6 +75,7 @@ class CanvasObjectDB:
     version: int = 1
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    content_hash: Optional[str] = None  # Hash of the path geometry, None for other objects
     
     
     @classmethod
@@ -86,7 +89,43 @@ class CanvasObjectDB:
             created_at=datetime.fromisoformat(row[4]) if row[4] else None,
             updated_at=datetime.fromisoformat(row[5]) if row[5] else None,
             version=row[6] if row[6] else 1,
-            
+            content_hash=row[7] if len(row) > 7 else None,
+        )
+
+@dataclass
+class MergeResult:
+    """Outcome of merging property edits into a canvas object."""
+    version: int  # Version of the object after the merge
+    applied: List[str]  # Properties whose edits won
+    rejected: List[str]  # Properties already written with a later timestamp
+
+@dataclass
+class GenerationJob:
+    id: str
+    user_id: str
+    session_id: str
+    request: str  # JSON string of the generation request
+    status: str = "queued"  # queued, running, succeeded or failed
+    result: Optional[str] = None  # JSON string
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    worker: Optional[str] = None  # ID of the API worker that claimed the job
+
+    @classmethod
+    def from_db_row(cls, row: tuple) -> 'GenerationJob':
+        """Create a GenerationJob instance from a database row."""
+        return cls(
+            id=row[0],
+            user_id=row[1],
+            session_id=row[2],
+            request=row[3],
+            status=row[4],
+            result=row[5],
+            error=row[6],
+            created_at=datetime.fromisoformat(row[7]) if row[7] else None,
+            updated_at=datetime.fromisoformat(row[8]) if row[8] else None,
+            worker=row[9] if len(row) > 9 else None
         )
 
 # Sample sessions for testing
@@ -0,0 +1,27 @@
+import hashlib
+import json
+from typing import Optional
+
+# Coordinates are rounded before hashing so float noise does not hide duplicates
+HASH_PRECISION = 2
+
+
+def path_content_hash(object_data: dict) -> Optional[str]:
+    """
+    Compute a normalized hash of the path geometry of a canvas object.
+
+    Args:
+        object_data: Canvas object in Fabric.js JSON form
+
+    Returns:
+        Optional[str]: Hex digest of the path, None for objects without path data
+    """
+    path = object_data.get("path")
+    if object_data.get("type") != "path" or not isinstance(path, list):
+        return None
+
+    normalized = [
+        [cmd[0], *(round(float(value), HASH_PRECISION) for value in cmd[1:])]
+        for cmd in path
+    ]
+    return hashlib.sha1(json.dumps(normalized, separators=(",", ":")).encode("utf-8")).hexdigest()
@@ -1,16 +1,22 @@
 import os
 import sqlite3
 import uuid
-import rsa
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Union
 from contextlib import contextmanager
 from datetime import datetime
 import time
+import json
 from threading import Lock
-from .classes import CanvasObjectDB
-from dotenv import load_dotenv
+from .classes import CanvasObjectDB, MergeResult
+from .merge_patch import apply_merge_patch, create_merge_patch
+from .content_hash import path_content_hash
+from .hlc import HybridLogicalClock, Timestamp
+from .env import load_environment
 
-from .classes import Session, User, SessionParticipant
+from .classes import Session, User, SessionParticipant, GenerationJob
+
+if TYPE_CHECKING:
+    import rsa
 
 
 
@@ -32,14 +38,27 @@ class DatabaseManager:
         if getattr(self, '_initialized', False):
             return
             
-        load_dotenv()
+        load_environment()
         self.db_path = os.getenv('PATH_TO_DB')
         if not self.db_path:
             raise ValueError("Database path not found in environment variables")
         
+        # Number of stored patches after which an object is folded back
+        # into a single full row, keeping materialization cost bounded
+        self.patch_fold_threshold = int(os.getenv('PATCH_FOLD_THRESHOLD', '16'))
+        # Reject objects whose path duplicates an existing one in the same session
+        self.unique_canvas_content = os.getenv('UNIQUE_CANVAS_CONTENT', '').lower() in ('1', 'true', 'yes')
+        # Orders property edits made here against the ones merged from clients
+        self.clock = HybridLogicalClock(f"server-{uuid.uuid4().hex[:8]}")
+        # Property edits stamped further than this in the future are rejected, so a
+        # client with a fast clock cannot win every conflict
+        self.max_clock_drift = int(os.getenv('HLC_MAX_DRIFT_MS', '60000'))
+
         # Enable WAL mode for better concurrent access
         with self._get_connection() as conn:
             conn.execute('PRAGMA journal_mode=WAL')
+
+        self._ensure_schema()
         
         # Mark as initialized
         self._initialized = True
@@ -49,6 +68,128 @@ class DatabaseManager:
         # Nothing to clean up since connections are closed by the context manager
         pass
 
+    def _ensure_schema(self):
+        """Create the tables, indexes and triggers added on top of the base schema."""
+        with self._get_connection() as conn:
+            has_canvas_objects = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'canvas_objects'"
+            ).fetchone()
+            if not has_canvas_objects:
+                print("canvas_objects table not found, skipping schema upgrade (run db/db_init.py first)")
+                return
+
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS canvas_object_patches(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                object_id TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                patch TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )""")
+            conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_canvas_object_patches_object
+            ON canvas_object_patches(object_id, version)""")
+            # Patches have no meaning without their base object
+            conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS canvas_objects_delete_patches
+            AFTER DELETE ON canvas_objects
+            BEGIN
+                DELETE FROM canvas_object_patches WHERE object_id = OLD.id;
+            END""")
+
+            # Timestamp of the last write of every property, the last writer wins on merges
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS canvas_object_clocks(
+                object_id TEXT NOT NULL,
+                property TEXT NOT NULL,
+                stamp TEXT NOT NULL,
+                PRIMARY KEY (object_id, property)
+            )""")
+            conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS canvas_objects_delete_clocks
+            AFTER DELETE ON canvas_objects
+            BEGIN
+                DELETE FROM canvas_object_clocks WHERE object_id = OLD.id;
+            END""")
+
+            # Canvas revision: bumped on every change to a session's objects so
+            # caches can be keyed on (session_id, revision)
+            self._ensure_column(conn, "sessions", "revision", "INTEGER NOT NULL DEFAULT 0")
+            for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+                conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS canvas_objects_{event.lower()}_revision
+                AFTER {event} ON canvas_objects
+                BEGIN
+                    UPDATE sessions SET revision = revision + 1 WHERE id = {row}.session_id;
+                END""")
+            # Normalized hash of the path geometry, used to find duplicate objects in SQL
+            if self._ensure_column(conn, "canvas_objects", "content_hash", "TEXT"):
+                self._backfill_content_hashes(conn)
+            conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_canvas_objects_content_hash
+            ON canvas_objects(session_id, content_hash)""")
+
+            conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS canvas_object_patches_insert_revision
+            AFTER INSERT ON canvas_object_patches
+            BEGIN
+                UPDATE sessions SET revision = revision + 1
+                WHERE id = (SELECT session_id FROM canvas_objects WHERE id = NEW.object_id);
+            END""")
+
+            # Generation jobs survive restarts of the API
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS generation_jobs(
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                request TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                result TEXT,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )""")
+            # Worker running a job, so that with several workers a job is only run once
+            self._ensure_column(conn, "generation_jobs", "worker", "TEXT")
+            conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_generation_jobs_status
+            ON generation_jobs(status)""")
+            conn.commit()
+
+        if self.unique_canvas_content:
+            self.enforce_unique_canvas_content()
+
+    def _backfill_content_hashes(self, conn: sqlite3.Connection, batch_size: int = 500):
+        """Compute content hashes for objects stored before the column existed."""
+        patches_by_object = {}
+        for object_id, version, patch, created_at in conn.execute(
+            "SELECT object_id, version, patch, created_at FROM canvas_object_patches ORDER BY object_id, version"
+        ).fetchall():
+            patches_by_object.setdefault(object_id, []).append((version, patch, created_at))
+
+        cursor = conn.execute("SELECT * FROM canvas_objects")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                canvas_object = self._materialize_canvas_object(tuple(row), patches_by_object.get(row[0], []))
+                content_hash = path_content_hash(json.loads(canvas_object.object_data))
+                if content_hash:
+                    updates.append((content_hash, canvas_object.id))
+            conn.executemany("UPDATE canvas_objects SET content_hash = ? WHERE id = ?", updates)
+
+    @staticmethod
+    def _ensure_column(conn: sqlite3.Connection, table: str, column: str, definition: str) -> bool:
+        """Add a column to an existing table if it is missing. Returns True if it was added."""
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+        if column in columns:
+            return False
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        return True
+
     @contextmanager
     def _get_connection(self):
         """Context manager for database connections with automatic closing."""
@@ -85,6 +226,35 @@ class DatabaseManager:
             except Exception as e:
                 raise
 
+    def _transaction_with_retry(self, work, max_retries: int = 3):
+        """
+        Run several statements in a single write transaction, retrying when the database is locked.
+
+        Args:
+            work: Callable receiving the open connection; its return value is returned
+
+        Returns:
+            Whatever ``work`` returns
+        """
+        retry_count = 0
+        while retry_count < max_retries:
+            try:
+                with self._get_connection() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        result = work(conn)
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    conn.commit()
+                    return result
+            except sqlite3.OperationalError as e:
+                if "database is locked" in str(e) and retry_count < max_retries - 1:
+                    retry_count += 1
+                    time.sleep(0.1 * retry_count)  # Exponential backoff
+                    continue
+                raise
+
     # Session Operations
     def create_session(self, session: Session) -> bool:
         """Create a new session in the database."""
@@ -111,6 +281,13 @@ class DatabaseManager:
             row = cursor.fetchone()
             return Session.from_db_row(tuple(row)) if row else None
 
+    def get_session_revision(self, session_id: str) -> int:
+        """Get the canvas revision of a session, it changes whenever its canvas objects change."""
+        query = "SELECT revision FROM sessions WHERE id = ?"
+        with self._get_connection() as conn:
+            row = conn.execute(query, (session_id,)).fetchone()
+            return row[0] if row else 0
+
     def update_session(self, session: Session) -> bool:
         """Update an existing session."""
         query = """
@@ -150,6 +327,19 @@ class DatabaseManager:
             row = cursor.fetchone()
             return User.from_db_row(tuple(row)) if row else None
         
+    def get_public_keys(self, user_ids: List[str]) -> Dict[str, str]:
+        """The stored public keys of the given users, users that do not exist are left out."""
+        keys = {}
+        with self._get_connection() as conn:
+            # Stay below SQLite's limit on the number of query parameters
+            for start in range(0, len(user_ids), 500):
+                chunk = user_ids[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT id, public_key FROM users WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                keys.update((row[0], row[1]) for row in rows)
+        return keys
+
     def get_all_users(self) -> List[User]:
         query = "SELECT * FROM users"
         with self._get_connection() as conn:
@@ -193,12 +383,14 @@ class DatabaseManager:
         self.create_user(user)
         return user
 
-    def verify_user_identity(self, user_id: str, private_key: rsa.PrivateKey) -> bool:
+    def verify_user_identity(self, user_id: str, private_key: 'rsa.PrivateKey') -> bool:
         """
         Verify user identity using RSA challenge-response.
         Generates a challenge internally and verifies it using the stored public key.
         Returns True if verification succeeds, False otherwise.
         """
+        import rsa
+
         print("Verifying identity of:", user_id)
         user = self.get_user(user_id)
         print(user)
@@ -305,21 +497,117 @@ class DatabaseManager:
             bool: True if successful, False otherwise
         """
         query = """
-        INSERT INTO canvas_objects (id, session_id, object_data, created_by)
-        VALUES (?, ?, ?, ?)
+        INSERT INTO canvas_objects (id, session_id, object_data, created_by, content_hash)
+        VALUES (?, ?, ?, ?, ?)
         """
-        cursor = self._execute_with_retry(
-            query,
-            (canvas_object['id'], canvas_object['session_id'], 
-             canvas_object['object_data'], canvas_object['created_by']),
-            is_write=True
-        )
+        content_hash = path_content_hash(json.loads(canvas_object['object_data']))
+        try:
+            cursor = self._execute_with_retry(
+                query,
+                (canvas_object['id'], canvas_object['session_id'], 
+                 canvas_object['object_data'], canvas_object['created_by'], content_hash),
+                is_write=True
+            )
+        except sqlite3.IntegrityError as e:
+            # Only duplicate content is expected when unique content is enforced
+            if "content_hash" not in str(e):
+                raise
+            print(f"Rejected duplicate canvas object {canvas_object['id']}")
+            return False
         return cursor.rowcount > 0
 
+    def add_canvas_objects(self, canvas_objects: List[dict]) -> int:
+        """
+        Add several new canvas objects in a single transaction.
+        Either all of them are written or, on an error, none.
+
+        Args:
+            canvas_objects (List[dict]): Objects in the same form as for add_canvas_object
+
+        Returns:
+            int: Number of objects written. When unique content is enforced,
+                 duplicates of objects already in the session are skipped.
+        """
+        # Duplicates are skipped instead of failing the whole batch
+        verb = "INSERT OR IGNORE" if self.unique_canvas_content else "INSERT"
+        query = f"""
+        {verb} INTO canvas_objects (id, session_id, object_data, created_by, content_hash)
+        VALUES (?, ?, ?, ?, ?)
+        """
+        rows = [
+            (canvas_object['id'], canvas_object['session_id'], canvas_object['object_data'],
+             canvas_object['created_by'], path_content_hash(json.loads(canvas_object['object_data'])))
+            for canvas_object in canvas_objects
+        ]
+
+        def insert(conn):
+            # For executemany, rowcount sums the rows inserted by every statement
+            return conn.executemany(query, rows).rowcount
+
+        return self._transaction_with_retry(insert)
+
+    def dedupe_session_objects(self, session_id: str) -> int:
+        """
+        Delete objects whose path geometry duplicates another object in the session.
+        For each group of duplicates the object with the highest version is kept.
+        Runs as a single SQL statement, nothing is loaded into Python.
+
+        Args:
+            session_id (str): ID of the session to clean up
+
+        Returns:
+            int: Number of deleted objects
+        """
+        query = f"""
+        DELETE FROM canvas_objects
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY content_hash
+                    ORDER BY {self._EFFECTIVE_VERSION_SQL} DESC, rowid DESC
+                ) AS duplicate_rank
+                FROM canvas_objects
+                WHERE session_id = ? AND content_hash IS NOT NULL
+            )
+            WHERE duplicate_rank > 1
+        )
+        """
+        cursor = self._execute_with_retry(query, (session_id,), is_write=True)
+        return cursor.rowcount
+
+    def enforce_unique_canvas_content(self):
+        """
+        Remove existing duplicates and add a unique index so duplicate
+        objects are rejected when they are written.
+        """
+        with self._get_connection() as conn:
+            session_ids = [row[0] for row in conn.execute(
+                "SELECT DISTINCT session_id FROM canvas_objects WHERE content_hash IS NOT NULL"
+            ).fetchall()]
+        for session_id in session_ids:
+            self.dedupe_session_objects(session_id)
+
+        self._execute_with_retry("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_canvas_objects_unique_content
+        ON canvas_objects(session_id, content_hash)
+        """, is_write=True)
+
+    # Effective version of an object: the newest stored patch, or the base row version
+    _EFFECTIVE_VERSION_SQL = """
+    COALESCE(
+        (SELECT MAX(p.version) FROM canvas_object_patches p WHERE p.object_id = canvas_objects.id),
+        canvas_objects.version
+    )
+    """
+
     def edit_canvas_object(self, object_id: str, object_data: str, new_version: int) -> bool:
         """
         Edit an existing canvas object.
         Only proceeds if the new version is greater than the current version.
+
+        The edit is stored as a JSON Merge Patch against the current state of
+        the object, so moving or resizing a large path only writes the changed
+        properties instead of the whole object.
         
         Args:
             object_id (str): ID of the object to edit
@@ -329,32 +617,248 @@ class DatabaseManager:
         Returns:
             bool: True if edit was successful, False if version check failed or object not found
         """
-        # First get current version
-        version_query = "SELECT version FROM canvas_objects WHERE id = ?"
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(version_query, (object_id,))
-            result = cursor.fetchone()
-            if not result:
+        current = self.get_canvas_object(object_id)
+        if not current or new_version <= current.version:
+            return False
+
+        patch = create_merge_patch(json.loads(current.object_data), json.loads(object_data))
+        # Later merges of edits made before this one must not undo it
+        return self.patch_canvas_object(object_id, patch, new_version, stamp=str(self.clock.now()))
+
+    def patch_canvas_object(self, object_id: str, patch: dict, new_version: int,
+                            stamp: Optional[str] = None) -> bool:
+        """
+        Store a JSON Merge Patch for a canvas object.
+        Only proceeds if the new version is greater than the current version.
+        Objects are folded back into a single row once they collect
+        ``patch_fold_threshold`` patches.
+
+        Args:
+            object_id (str): ID of the object to patch
+            patch (dict): JSON Merge Patch to apply on top of the current object data
+            new_version (int): New version number
+            stamp (Optional[str]): Hybrid logical clock timestamp to record for the patched
+                                   properties, in the same transaction as the patch
+
+        Returns:
+            bool: True if the patch was stored, False if version check failed, object not found
+                  or, when unique content is enforced, the patched path duplicates another object
+        """
+        def store(conn):
+            # Version check and writes in one write transaction so concurrent edits cannot interleave
+            row = conn.execute(
+                f"SELECT {self._EFFECTIVE_VERSION_SQL} FROM canvas_objects WHERE id = ?", (object_id,)
+            ).fetchone()
+            if not row or new_version <= row[0]:
                 return False
-            current_version = result[0]
-            
-            # Only proceed if new version is greater
-            if new_version <= current_version:
+            # Lists are replaced as a whole by a merge patch, so a patched path is the full new path
+            if "path" in patch and not self._update_content_hash(conn, object_id, patch["path"]):
                 return False
-        
-        # Update the object
-        update_query = """
-        UPDATE canvas_objects 
-        SET object_data = ?, version = ?, updated_at = CURRENT_TIMESTAMP
-        WHERE id = ?
+            conn.execute(
+                "INSERT INTO canvas_object_patches (object_id, version, patch) VALUES (?, ?, ?)",
+                (object_id, new_version, json.dumps(patch))
+            )
+            if stamp:
+                conn.executemany(self._STAMP_SQL, [(object_id, key, stamp) for key in patch])
+            return True
+
+        if not self._transaction_with_retry(store):
+            return False
+        self._fold_if_needed(object_id)
+        return True
+
+    @staticmethod
+    def _update_content_hash(conn: sqlite3.Connection, object_id: str, path: list) -> bool:
         """
-        cursor = self._execute_with_retry(
-            update_query,
-            (object_data, new_version, object_id),
-            is_write=True
-        )
-        return cursor.rowcount > 0
+        Set the content hash of an object to the one of a new path, within a transaction.
+
+        Returns:
+            bool: False if unique content is enforced and another object of the session has this path
+        """
+        try:
+            conn.execute(
+                "UPDATE canvas_objects SET content_hash = ? WHERE id = ?",
+                (path_content_hash({"type": "path", "path": path}), object_id)
+            )
+        except sqlite3.IntegrityError as e:
+            # A failed statement leaves the rest of the transaction in place
+            if "content_hash" not in str(e):
+                raise
+            print(f"Rejected edit of canvas object {object_id}, its path duplicates another object")
+            return False
+        return True
+
+    # Sets the timestamp of a property unless a later one is stored
+    _STAMP_SQL = """
+    INSERT INTO canvas_object_clocks (object_id, property, stamp) VALUES (?, ?, ?)
+    ON CONFLICT(object_id, property) DO UPDATE SET stamp = excluded.stamp
+    WHERE excluded.stamp > canvas_object_clocks.stamp
+    """
+
+    def merge_canvas_object(self, object_id: str, changes: dict,
+                            stamps: Union[str, Dict[str, str]]) -> Optional[MergeResult]:
+        """
+        Merge property edits into a canvas object, without a version check.
+
+        Every property is a last-writer-wins register: an edit is applied if
+        its hybrid logical clock timestamp is later than the one of the last
+        write of that property, and dropped otherwise. Concurrent edits of
+        different properties therefore both apply, and concurrent edits of the
+        same property resolve to the same winner whatever order they arrive in.
+        A value of None removes the property. When unique content is enforced,
+        a path duplicating another object of the session is rejected.
+
+        Args:
+            object_id (str): ID of the object to edit
+            changes (dict): New values of the edited properties
+            stamps: Timestamp (see utils.hlc) of every edited property, or one for all of them
+
+        Returns:
+            Optional[MergeResult]: The new version and the applied and rejected properties,
+                                   None if the object does not exist
+
+        Raises:
+            ValueError: If a property has no valid timestamp
+        """
+        if isinstance(stamps, str):
+            stamps = dict.fromkeys(changes, stamps)
+        try:
+            parsed = {key: Timestamp.parse(stamps[key]) for key in changes}
+        except KeyError as e:
+            raise ValueError(f"No timestamp for property {e.args[0]!r}") from None
+
+        too_late = time.time_ns() // 1_000_000 + self.max_clock_drift
+        candidates = {}
+        for key, stamp in parsed.items():
+            if stamp.wall <= too_late:
+                self.clock.update(stamp)
+                candidates[key] = stamp
+
+        def merge(conn):
+            row = conn.execute(
+                f"SELECT {self._EFFECTIVE_VERSION_SQL} FROM canvas_objects WHERE id = ?", (object_id,)
+            ).fetchone()
+            if not row:
+                return None
+            version = row[0]
+            written = dict(conn.execute(
+                "SELECT property, stamp FROM canvas_object_clocks WHERE object_id = ?", (object_id,)
+            ).fetchall())
+            applied = [
+                key for key, stamp in candidates.items()
+                if key not in written or stamp > Timestamp.parse(written[key])
+            ]
+            # A path duplicating another object of the session is rejected, the other properties still apply
+            if "path" in applied and not self._update_content_hash(conn, object_id, changes["path"]):
+                applied.remove("path")
+            if not applied:
+                return MergeResult(version, [], sorted(changes))
+
+            patch = {key: changes[key] for key in applied}
+            version += 1
+            conn.execute(
+                "INSERT INTO canvas_object_patches (object_id, version, patch) VALUES (?, ?, ?)",
+                (object_id, version, json.dumps(patch))
+            )
+            conn.executemany(self._STAMP_SQL, [(object_id, key, str(candidates[key])) for key in applied])
+            return MergeResult(version, applied, sorted(set(changes) - set(applied)))
+
+        result = self._transaction_with_retry(merge)
+        if result and result.applied:
+            self._fold_if_needed(object_id)
+        return result
+
+    def _fold_if_needed(self, object_id: str):
+        """Fold an object's patches once there are ``patch_fold_threshold`` of them."""
+        count_query = "SELECT COUNT(*) FROM canvas_object_patches WHERE object_id = ?"
+        with self._get_connection() as conn:
+            patch_count = conn.execute(count_query, (object_id,)).fetchone()[0]
+        if patch_count >= self.patch_fold_threshold:
+            self._fold_object_patches(object_id)
+
+    def _fold_object_patches(self, object_id: str) -> bool:
+        """Rewrite an object's row with all of its patches applied and drop the patches."""
+        def fold(conn):
+            row = conn.execute("SELECT * FROM canvas_objects WHERE id = ?", (object_id,)).fetchone()
+            patches = conn.execute(
+                "SELECT version, patch, created_at FROM canvas_object_patches WHERE object_id = ? ORDER BY version",
+                (object_id,)
+            ).fetchall()
+            if not row or not patches:
+                return False
+
+            folded = self._materialize_canvas_object(tuple(row), patches)
+            conn.execute(
+                """
+                UPDATE canvas_objects
+                SET object_data = ?, version = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+                """,
+                (folded.object_data, folded.version, object_id)
+            )
+            conn.execute(
+                "DELETE FROM canvas_object_patches WHERE object_id = ? AND version <= ?",
+                (object_id, folded.version)
+            )
+            return True
+
+        return self._transaction_with_retry(fold)
+
+    def fold_canvas_patches(self, session_id: Optional[str] = None) -> int:
+        """
+        Fold stored patches back into their objects.
+        Meant to be run periodically so that reads never replay long patch chains.
+
+        Args:
+            session_id (str, optional): Only fold objects of this session
+
+        Returns:
+            int: Number of objects that were folded
+        """
+        query = "SELECT DISTINCT p.object_id FROM canvas_object_patches p"
+        params = ()
+        if session_id:
+            query += " JOIN canvas_objects o ON o.id = p.object_id WHERE o.session_id = ?"
+            params = (session_id,)
+        with self._get_connection() as conn:
+            object_ids = [row[0] for row in conn.execute(query, params).fetchall()]
+        return sum(1 for object_id in object_ids if self._fold_object_patches(object_id))
+
+    @staticmethod
+    def _materialize_canvas_object(row: tuple, patches: list) -> CanvasObjectDB:
+        """Build a CanvasObjectDB from its base row and its patches (ordered by version)."""
+        canvas_object = CanvasObjectDB.from_db_row(row)
+        if not patches:
+            return canvas_object
+
+        object_data = json.loads(canvas_object.object_data)
+        for patch in patches:
+            object_data = apply_merge_patch(object_data, json.loads(patch[1]))
+        canvas_object.object_data = json.dumps(object_data)
+        canvas_object.version = patches[-1][0]
+        if patches[-1][2]:
+            canvas_object.updated_at = datetime.fromisoformat(patches[-1][2])
+        return canvas_object
+
+    def get_canvas_object(self, object_id: str) -> Optional[CanvasObjectDB]:
+        """
+        Get a single canvas object with all of its patches applied.
+
+        Args:
+            object_id (str): ID of the object
+
+        Returns:
+            Optional[CanvasObjectDB]: The materialized object, or None if it does not exist
+        """
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT * FROM canvas_objects WHERE id = ?", (object_id,)).fetchone()
+            if not row:
+                return None
+            patches = conn.execute(
+                "SELECT version, patch, created_at FROM canvas_object_patches WHERE object_id = ? ORDER BY version",
+                (object_id,)
+            ).fetchall()
+            return self._materialize_canvas_object(tuple(row), patches)
 
     def delete_canvas_object(self, object_id: str, version: int) -> bool:
         """
@@ -368,25 +872,14 @@ class DatabaseManager:
         Returns:
             bool: True if deletion was successful, False if version check failed or object not found
         """
-        # First get current version
-        version_query = "SELECT version FROM canvas_objects WHERE id = ?"
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(version_query, (object_id,))
-            result = cursor.fetchone()
-            if not result:
-                return False
-            current_version = result[0]
-            
-            # Only proceed if provided version is greater
-            if version <= current_version:
-                return False
-        
-        # Delete the object
-        delete_query = "DELETE FROM canvas_objects WHERE id = ?"
+        # Version check and delete in a single statement, patches are removed by trigger
+        delete_query = f"""
+        DELETE FROM canvas_objects
+        WHERE id = ? AND ? > {self._EFFECTIVE_VERSION_SQL}
+        """
         cursor = self._execute_with_retry(
             delete_query,
-            (object_id,),
+            (object_id, version),
             is_write=True
         )
         return cursor.rowcount > 0
@@ -394,6 +887,7 @@ class DatabaseManager:
     def get_session_canvas_objects(self, session_id: str) -> List[CanvasObjectDB]:
         """
         Get all canvas objects for a specific session.
+        Objects with stored patches are materialized on read.
         
         Args:
             session_id (str): ID of the session to get objects for
@@ -402,7 +896,319 @@ class DatabaseManager:
             List[CanvasObjectDB]: List of canvas objects in the session
         """
         query = "SELECT * FROM canvas_objects WHERE session_id = ?"
+        patch_query = """
+        SELECT p.object_id, p.version, p.patch, p.created_at
+        FROM canvas_object_patches p
+        JOIN canvas_objects o ON o.id = p.object_id
+        WHERE o.session_id = ?
+        ORDER BY p.object_id, p.version
+        """
         with self._get_connection() as conn:
             cursor = conn.cursor()
+            patches_by_object = {}
+            for object_id, version, patch, created_at in cursor.execute(patch_query, (session_id,)).fetchall():
+                patches_by_object.setdefault(object_id, []).append((version, patch, created_at))
+
             cursor.execute(query, (session_id,))
-            return [CanvasObjectDB.from_db_row(tuple(row)) for row in cursor.fetchall()]
+            return [
+                self._materialize_canvas_object(tuple(row), patches_by_object.get(row[0], []))
+                for row in cursor.fetchall()
+            ]
+
+    # Session transfer
+    @staticmethod
+    def _fetch_batches(cursor: sqlite3.Cursor, batch_size: int) -> Iterator[sqlite3.Row]:
+        """The rows of a query, read ``batch_size`` at a time."""
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+    def export_session(self, session_id: str, batch_size: int = 1000) -> Iterator[dict]:
+        """
+        Stream a session as records: the session itself, the users taking part in it
+        (participants and object authors), its participants and its canvas objects.
+
+        Everything is read in a single read transaction, so the export is a consistent
+        snapshot, and in batches of ``batch_size`` rows, so memory use does not grow with
+        the session. Objects are exported with their patches applied and with the
+        timestamps of their last property edits.
+
+        Args:
+            session_id (str): ID of the session to export
+            batch_size (int): Rows read from the database at a time
+
+        Returns:
+            Iterator[dict]: Records with a "type" of session, user, participant or object
+
+        Raises:
+            ValueError: If the session does not exist
+        """
+        users_query = """
+        SELECT id, public_key, client_identifier, display_name, created_at FROM users
+        WHERE id IN (SELECT user_id FROM session_participants WHERE id = ?)
+           OR id IN (SELECT created_by FROM canvas_objects WHERE session_id = ?)
+        """
+        objects_query = """
+        SELECT o.id, o.session_id, o.object_data, o.created_by, o.created_at, o.updated_at, o.version, o.content_hash,
+            (SELECT json_group_array(json_array(p.version, p.patch, p.created_at))
+             FROM canvas_object_patches p WHERE p.object_id = o.id) AS patches,
+            (SELECT json_group_object(c.property, c.stamp)
+             FROM canvas_object_clocks c WHERE c.object_id = o.id) AS stamps
+        FROM canvas_objects o
+        WHERE o.session_id = ?
+        ORDER BY o.rowid
+        """
+        with self._get_connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                session = conn.execute(
+                    "SELECT id, title, width, height, created_at, updated_at FROM sessions WHERE id = ?", (session_id,)
+                ).fetchone()
+                if not session:
+                    raise ValueError(f"Session {session_id} not found")
+                yield {"type": "session", **dict(session)}
+
+                for row in self._fetch_batches(conn.execute(users_query, (session_id, session_id)), batch_size):
+                    yield {"type": "user", **dict(row)}
+                participants = conn.execute("SELECT user_id FROM session_participants WHERE id = ?", (session_id,))
+                for row in self._fetch_batches(participants, batch_size):
+                    yield {"type": "participant", "user_id": row[0]}
+
+                for row in self._fetch_batches(conn.execute(objects_query, (session_id,)), batch_size):
+                    patches = sorted(json.loads(row["patches"]))
+                    canvas_object = self._materialize_canvas_object(tuple(row)[:8], patches)
+                    yield {
+                        "type": "object",
+                        "id": canvas_object.id,
+                        "created_by": canvas_object.created_by,
+                        "created_at": str(canvas_object.created_at) if canvas_object.created_at else None,
+                        "updated_at": str(canvas_object.updated_at) if canvas_object.updated_at else None,
+                        "version": canvas_object.version,
+                        "content_hash": canvas_object.content_hash,
+                        "object_data": canvas_object.object_data,
+                        "stamps": json.loads(row["stamps"]),
+                    }
+            finally:
+                conn.rollback()
+
+    # Keys every record of a session export has, by record type
+    _EXPORT_RECORD_KEYS = {
+        "session": ("id", "title"),
+        "user": ("id", "public_key", "client_identifier"),
+        "participant": ("user_id",),
+        "object": ("id", "object_data", "created_by"),
+    }
+
+    @classmethod
+    def _check_export_record(cls, record) -> str:
+        """
+        The type of a record of a session export.
+
+        Raises:
+            ValueError: If the record is not an object of a known type with the keys of its type
+        """
+        if not isinstance(record, dict):
+            raise ValueError(f"Records of a session export are objects, got {type(record).__name__}")
+        kind = record.get("type")
+        if kind not in cls._EXPORT_RECORD_KEYS:
+            raise ValueError(f"Unknown record type in session export: {kind!r}")
+        for key in cls._EXPORT_RECORD_KEYS[kind]:
+            value = record.get(key)
+            if value is None:
+                raise ValueError(f"A {kind} record of the session export has no {key!r}")
+            if not isinstance(value, (str, int, float)) and not (key == "object_data" and isinstance(value, dict)):
+                raise ValueError(f"A {kind} record of the session export has an invalid {key!r}")
+        if not isinstance(record.get("stamps") or {}, dict):
+            raise ValueError("An object record of the session export has invalid 'stamps'")
+        return kind
+
+    def import_session(self, records: Iterable[dict], replace: bool = False, batch_size: int = 1000) -> Dict[str, Union[str, int]]:
+        """
+        Write a session exported by export_session, all or nothing in a single transaction.
+
+        Rows are written with ``executemany`` in batches of ``batch_size`` as the records
+        are read, so an import streams as well. Users that already exist here are kept
+        as they are. Content hashes come from the export, and are only computed for
+        records without one. When unique content is enforced, objects duplicating
+        another one in the session are skipped, with their property timestamps.
+
+        Args:
+            records (Iterable[dict]): The exported records, starting with the session. Read only once.
+            replace (bool): Replace the objects and participants of an existing session with the same ID
+            batch_size (int): Rows written at a time
+
+        Returns:
+            Dict[str, Union[str, int]]: The session ID and the number of users, participants and objects written
+
+        Raises:
+            ValueError: If the records are not a session export, a record misses a key of its type,
+                        or the session exists and ``replace`` is False
+            sqlite3.IntegrityError: If an object ID is already used by another session
+        """
+        user_query = """
+        INSERT OR IGNORE INTO users (id, public_key, client_identifier, display_name, created_at)
+        VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+        """
+        participant_query = "INSERT OR IGNORE INTO session_participants (id, user_id) VALUES (?, ?)"
+        # Only duplicate content is skipped, an ID taken by another session fails the import
+        skip_duplicates = "ON CONFLICT(session_id, content_hash) DO NOTHING" if self.unique_canvas_content else ""
+        object_query = f"""
+        INSERT INTO canvas_objects (id, session_id, object_data, created_by, created_at, updated_at, version, content_hash)
+        VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP), ?, ?)
+        {skip_duplicates}
+        """
+        # Objects of the session were all written by this import, skipped duplicates are not there
+        stamp_query = """
+        INSERT INTO canvas_object_clocks (object_id, property, stamp)
+        SELECT ?1, ?2, ?3 WHERE EXISTS (SELECT 1 FROM canvas_objects WHERE id = ?1 AND session_id = ?4)
+        """
+
+        def write(conn):
+            records_iterator = iter(records)
+            session = next(records_iterator, None)
+            if not isinstance(session, dict) or session.get("type") != "session":
+                raise ValueError("A session export starts with the session record")
+            self._check_export_record(session)
+            session_id = session["id"]
+            session_values = (session["title"], session.get("width", 800), session.get("height", 600),
+                              session.get("created_at"), session.get("updated_at"))
+
+            if conn.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone():
+                if not replace:
+                    raise ValueError(f"Session {session_id} already exists")
+                # The session row is kept, its revision must keep growing for the caches keyed on it
+                conn.execute("DELETE FROM canvas_objects WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM session_participants WHERE id = ?", (session_id,))
+                conn.execute("""
+                UPDATE sessions
+                SET title = ?, width = ?, height = ?,
+                    created_at = COALESCE(?, created_at), updated_at = COALESCE(?, CURRENT_TIMESTAMP)
+                WHERE id = ?
+                """, session_values + (session_id,))
+            else:
+                conn.execute("""
+                INSERT INTO sessions (id, title, width, height, created_at, updated_at)
+                VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP))
+                """, (session_id,) + session_values)
+
+            counts = {"session_id": session_id, "users": 0, "participants": 0, "objects": 0}
+            users, participants, objects, stamps = [], [], [], []
+
+            def flush():
+                # For executemany, rowcount sums the rows inserted by every statement
+                counts["users"] += conn.executemany(user_query, users).rowcount if users else 0
+                counts["participants"] += conn.executemany(participant_query, participants).rowcount if participants else 0
+                counts["objects"] += conn.executemany(object_query, objects).rowcount if objects else 0
+                if stamps:
+                    conn.executemany(stamp_query, stamps)
+                for pending in (users, participants, objects, stamps):
+                    pending.clear()
+
+            for record in records_iterator:
+                kind = self._check_export_record(record)
+                if kind == "user":
+                    users.append((record["id"], record["public_key"], record["client_identifier"],
+                                  record.get("display_name"), record.get("created_at")))
+                elif kind == "participant":
+                    participants.append((session_id, record["user_id"]))
+                elif kind == "object":
+                    object_data = record["object_data"]
+                    object_text = object_data if isinstance(object_data, str) else json.dumps(object_data)
+                    if "content_hash" in record:
+                        content_hash = record["content_hash"]
+                    else:
+                        content_hash = path_content_hash(json.loads(object_text) if isinstance(object_data, str) else object_data)
+                    objects.append((record["id"], session_id, object_text, record["created_by"],
+                                    record.get("created_at"), record.get("updated_at"), record.get("version") or 1,
+                                    content_hash))
+                    stamps.extend((record["id"], key, stamp, session_id) for key, stamp in (record.get("stamps") or {}).items())
+                else:
+                    raise ValueError("A session export has a single session record")
+                if len(users) + len(participants) + len(objects) >= batch_size:
+                    flush()
+            flush()
+            return counts
+
+        # The records can only be read once, a retry would see them consumed
+        return self._transaction_with_retry(write, max_retries=1)
+
+    # Generation job operations
+    def create_generation_job(self, job: GenerationJob) -> bool:
+        """Store a new generation job."""
+        query = """
+        INSERT INTO generation_jobs (id, user_id, session_id, request, status)
+        VALUES (?, ?, ?, ?, ?)
+        """
+        cursor = self._execute_with_retry(
+            query,
+            (job.id, job.user_id, job.session_id, job.request, job.status),
+            is_write=True
+        )
+        return cursor.rowcount > 0
+
+    def update_generation_job(self, job_id: str, status: str, result: Optional[str] = None, error: Optional[str] = None) -> bool:
+        """
+        Update the status of a generation job.
+
+        Args:
+            job_id (str): ID of the job
+            status (str): New status (queued, running, succeeded or failed)
+            result (str, optional): JSON string of the job result
+            error (str, optional): Error message of a failed job
+
+        Returns:
+            bool: True if the job exists
+        """
+        query = """
+        UPDATE generation_jobs
+        SET status = ?, result = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+        """
+        cursor = self._execute_with_retry(query, (status, result, error, job_id), is_write=True)
+        return cursor.rowcount > 0
+
+    def claim_generation_job(self, job_id: str, worker: str) -> bool:
+        """
+        Mark a queued job as running on a worker.
+        A single conditional update, so of several workers queuing the same job only one runs it.
+
+        Returns:
+            bool: True if this worker claimed the job, False if it is no longer queued
+        """
+        query = """
+        UPDATE generation_jobs
+        SET status = 'running', worker = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND status = 'queued'
+        """
+        cursor = self._execute_with_retry(query, (worker, job_id), is_write=True)
+        return cursor.rowcount > 0
+
+    def requeue_generation_job(self, job_id: str, worker: Optional[str]) -> bool:
+        """
+        Queue a job again that was running on a worker that stopped.
+
+        Returns:
+            bool: True if the job was still running on that worker
+        """
+        query = """
+        UPDATE generation_jobs
+        SET status = 'queued', worker = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND status = 'running' AND worker IS ?
+        """
+        cursor = self._execute_with_retry(query, (job_id, worker), is_write=True)
+        return cursor.rowcount > 0
+
+    def get_generation_job(self, job_id: str) -> Optional[GenerationJob]:
+        """Retrieve a generation job by its ID."""
+        query = "SELECT * FROM generation_jobs WHERE id = ?"
+        with self._get_connection() as conn:
+            row = conn.execute(query, (job_id,)).fetchone()
+            return GenerationJob.from_db_row(tuple(row)) if row else None
+
+    def get_unfinished_generation_jobs(self) -> List[GenerationJob]:
+        """Get all jobs that are still queued or were running, oldest first."""
+        query = "SELECT * FROM generation_jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+        with self._get_connection() as conn:
+            return [GenerationJob.from_db_row(tuple(row)) for row in conn.execute(query).fetchall()]
@@ -0,0 +1,26 @@
+from threading import Lock
+
+from dotenv import find_dotenv, load_dotenv
+
+_loaded = False
+_lock = Lock()
+
+
+def load_environment(override: bool = False) -> None:
+    """
+    Load the .env file into the environment, once per process.
+
+    The frontend, the backend and the shared utils all call this instead of
+    load_dotenv, so the file is searched for and parsed a single time. The
+    search starts in the working directory, the folder the frontend or the
+    backend is started from.
+
+    Args:
+        override: Read the file again and replace values already set, used to reload configuration
+    """
+    global _loaded
+    with _lock:
+        if _loaded and not override:
+            return
+        load_dotenv(find_dotenv(usecwd=True), override=override)
+        _loaded = True
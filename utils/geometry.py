@@ -0,0 +1,345 @@
+"""
+Geometry of Fabric.js canvas objects, computed for many objects at once.
+
+Fabric.js positions an object by the point (left, top) of its origin
+(originX / originY) and draws it in its own coordinate space, centered on
+the object, through
+
+    translate(center) . rotate(angle) . scale(scaleX, scaleY, flipX, flipY) . skewX . skewY
+
+Paths are stored in canvas coordinates; Fabric.js moves them into the
+object's space by subtracting their pathOffset, the center of the path's
+bounds. Line end points (x1, y1, x2, y2) are already relative to the center.
+
+Every function takes a list of objects (or paths) and returns NumPy arrays
+with one row per object, computed column-wise instead of object by object.
+The stroke is left out of object sizes unless ``stroke=True``, which matches
+Fabric.js' getBoundingRect (strokeUniform is not taken into account).
+"""
+from dataclasses import dataclass
+from itertools import chain
+from typing import List, Sequence, Union
+
+import numpy as np
+
+ORIGIN_FRACTIONS = {"left": 0.0, "top": 0.0, "center": 0.5, "right": 1.0, "bottom": 1.0}
+
+# Nodes and weights of 5 point Gauss-Legendre quadrature on [0, 1], for curve lengths
+_GAUSS_NODES = (np.array([-0.9061798459386640, -0.5384693101056831, 0.0, 0.5384693101056831, 0.9061798459386640]) + 1) / 2
+_GAUSS_WEIGHTS = np.array([0.2369268850561891, 0.4786286704993665, 0.5688888888888889, 0.4786286704993665, 0.2369268850561891]) / 2
+
+
+def _number(value, default: float) -> float:
+    try:
+        return float(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _column(objects: Sequence[dict], key: str, default: float) -> np.ndarray:
+    """One numeric property of every object, missing and invalid values replaced by ``default``."""
+    values = [obj.get(key) for obj in objects]
+    try:
+        # None becomes NaN
+        column = np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        column = np.array([_number(value, default) for value in values], dtype=np.float64)
+    column[np.isnan(column)] = default
+    return column
+
+
+def _transforms(objects: Sequence[dict], stroke: bool):
+    """The transform matrices (n, 2, 3) and untransformed sizes (n, 2) of the objects."""
+    left = _column(objects, "left", 0.0)
+    top = _column(objects, "top", 0.0)
+    width = np.abs(_column(objects, "width", 0.0))
+    height = np.abs(_column(objects, "height", 0.0))
+    if stroke:
+        stroke_width = _column(objects, "strokeWidth", 1.0)
+        width, height = width + stroke_width, height + stroke_width
+    flip_x = np.array([bool(obj.get("flipX")) for obj in objects], dtype=bool)
+    flip_y = np.array([bool(obj.get("flipY")) for obj in objects], dtype=bool)
+    scale_x = np.where(flip_x, -1.0, 1.0) * _column(objects, "scaleX", 1.0)
+    scale_y = np.where(flip_y, -1.0, 1.0) * _column(objects, "scaleY", 1.0)
+    origin_x = np.array([ORIGIN_FRACTIONS.get(obj.get("originX"), 0.0) for obj in objects], dtype=np.float64)
+    origin_y = np.array([ORIGIN_FRACTIONS.get(obj.get("originY"), 0.0) for obj in objects], dtype=np.float64)
+
+    # scale . skewX . skewY
+    tan_x = np.tan(np.radians(_column(objects, "skewX", 0.0)))
+    tan_y = np.tan(np.radians(_column(objects, "skewY", 0.0)))
+    s00, s01 = scale_x * (1 + tan_x * tan_y), scale_x * tan_x
+    s10, s11 = scale_y * tan_y, scale_y
+
+    # Size of the scaled and skewed object, which its origin refers to
+    transformed_width = np.abs(s00) * width + np.abs(s01) * height
+    transformed_height = np.abs(s10) * width + np.abs(s11) * height
+
+    radians = np.radians(_column(objects, "angle", 0.0))
+    cos, sin = np.cos(radians), np.sin(radians)
+    offset_x = (0.5 - origin_x) * transformed_width
+    offset_y = (0.5 - origin_y) * transformed_height
+
+    matrices = np.empty((len(objects), 2, 3))
+    matrices[:, 0, 0] = cos * s00 - sin * s10
+    matrices[:, 0, 1] = cos * s01 - sin * s11
+    matrices[:, 1, 0] = sin * s00 + cos * s10
+    matrices[:, 1, 1] = sin * s01 + cos * s11
+    # The origin is rotated around (left, top) into the center
+    matrices[:, 0, 2] = left + cos * offset_x - sin * offset_y
+    matrices[:, 1, 2] = top + sin * offset_x + cos * offset_y
+    return matrices, np.stack([width, height], axis=1)
+
+
+def transform_matrices(objects: Sequence[dict], stroke: bool = False) -> np.ndarray:
+    """
+    The affine transforms from the objects' own (centered) coordinates to canvas coordinates.
+
+    Returns:
+        np.ndarray: Shape (n, 2, 3), [[a, c, x], [b, d, y]] for every object
+    """
+    return _transforms(objects, stroke)[0]
+
+
+def transform_points(matrices: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """
+    Apply transforms to points.
+
+    Args:
+        matrices: A single transform (2, 3), or one per point (k, 2, 3)
+        points: Points of shape (k, 2)
+
+    Returns:
+        np.ndarray: The transformed points, shape (k, 2)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if matrices.ndim == 2:
+        return points @ matrices[:, :2].T + matrices[:, 2]
+    return np.einsum("kij,kj->ki", matrices[:, :, :2], points) + matrices[:, :, 2]
+
+
+def object_sizes(objects: Sequence[dict], stroke: bool = False) -> np.ndarray:
+    """Untransformed width and height of every object, shape (n, 2)."""
+    return _transforms(objects, stroke)[1]
+
+
+def object_corners(objects: Sequence[dict], stroke: bool = False) -> np.ndarray:
+    """
+    Corners of the transformed objects: top left, top right, bottom right, bottom left.
+
+    Returns:
+        np.ndarray: Shape (n, 4, 2)
+    """
+    matrices, sizes = _transforms(objects, stroke)
+    half = sizes / 2
+    signs = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]], dtype=np.float64)
+    local = signs[None, :, :] * half[:, None, :]
+    return np.einsum("nij,nkj->nki", matrices[:, :, :2], local) + matrices[:, None, :, 2]
+
+
+def object_bounds(objects: Sequence[dict], stroke: bool = False) -> np.ndarray:
+    """
+    Axis aligned bounding boxes of the transformed objects.
+
+    Returns:
+        np.ndarray: Shape (n, 4), left, top, right, bottom
+    """
+    matrices, sizes = _transforms(objects, stroke)
+    half = sizes / 2
+    # Half extents of the transformed box, without building its corners
+    extent_x = np.abs(matrices[:, 0, 0]) * half[:, 0] + np.abs(matrices[:, 0, 1]) * half[:, 1]
+    extent_y = np.abs(matrices[:, 1, 0]) * half[:, 0] + np.abs(matrices[:, 1, 1]) * half[:, 1]
+    center_x, center_y = matrices[:, 0, 2], matrices[:, 1, 2]
+    return np.stack([center_x - extent_x, center_y - extent_y, center_x + extent_x, center_y + extent_y], axis=1)
+
+
+@dataclass
+class PathSegments:
+    """
+    The commands of many paths as quadratic segments, in flat arrays.
+
+    Lines are quadratic segments with their control point halfway, Z closes
+    back to the start of the subpath and cubic curves are approximated by a
+    single quadratic segment.
+    """
+    count: int  # Number of paths
+    starts: np.ndarray  # (m, 2)
+    controls: np.ndarray  # (m, 2)
+    ends: np.ndarray  # (m, 2)
+    owners: np.ndarray  # (m,) index of the path every segment belongs to
+    points: np.ndarray  # (k, 2) end point of every command, moves included
+    point_owners: np.ndarray  # (k,)
+
+
+def path_segments(paths: Sequence[List[list]]) -> PathSegments:
+    """
+    Split paths ([["M", x, y], ["Q", cx, cy, x, y], ...]) into quadratic segments.
+    None or empty paths have no segments.
+
+    Raises:
+        ValueError: If a command has coordinates that are not numbers
+    """
+    paths = [path or [] for path in paths]
+    path_lengths = np.fromiter(map(len, paths), dtype=np.intp, count=len(paths))
+    commands = list(chain.from_iterable(paths))
+    if not commands:
+        empty = np.empty((0, 2))
+        no_owners = np.empty(0, dtype=np.intp)
+        return PathSegments(len(paths), empty, empty, empty, no_owners, empty, no_owners)
+
+    # Flatten every command once; what is left after dropping the letters are the coordinates
+    sizes = np.fromiter(map(len, commands), dtype=np.intp, count=len(commands))
+    flat = np.fromiter(chain.from_iterable(commands), dtype=object, count=int(sizes.sum()))
+    command_starts = np.cumsum(sizes) - sizes
+    letters = flat[command_starts].astype(str)
+    try:
+        numbers = np.delete(flat, command_starts).astype(np.float64)
+    except (TypeError, ValueError):
+        raise ValueError("Path coordinates must be numbers") from None
+    value_counts = sizes - 1
+    value_starts = np.cumsum(value_counts) - value_counts
+
+    owners = np.repeat(np.arange(len(paths)), path_lengths)
+    index = np.arange(len(commands))
+    first = np.zeros(len(commands), dtype=bool)
+    first[(np.cumsum(path_lengths) - path_lengths)[path_lengths > 0]] = True
+    is_move = (letters == "M") | first
+    is_close = np.isin(letters, ("Z", "z"))
+
+    # End point of every command: its last two values, the subpath start for Z
+    ends = np.full((len(commands), 2), np.nan)
+    has_end = value_counts >= 2
+    last = value_starts[has_end] + value_counts[has_end]
+    ends[has_end, 0] = numbers[last - 2]
+    ends[has_end, 1] = numbers[last - 1]
+    subpath_start = np.maximum.accumulate(np.where(is_move, index, 0))
+    ends[is_close] = ends[subpath_start[is_close]]
+    # Commands without an end point (H, V, a path starting with Z) stay where they are
+    known = np.maximum.accumulate(np.where(~np.isnan(ends[:, 0]), index, 0))
+    ends = ends[known]
+    valid = ~np.isnan(ends[:, 0])
+
+    segment = ~is_move & valid
+    starts = ends[np.maximum(index - 1, 0)][segment]
+    segment_ends = ends[segment]
+    controls = (starts + segment_ends) / 2
+    segment_letters = letters[segment]
+    segment_values = value_starts[segment]
+
+    quadratic = (segment_letters == "Q") & (value_counts[segment] == 4)
+    positions = segment_values[quadratic]
+    controls[quadratic] = np.stack([numbers[positions], numbers[positions + 1]], axis=1)
+    # A cubic curve as the quadratic with the best matching control point
+    cubic = (segment_letters == "C") & (value_counts[segment] == 6)
+    positions = segment_values[cubic]
+    control_1 = np.stack([numbers[positions], numbers[positions + 1]], axis=1)
+    control_2 = np.stack([numbers[positions + 2], numbers[positions + 3]], axis=1)
+    controls[cubic] = (3 * (control_1 + control_2) - starts[cubic] - segment_ends[cubic]) / 4
+
+    return PathSegments(
+        count=len(paths),
+        starts=starts,
+        controls=controls,
+        ends=segment_ends,
+        owners=owners[segment],
+        points=ends[valid],
+        point_owners=owners[valid],
+    )
+
+
+def quadratic_bounds(starts: np.ndarray, controls: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Exact bounding boxes of quadratic curves, including their extrema between the end points.
+
+    Args:
+        starts, controls, ends: Arrays of shape (m, 2)
+
+    Returns:
+        np.ndarray: Shape (m, 4), left, top, right, bottom
+    """
+    denominator = starts - 2 * controls + ends
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(denominator != 0, (starts - controls) / denominator, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    extreme = (1 - t) ** 2 * starts + 2 * (1 - t) * t * controls + t ** 2 * ends
+    low = np.minimum(np.minimum(starts, ends), extreme)
+    high = np.maximum(np.maximum(starts, ends), extreme)
+    return np.concatenate([low, high], axis=1)
+
+
+def quadratic_lengths(starts: np.ndarray, controls: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Arc lengths of quadratic curves (Gauss-Legendre quadrature), shape (m,)."""
+    first = controls - starts
+    second = ends - controls
+    t = _GAUSS_NODES[:, None, None]
+    # Speed |B'(t)| at every node, for every curve
+    derivative = 2 * ((1 - t) * first[None] + t * second[None])
+    speed = np.hypot(derivative[..., 0], derivative[..., 1])
+    return _GAUSS_WEIGHTS @ speed
+
+
+def _segments(paths) -> PathSegments:
+    return paths if isinstance(paths, PathSegments) else path_segments(paths)
+
+
+def path_bounds(paths: Union[Sequence[List[list]], PathSegments]) -> np.ndarray:
+    """
+    Bounds of paths in their own (canvas) coordinates, curve extrema included.
+    Takes the paths, or their segments when they are needed for more than one measure.
+
+    Returns:
+        np.ndarray: Shape (n, 4), left, top, right, bottom; NaN for paths without points
+    """
+    segments = _segments(paths)
+    lows = np.full((segments.count, 2), np.inf)
+    highs = np.full((segments.count, 2), -np.inf)
+    boxes = quadratic_bounds(segments.starts, segments.controls, segments.ends)
+    np.minimum.at(lows, segments.owners, boxes[:, :2])
+    np.maximum.at(highs, segments.owners, boxes[:, 2:])
+    np.minimum.at(lows, segments.point_owners, segments.points)
+    np.maximum.at(highs, segments.point_owners, segments.points)
+    bounds = np.concatenate([lows, highs], axis=1)
+    bounds[~np.isfinite(bounds[:, 0])] = np.nan
+    return bounds
+
+
+def path_lengths(paths: Union[Sequence[List[list]], PathSegments]) -> np.ndarray:
+    """Total length of every path (or of the paths of segments), shape (n,)."""
+    segments = _segments(paths)
+    lengths = quadratic_lengths(segments.starts, segments.controls, segments.ends)
+    return np.bincount(segments.owners, weights=lengths, minlength=segments.count)
+
+
+def sample_paths(paths: Sequence[List[list]], samples: int = 4):
+    """
+    Turn paths into polylines, sampling every segment ``samples`` times.
+
+    Returns:
+        tuple: (points of shape (k, 2), index of the path of every point) in path order
+    """
+    segments = path_segments(paths)
+    # Every segment as its start and ``samples`` points along it
+    t = (np.arange(samples + 1) / samples)[None, :, None]
+    curves = ((1 - t) ** 2 * segments.starts[:, None] + 2 * (1 - t) * t * segments.controls[:, None]
+              + t ** 2 * segments.ends[:, None])
+    # The start is only needed where a segment does not continue the previous one
+    keep = np.ones(curves.shape[:2], dtype=bool)
+    if len(curves) > 1:
+        keep[1:, 0] = (np.any(segments.starts[1:] != segments.ends[:-1], axis=1)
+                       | (segments.owners[1:] != segments.owners[:-1]))
+    owners = np.broadcast_to(segments.owners[:, None], keep.shape)
+    return curves[keep], owners[keep]
+
+
+def transformed_paths(objects: Sequence[dict], samples: int = 4, stroke: bool = False):
+    """
+    Path objects as polylines in canvas coordinates, with their transforms applied.
+
+    Returns:
+        tuple: (points of shape (k, 2), index of the object of every point)
+    """
+    paths = [obj.get("path") if isinstance(obj.get("path"), list) else None for obj in objects]
+    offsets = path_bounds(paths)
+    offsets = (offsets[:, :2] + offsets[:, 2:]) / 2
+    points, owners = sample_paths(paths, samples)
+    matrices = transform_matrices(objects, stroke)
+    return transform_points(matrices[owners], points - offsets[owners]), owners
@@ -0,0 +1,92 @@
+"""
+Hybrid logical clocks, used to order concurrent edits of canvas object properties.
+
+A timestamp is (wall time in milliseconds, counter, node id). It follows the
+physical clock when clocks are in sync and still orders causally related
+events correctly when they are not: a clock that has seen a timestamp only
+produces later ones. Timestamps compare as tuples, so two edits stamped at
+the same time on different nodes are ordered by node id, the same way
+everywhere.
+
+Timestamps are stored as fixed width strings ("000001712345678901:00000:node")
+whose string order is the timestamp order.
+"""
+import time
+import uuid
+from threading import Lock
+from typing import NamedTuple, Optional
+
+WALL_DIGITS = 18
+COUNTER_DIGITS = 5
+MAX_COUNTER = 10 ** COUNTER_DIGITS - 1
+
+
+class Timestamp(NamedTuple):
+    wall: int  # milliseconds since the epoch
+    counter: int  # orders events within the same millisecond
+    node: str
+
+    def __str__(self) -> str:
+        return f"{self.wall:0{WALL_DIGITS}d}:{self.counter:0{COUNTER_DIGITS}d}:{self.node}"
+
+    @classmethod
+    def parse(cls, value: str) -> 'Timestamp':
+        """
+        Parse a timestamp string.
+
+        Raises:
+            ValueError: If the string is not a timestamp
+        """
+        wall, counter, node = str(value).split(":", 2)
+        if len(wall) != WALL_DIGITS or len(counter) != COUNTER_DIGITS or not node:
+            raise ValueError(f"Invalid timestamp: {value!r}")
+        return cls(int(wall), int(counter), node)
+
+
+def _wall_time() -> int:
+    return time.time_ns() // 1_000_000
+
+
+class HybridLogicalClock:
+    """A hybrid logical clock of one node (a server process, a browser tab). Thread safe."""
+
+    def __init__(self, node: Optional[str] = None):
+        """
+        Args:
+            node: Id of the node, a random one by default. Must not contain ":".
+        """
+        self.node = node or uuid.uuid4().hex[:12]
+        if ":" in self.node:
+            raise ValueError("Clock node ids cannot contain ':'")
+        self.last = Timestamp(0, 0, self.node)
+        self.lock = Lock()
+
+    def _advance(self, wall: int, counter: int) -> Timestamp:
+        if counter > MAX_COUNTER:
+            # Over a hundred thousand events in one millisecond, borrow the next one
+            wall, counter = wall + 1, 0
+        self.last = Timestamp(wall, counter, self.node)
+        return self.last
+
+    def now(self) -> Timestamp:
+        """A timestamp for a local event, later than every timestamp this clock produced or received."""
+        with self.lock:
+            wall = _wall_time()
+            if wall > self.last.wall:
+                return self._advance(wall, 0)
+            return self._advance(self.last.wall, self.last.counter + 1)
+
+    def update(self, remote: Timestamp) -> Timestamp:
+        """Take in a timestamp received from another node, returns the timestamp of receiving it."""
+        with self.lock:
+            wall = _wall_time()
+            latest = max(wall, self.last.wall, remote.wall)
+            if latest == self.last.wall and latest == remote.wall:
+                counter = max(self.last.counter, remote.counter) + 1
+            elif latest == self.last.wall:
+                counter = self.last.counter + 1
+            elif latest == remote.wall:
+                counter = remote.counter + 1
+            else:
+                counter = 0
+            return self._advance(latest, counter)
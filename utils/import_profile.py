@@ -0,0 +1,97 @@
+"""
+Import-time profiling based on ``python -X importtime``.
+
+Reports how long a cold start spends importing each module, for example
+from the 'backend' folder:
+
+    python -m utils.import_profile app.main
+    python -m utils.import_profile app --cwd ../frontend --top 30
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class ImportProfile:
+    """Result of importing a module in a fresh interpreter."""
+    module: str
+    wall_seconds: float  # Whole interpreter run, startup included
+    modules: Dict[str, Tuple[int, int]] = field(default_factory=dict)  # name -> (self us, cumulative us)
+
+    @property
+    def import_seconds(self) -> float:
+        """Time spent importing the module itself, interpreter startup excluded."""
+        return self.modules.get(self.module, (0, 0))[1] / 1_000_000
+
+    def slowest(self, count: int = 20) -> List[Tuple[str, int, int]]:
+        """The modules with the highest cumulative import time."""
+        entries = [(name, own, cumulative) for name, (own, cumulative) in self.modules.items()]
+        return sorted(entries, key=lambda entry: entry[2], reverse=True)[:count]
+
+
+def parse_importtime(output: str) -> Dict[str, Tuple[int, int]]:
+    """Parse the ``-X importtime`` lines printed to stderr."""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            own, cumulative, name = line[len("import time:"):].split("|")
+            modules[name.strip()] = (int(own), int(cumulative))
+        except ValueError:
+            continue
+    return modules
+
+
+def profile_import(module: str, cwd: Optional[str] = None, env: Optional[dict] = None) -> ImportProfile:
+    """
+    Import a module in a fresh interpreter with ``-X importtime``.
+
+    Args:
+        module: Name of the module to import
+        cwd: Folder the interpreter runs in, it is on sys.path first
+        env: Extra environment variables
+
+    Returns:
+        ImportProfile: Wall time and per module import times
+
+    Raises:
+        RuntimeError: If the import fails
+    """
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd,
+        env={**os.environ, **(env or {})},
+        capture_output=True,
+        text=True,
+    )
+    wall_seconds = time.perf_counter() - started
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"Importing {module} failed:\n" + "\n".join(errors))
+    return ImportProfile(module, wall_seconds, parse_importtime(result.stderr))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the import time of a module on a cold start.")
+    parser.add_argument("module", help="Module to import, e.g. app.main")
+    parser.add_argument("--cwd", help="Folder to run the import in", default=None)
+    parser.add_argument("--top", type=int, default=20, help="Number of modules to list")
+    args = parser.parse_args()
+
+    profile = profile_import(args.module, cwd=args.cwd)
+    print(f"{args.module}: {profile.import_seconds * 1000:.1f} ms import, "
+          f"{profile.wall_seconds * 1000:.1f} ms wall, {len(profile.modules)} modules")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, own, cumulative in profile.slowest(args.top):
+        print(f"{cumulative / 1000:>14.1f} {own / 1000:>9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Tuple
+
+import rsa
+
+
+def _generate_key_pair(bits: int) -> Tuple[rsa.PublicKey, rsa.PrivateKey, float]:
+    """Generate a key pair in a worker process, returning how long it took."""
+    started = time.perf_counter()
+    public_key, private_key = rsa.newkeys(bits)
+    return public_key, private_key, time.perf_counter() - started
+
+
+class KeyPool:
+    """
+    Pool of RSA key pairs generated ahead of time by a background process pool.
+
+    Generating a 2048-bit key in pure Python can take seconds. The pool is
+    topped back up to ``size`` whenever it drops to ``low_water`` keys, so
+    identity creation can usually take a ready key instantly and only falls
+    back to inline generation when the pool is empty.
+    """
+    _instance = None
+    _lock = Lock()  # Thread safety for singleton creation
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(KeyPool, cls).__new__(cls)
+                cls._instance._initialized = False
+            return cls._instance
+
+    def __init__(self):
+        # Skip initialization if already initialized
+        if getattr(self, '_initialized', False):
+            return
+
+        self.bits = int(os.getenv('KEY_POOL_BITS', '2048'))
+        self.size = int(os.getenv('KEY_POOL_SIZE', '4'))
+        self.low_water = int(os.getenv('KEY_POOL_LOW_WATER', '2'))
+        # Spawned workers do not inherit the threads and locks of the Streamlit or API process
+        self.executor = ProcessPoolExecutor(
+            max_workers=int(os.getenv('KEY_POOL_WORKERS', '2')),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self.keys = deque()
+        self.pending = 0
+        self.closed = False
+        self.pool_lock = Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.generation_times = deque(maxlen=50)  # Seconds a worker took to generate one key pair
+
+        self._initialized = True
+        self._refill()
+
+    def acquire(self) -> Tuple[rsa.PublicKey, rsa.PrivateKey]:
+        """
+        Take a key pair from the pool, generating one inline if the pool is empty
+        or shut down.
+
+        Returns:
+            Tuple[rsa.PublicKey, rsa.PrivateKey]: The key pair
+        """
+        with self.pool_lock:
+            key_pair = self.keys.popleft() if self.keys else None
+            if key_pair:
+                self.hits += 1
+            else:
+                self.misses += 1
+        self._refill()
+
+        if key_pair is None:
+            key_pair = rsa.newkeys(self.bits)
+        return key_pair
+
+    def _refill(self):
+        """Top the pool up to its size once it reached the low-water mark."""
+        with self.pool_lock:
+            if self.closed or len(self.keys) + self.pending > self.low_water:
+                return
+            missing = self.size - len(self.keys) - self.pending
+            self.pending += missing
+
+        for _ in range(missing):
+            future = self.executor.submit(_generate_key_pair, self.bits)
+            future.add_done_callback(self._on_generated)
+
+    def _on_generated(self, future):
+        with self.pool_lock:
+            self.pending -= 1
+            if future.cancelled():
+                return
+            try:
+                public_key, private_key, elapsed = future.result()
+            except Exception as e:
+                print(f"Error generating key pair: {e}")
+                return
+            self.keys.append((public_key, private_key))
+            self.generation_times.append(elapsed)
+
+    def metrics(self) -> dict:
+        """Pool depth, key generation times and hit/miss counts."""
+        with self.pool_lock:
+            generation_times = list(self.generation_times)
+            return {
+                "depth": len(self.keys),
+                "pending": self.pending,
+                "size": self.size,
+                "low_water": self.low_water,
+                "hits": self.hits,
+                "misses": self.misses,
+                "last_key_seconds": generation_times[-1] if generation_times else None,
+                "avg_key_seconds": sum(generation_times) / len(generation_times) if generation_times else None,
+            }
+
+    def shutdown(self):
+        """Stop the background workers, later key pairs are generated inline."""
+        with self.pool_lock:
+            self.closed = True
+        self.executor.shutdown(cancel_futures=True)
@@ -0,0 +1,66 @@
+"""
+JSON Merge Patch (RFC 7386) helpers used to store canvas edits as patches.
+
+A merge patch is a JSON object that mirrors the shape of the target:
+keys present in the patch replace the target's values, nested objects are
+merged recursively and a ``null`` value removes the key. Lists are always
+replaced as a whole, so moving a freedraw path only produces a patch with
+``left``/``top`` while the (large) ``path`` list is left untouched.
+"""
+from typing import Any
+
+
+def apply_merge_patch(target: Any, patch: Any) -> Any:
+    """
+    Apply a merge patch to a target document.
+
+    Args:
+        target: The document to patch (not modified in place)
+        patch: The merge patch to apply
+
+    Returns:
+        The patched document
+    """
+    if not isinstance(patch, dict):
+        return patch
+
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+
+def create_merge_patch(source: Any, target: Any) -> Any:
+    """
+    Create the merge patch that turns ``source`` into ``target``.
+
+    Note that ``null`` values in ``target`` cannot be expressed by a merge
+    patch; they are treated as removed keys.
+
+    Args:
+        source: The original document
+        target: The desired document
+
+    Returns:
+        The merge patch (an empty dict when both documents are equal)
+    """
+    if not isinstance(source, dict) or not isinstance(target, dict):
+        return target
+
+    patch = {}
+    for key, value in target.items():
+        if key not in source:
+            if value is not None:
+                patch[key] = value
+        elif source[key] != value:
+            if isinstance(source[key], dict) and isinstance(value, dict):
+                patch[key] = create_merge_patch(source[key], value)
+            else:
+                patch[key] = value
+    for key in source:
+        if key not in target and source[key] is not None:
+            patch[key] = None
+    return patch
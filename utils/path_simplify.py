@@ -0,0 +1,144 @@
+"""
+Path simplification for canvas objects before they are stored.
+
+Freedraw strokes from the canvas are Fabric.js pencil paths: every sampled
+point becomes the control point of a ``Q`` segment that ends halfway to the
+next sample. Long strokes carry many nearly collinear samples, so the samples
+are recovered, reduced with Ramer-Douglas-Peucker and the quadratic segments
+are refit in the same pencil form. Plain ``M``/``L`` polylines are reduced
+directly. Any other path is left untouched.
+"""
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+def default_tolerance() -> float:
+    """Simplification tolerance in canvas pixels, 0 disables simplification."""
+    return float(os.getenv("PATH_SIMPLIFY_TOLERANCE", "1.0"))
+
+
+def rdp_mask(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Ramer-Douglas-Peucker simplification.
+
+    Args:
+        points: Array of shape (n, 2)
+        tolerance: Maximum distance of a dropped point from the simplified line
+
+    Returns:
+        np.ndarray: Boolean mask of the points to keep
+    """
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        segment = points[end] - points[start]
+        inner = points[start + 1:end] - points[start]
+        length = np.hypot(segment[0], segment[1])
+        if length == 0:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distances = np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
+
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return keep
+
+
+def _pencil_samples(path: List[list]) -> Optional[np.ndarray]:
+    """Recover the sampled points of a Fabric.js pencil path, or None if the path has another shape."""
+    if len(path) < 3 or path[0][0] != "M" or path[-1][0] != "L":
+        return None
+    if any(cmd[0] != "Q" or len(cmd) != 5 for cmd in path[1:-1]):
+        return None
+
+    quads = np.asarray([cmd[1:5] for cmd in path[1:-1]], dtype=float)
+    samples = np.vstack([quads[:, 0:2], np.asarray(path[-1][1:3], dtype=float)])
+
+    # Every Q segment ends halfway between its control point and the next sample
+    midpoints = (samples[:-1] + samples[1:]) / 2
+    if not np.allclose(quads[:, 2:4], midpoints, atol=1e-3):
+        return None
+    return samples
+
+
+def _polyline_points(path: List[list]) -> Optional[np.ndarray]:
+    """Return the vertices of an ``M`` followed by ``L`` commands path, or None."""
+    if len(path) < 3 or path[0][0] != "M":
+        return None
+    if any(cmd[0] != "L" or len(cmd) != 3 for cmd in path[1:]):
+        return None
+    return np.asarray([cmd[1:3] for cmd in path], dtype=float)
+
+
+def simplify_path(path: List[list], tolerance: Optional[float] = None) -> Tuple[List[list], int]:
+    """
+    Simplify a path in list-of-lists format.
+
+    Args:
+        path: Path commands, e.g. [["M", x, y], ["Q", cx, cy, x, y], ..., ["L", x, y]]
+        tolerance: Maximum deviation in pixels (defaults to PATH_SIMPLIFY_TOLERANCE)
+
+    Returns:
+        Tuple[List[list], int]: The simplified path and the number of points removed
+    """
+    if tolerance is None:
+        tolerance = default_tolerance()
+    if tolerance <= 0 or not path:
+        return path, 0
+
+    samples = _pencil_samples(path)
+    if samples is not None:
+        keep = rdp_mask(samples, tolerance)
+        kept = samples[keep]
+        midpoints = (kept[:-1] + kept[1:]) / 2
+        quads = np.hstack([kept[:-1], midpoints]).tolist()
+
+        simplified = [list(path[0])]
+        simplified.extend(["Q", *quad] for quad in quads)
+        simplified.append(["L", *kept[-1].tolist()])
+        return simplified, int(len(samples) - len(kept))
+
+    points = _polyline_points(path)
+    if points is not None:
+        keep = rdp_mask(points, tolerance)
+        kept = points[keep].tolist()
+        simplified = [["M", *kept[0]]]
+        simplified.extend(["L", *point] for point in kept[1:])
+        return simplified, int(len(points) - len(kept))
+
+    return path, 0
+
+
+def simplify_object(object_data: dict, tolerance: Optional[float] = None) -> Tuple[dict, int]:
+    """
+    Simplify the path of a canvas object.
+
+    Args:
+        object_data: Canvas object in Fabric.js JSON form
+        tolerance: Maximum deviation in pixels (defaults to PATH_SIMPLIFY_TOLERANCE)
+
+    Returns:
+        Tuple[dict, int]: The (possibly new) object and the number of points removed
+    """
+    if object_data.get("type") != "path" or not isinstance(object_data.get("path"), list):
+        return object_data, 0
+
+    path, removed = simplify_path(object_data["path"], tolerance)
+    if not removed:
+        return object_data, 0
+    return dict(object_data, path=path), removed
@@ -0,0 +1,130 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+import uuid
+from threading import Lock
+from typing import Optional
+
+from .env import load_environment
+
+
+class SessionTokenManager:
+    """
+    Issues and checks verified-session tokens.
+
+    A token is handed out once a user passed the RSA challenge-response in
+    DatabaseManager.verify_user_identity. Until it expires, checking the token
+    (an HMAC comparison) replaces the full RSA verification.
+
+    Token format: base64url(payload JSON) + "." + base64url(HMAC-SHA256 signature)
+    """
+    _instance = None
+    _lock = Lock()  # Thread safety for singleton creation
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(SessionTokenManager, cls).__new__(cls)
+                cls._instance._initialized = False
+            return cls._instance
+
+    def __init__(self):
+        # Skip initialization if already initialized
+        if getattr(self, '_initialized', False):
+            return
+
+        load_environment()
+        secret = os.getenv('SESSION_TOKEN_SECRET')
+        # Without a configured secret, tokens are only valid for the lifetime of this process
+        self.secret = secret.encode('utf-8') if secret else os.urandom(32)
+        self.ttl = int(os.getenv('SESSION_TOKEN_TTL', '900'))  # seconds
+        self.revoked_tokens = {}  # token_id -> expiry, kept until the token would have expired anyway
+        self.revoked_users = {}  # user_id -> tokens issued before this time are invalid
+        self.revocation_lock = Lock()
+
+        self._initialized = True
+
+    @staticmethod
+    def _encode(data: bytes) -> str:
+        return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+    @staticmethod
+    def _decode(data: str) -> bytes:
+        return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+    def _sign(self, payload: str) -> str:
+        return self._encode(hmac.new(self.secret, payload.encode("ascii"), hashlib.sha256).digest())
+
+    def issue(self, user_id: str) -> str:
+        """
+        Issue a token for a user that just passed identity verification.
+
+        Args:
+            user_id (str): ID of the verified user
+
+        Returns:
+            str: The signed token
+        """
+        now = time.time()
+        payload = self._encode(json.dumps({
+            "uid": user_id,
+            "iat": now,
+            "exp": now + self.ttl,
+            "jti": str(uuid.uuid4()),
+        }).encode("utf-8"))
+        return f"{payload}.{self._sign(payload)}"
+
+    def _claims(self, token: str) -> Optional[dict]:
+        """Return the claims of a token with a valid signature, None otherwise."""
+        try:
+            payload, signature = token.split(".")
+            # Constant time comparison so the signature cannot be guessed byte by byte
+            if not hmac.compare_digest(signature, self._sign(payload)):
+                return None
+            return json.loads(self._decode(payload))
+        except (ValueError, AttributeError, UnicodeError):
+            return None
+
+    def verify(self, token: str, user_id: str) -> bool:
+        """
+        Check that a token is authentic, belongs to the user, is not expired and was not revoked.
+
+        Args:
+            token (str): The token to check
+            user_id (str): ID of the user presenting the token
+
+        Returns:
+            bool: True if the token is valid
+        """
+        claims = self._claims(token) if token else None
+        if not claims or claims.get("uid") != user_id or claims.get("exp", 0) <= time.time():
+            return False
+
+        with self.revocation_lock:
+            if claims.get("jti") in self.revoked_tokens:
+                return False
+            if claims.get("iat", 0) <= self.revoked_users.get(user_id, 0):
+                return False
+        return True
+
+    def revoke(self, token: str):
+        """Revoke a single token."""
+        claims = self._claims(token)
+        if not claims:
+            return
+        now = time.time()
+        with self.revocation_lock:
+            self.revoked_tokens[claims["jti"]] = claims["exp"]
+            # Expired tokens fail verification on their own, stop tracking them
+            self.revoked_tokens = {jti: exp for jti, exp in self.revoked_tokens.items() if exp > now}
+
+    def revoke_user(self, user_id: str):
+        """Revoke every token issued to a user so far, e.g. when they sign out."""
+        now = time.time()
+        with self.revocation_lock:
+            self.revoked_users[user_id] = now
+            # Tokens issued a TTL before a revocation have expired, it no longer needs tracking
+            self.revoked_users = {uid: revoked for uid, revoked in self.revoked_users.items() if revoked > now - self.ttl}
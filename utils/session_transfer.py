@@ -0,0 +1,305 @@
+"""
+Export and import of whole sessions, to back them up, move them between deployments or analyse them.
+
+Two formats are supported:
+
+- NDJSON: one JSON record per line, the session first, then its users,
+  participants and canvas objects (see DatabaseManager.export_session).
+  Portable and readable with any JSON tool.
+- Parquet: one row per canvas object, with the session, its users and
+  participants in the file metadata. For analytics with pandas, DuckDB,
+  Spark... Needs pyarrow, which is only imported when Parquet is used.
+
+Both directions stream: rows are read with fetchmany, written with
+executemany and Parquet files are written and read a row group at a time,
+so memory use does not depend on the size of the session.
+
+From the command line:
+
+    python -m utils.session_transfer export SESSION_ID session.ndjson
+    python -m utils.session_transfer import session.parquet --replace
+"""
+import argparse
+import io
+import json
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Union
+
+from .db_manager import DatabaseManager
+
+FORMATS = ("ndjson", "parquet")
+FORMAT_VERSION = 1
+# Parquet metadata key holding the session, its users and participants
+METADATA_KEY = b"neurosketch.session"
+OBJECT_COLUMNS = ("id", "created_by", "created_at", "updated_at", "version", "content_hash", "object_data", "stamps")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet export and import need pyarrow, install it with 'pip install pyarrow'") from None
+    return pyarrow, pyarrow.parquet
+
+
+def format_for_path(path: Union[str, Path]) -> str:
+    """The export format of a file, by its extension."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".parquet":
+        return "parquet"
+    if suffix in (".ndjson", ".jsonl"):
+        return "ndjson"
+    raise ValueError(f"Unknown export format for {path}, use .ndjson, .jsonl or .parquet")
+
+
+def export_ndjson(session_id: str, batch_size: int = 1000) -> Iterator[bytes]:
+    """
+    Export a session as NDJSON, ``batch_size`` lines per chunk.
+
+    Raises:
+        ValueError: If the session does not exist, once iteration starts
+    """
+    lines = []
+    for record in DatabaseManager().export_session(session_id, batch_size):
+        if record["type"] == "object":
+            record = dict(record, object_data=json.loads(record["object_data"]))
+        lines.append(json.dumps(record))
+        if len(lines) >= batch_size:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """A write-only file handing out what was written so far, so Parquet files can be streamed."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # The Parquet footer stores offsets, the position counts everything ever written
+        return self.position
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def export_parquet(session_id: str, batch_size: int = 1000, row_group_size: int = 10_000) -> Iterator[bytes]:
+    """
+    Export a session as Parquet, one chunk per row group of ``row_group_size`` objects.
+
+    Raises:
+        ImportError: If pyarrow is not installed
+        ValueError: If the session does not exist, once iteration starts
+    """
+    pa, pq = _pyarrow()
+    schema = pa.schema([
+        ("id", pa.string()), ("created_by", pa.string()), ("created_at", pa.string()), ("updated_at", pa.string()),
+        ("version", pa.int64()), ("content_hash", pa.string()), ("object_data", pa.string()), ("stamps", pa.string()),
+    ])
+
+    def chunks():
+        records = DatabaseManager().export_session(session_id, batch_size)
+        metadata = {"format_version": FORMAT_VERSION, "session": None, "users": [], "participants": []}
+        sink, writer, rows = _ChunkSink(), None, []
+
+        def write_rows():
+            columns = {name: [row[name] for row in rows] for name in OBJECT_COLUMNS}
+            columns["stamps"] = [json.dumps(stamps) for stamps in columns["stamps"]]
+            writer.write_table(pa.table(columns, schema=schema))
+            rows.clear()
+
+        def open_writer():
+            # The export lists the session, users and participants before the objects
+            file_schema = schema.with_metadata({METADATA_KEY: json.dumps(metadata).encode("utf-8")})
+            return pq.ParquetWriter(sink, file_schema)
+
+        for record in records:
+            kind = record.pop("type")
+            if kind == "session":
+                metadata["session"] = record
+            elif kind == "user":
+                metadata["users"].append(record)
+            elif kind == "participant":
+                metadata["participants"].append(record["user_id"])
+            else:
+                writer = writer or open_writer()
+                rows.append(record)
+                if len(rows) >= row_group_size:
+                    write_rows()
+                    yield sink.take()
+
+        writer = writer or open_writer()
+        if rows:
+            write_rows()
+        writer.close()
+        yield sink.take()
+
+    return chunks()
+
+
+def stream_in_thread(chunks: Iterator[bytes], max_pending: int = 4) -> Iterator[bytes]:
+    """
+    Run an export on a thread of its own and hand its chunks over through a bounded queue.
+
+    The export reads from a SQLite connection, which may only be used by the
+    thread that opened it, while a streaming response may resume its iterator
+    on another thread for every chunk. At most ``max_pending`` chunks are read
+    ahead of the consumer. Closing the returned iterator stops the export.
+    """
+    pending = queue.Queue(maxsize=max_pending)
+    stopped = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        # Gives up once the consumer went away, e.g. a client disconnected
+        while not stopped.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if not put(chunk):
+                    return
+            put(done)
+        except Exception as e:
+            put(e)
+        finally:
+            # Closes the connection on the thread that opened it
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+
+    threading.Thread(target=produce, name="session-export", daemon=True).start()
+    try:
+        while True:
+            item = pending.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+
+
+def read_ndjson(lines: Iterable[Union[bytes, str]]) -> Iterator[dict]:
+    """The records of an NDJSON export, blank lines are skipped."""
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_parquet(source: Union[str, Path, BinaryIO], batch_size: int = 1000) -> Iterator[dict]:
+    """
+    The records of a Parquet export, objects read ``batch_size`` at a time.
+
+    Raises:
+        ImportError: If pyarrow is not installed
+        ValueError: If the file is not a session export
+    """
+    _, pq = _pyarrow()
+    parquet_file = pq.ParquetFile(source)
+    metadata = (parquet_file.schema_arrow.metadata or {}).get(METADATA_KEY)
+    if not metadata:
+        raise ValueError("Not a session export, the Parquet file has no session metadata")
+    metadata = json.loads(metadata)
+
+    yield {"type": "session", **metadata["session"]}
+    for user in metadata["users"]:
+        yield {"type": "user", **user}
+    for user_id in metadata["participants"]:
+        yield {"type": "participant", "user_id": user_id}
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=list(OBJECT_COLUMNS)):
+        for row in batch.to_pylist():
+            yield {"type": "object", **row, "stamps": json.loads(row["stamps"]) if row["stamps"] else {}}
+
+
+def import_ndjson(lines: Iterable[Union[bytes, str]], replace: bool = False,
+                  batch_size: int = 1000) -> Dict[str, Union[str, int]]:
+    """Import an NDJSON export, e.g. an open file. See DatabaseManager.import_session."""
+    return DatabaseManager().import_session(read_ndjson(lines), replace, batch_size)
+
+
+def import_parquet(source: Union[str, Path, BinaryIO], replace: bool = False,
+                   batch_size: int = 1000) -> Dict[str, Union[str, int]]:
+    """Import a Parquet export, a file path or an open file. See DatabaseManager.import_session."""
+    return DatabaseManager().import_session(read_parquet(source, batch_size), replace, batch_size)
+
+
+def export_file(session_id: str, path: Union[str, Path], format: Optional[str] = None, batch_size: int = 1000) -> int:
+    """
+    Export a session to a file, in the format of its extension unless ``format`` is given.
+
+    Returns:
+        int: Number of bytes written
+    """
+    format = format or format_for_path(path)
+    chunks = export_parquet(session_id, batch_size) if format == "parquet" else export_ndjson(session_id, batch_size)
+    written = 0
+    with open(path, "wb") as file:
+        for chunk in chunks:
+            written += file.write(chunk)
+    return written
+
+
+def import_file(path: Union[str, Path], format: Optional[str] = None, replace: bool = False,
+                batch_size: int = 1000) -> Dict[str, Union[str, int]]:
+    """Import a session from a file, in the format of its extension unless ``format`` is given."""
+    format = format or format_for_path(path)
+    if format == "parquet":
+        return import_parquet(path, replace, batch_size)
+    with open(path, "rb") as file:
+        return import_ndjson(file, replace, batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a session with its participants and canvas objects.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write a session to a file")
+    export_parser.add_argument("session_id", help="ID of the session to export")
+    export_parser.add_argument("path", help="File to write, .ndjson/.jsonl or .parquet")
+    import_parser = commands.add_parser("import", help="Read a session from a file")
+    import_parser.add_argument("path", help="File written by export")
+    import_parser.add_argument("--replace", action="store_true", help="Replace the session if it already exists")
+    for command_parser in (export_parser, import_parser):
+        command_parser.add_argument("--format", choices=FORMATS, default=None, help="Defaults to the file extension")
+        command_parser.add_argument("--batch-size", type=int, default=1000, help="Rows read or written at a time")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "export":
+        written = export_file(args.session_id, args.path, args.format, args.batch_size)
+        print(f"Exported session {args.session_id} to {args.path} ({written / 1e6:.1f} MB) "
+              f"in {time.perf_counter() - started:.1f} s")
+    else:
+        counts = import_file(args.path, args.format, args.replace, args.batch_size)
+        print(f"Imported session {counts['session_id']}: {counts['objects']} objects, {counts['participants']} "
+              f"participants, {counts['users']} new users in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()